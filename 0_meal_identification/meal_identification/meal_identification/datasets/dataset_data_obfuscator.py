@@ -1,41 +1,61 @@
 import pandas as pd
 import numpy as np
-from meal_identification.datasets.dataset_operations import get_root_dir
+from meal_identification.datasets.dataset_operations import get_root_dir, load_sim_patient
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+from meal_identification.datasets.dataset_seeding import job_rng
+from meal_identification.datasets.dataset_label_sidecar import save_label_sidecar, SIDECAR_SUFFIX
 from scipy.stats import gamma, norm
-import random
+from tqdm import tqdm
 
 
-def find_meals_threshold_daily(patient_df, target_meals_per_day=1.8):
+def find_meals_thresholds(patient_df, target_meals_per_day=1.8, target_meals_per_week=3):
     """
-    Find threshold for food_g that results in target average meals per day. Default to 1.8 meal logged per day
+    Find the food_g thresholds that result in the target average number of logged meals per day and per week,
+    in one pass over the meals and without modifying patient_df.
+
+    Parameters
+    ----------
+    patient_df: DataFrame indexed by date with 'msg_type' and 'food_g' columns
+    target_meals_per_day: average meals per day to keep. Default to 1.8 meal logged per day
+    target_meals_per_week: average meals per week to keep. Default to 3 meals logged per week
+
+    Returns
+    -------
+    dict with the 'daily' and 'weekly' thresholds
     """
-    meal_mask = patient_df['msg_type'] == 'ANNOUNCE_MEAL'
-    daily_meals = patient_df[meal_mask].groupby(patient_df[meal_mask].index.date)
-    avg_meals_per_day = daily_meals.size().mean()
+    meal_mask = (patient_df['msg_type'] == 'ANNOUNCE_MEAL').to_numpy()
+    meal_times = patient_df.index[meal_mask]
+    food_g = patient_df['food_g'].to_numpy(dtype='float64')[meal_mask]
 
-    # Get percentile that would give us target meals per day
-    target_percentile = (1 - (target_meals_per_day / avg_meals_per_day)) * 100
-    threshold = np.percentile(patient_df[meal_mask]['food_g'], target_percentile)
+    # Average meals per day and per (ISO) week number
+    _, meals_per_day = np.unique(meal_times.normalize().asi8, return_counts=True)
+    _, meals_per_week = np.unique(meal_times.isocalendar().week.to_numpy(), return_counts=True)
 
-    return threshold
+    # Get percentiles that would give us target meals per period, keeping every meal if there are too few
+    target_percentiles = np.clip([
+        (1 - (target_meals_per_day / meals_per_day.mean())) * 100,
+        (1 - (target_meals_per_week / meals_per_week.mean())) * 100,
+    ], 0, 100)
+    daily, weekly = np.percentile(food_g, target_percentiles)
 
+    return {'daily': daily, 'weekly': weekly}
 
-def find_meals_threshold_weekly(patient_df, target_meals_per_week=3):
+
+def find_meals_threshold_daily(patient_df, target_meals_per_day=1.8):
     """
-    Find threshold for food_g that results in target average meals per week. Default to 3 meals logged per week
+    Find threshold for food_g that results in target average meals per day. Default to 1.8 meal logged per day
     """
-    meal_mask = patient_df['msg_type'] == 'ANNOUNCE_MEAL'
-
-    patient_df['week'] = patient_df.index.isocalendar().week
-    weekly_meals = patient_df[meal_mask].groupby('week')
-    avg_meals_per_week = weekly_meals.size().mean()
+    return find_meals_thresholds(patient_df, target_meals_per_day=target_meals_per_day)['daily']
 
-    target_percentile = (1 - (target_meals_per_week / avg_meals_per_week)) * 100
-    threshold = np.percentile(patient_df[meal_mask]['food_g'], target_percentile)
-    patient_df.drop('week', axis=1, inplace=True)
 
-    return threshold
+def find_meals_threshold_weekly(patient_df, target_meals_per_week=3):
+    """
+    Find threshold for food_g that results in target average meals per week. Default to 3 meals logged per week
+    """
+    return find_meals_thresholds(patient_df, target_meals_per_week=target_meals_per_week)['weekly']
 
 
 def process_largest_meals(patient_df, period="daily", threshold=None):
@@ -50,32 +70,40 @@ def process_largest_meals(patient_df, period="daily", threshold=None):
 
     # Calculate threshold if not provided
     if threshold is None:
-        threshold = find_meals_threshold_daily(patient_df) if period == 'daily' else find_meals_threshold_weekly(
-            patient_df)
+        threshold = find_meals_thresholds(patient_df)[period]
 
     meal_mask = patient_df['msg_type'] == 'ANNOUNCE_MEAL'
 
     # Wipe out meals below threshold
-    meals_to_remove = patient_df[meal_mask & (patient_df['food_g'] < threshold)].index
-    patient_df.loc[meals_to_remove, 'msg_type_log'] = None
+    patient_df.loc[meal_mask & (patient_df['food_g'] < threshold), 'msg_type_log'] = None
 
     return patient_df
 
 
 def keep_daily_top_meal(patient_df):
-    meal_mask = patient_df['msg_type'] == 'ANNOUNCE_MEAL'
-    daily_meals = patient_df[meal_mask].groupby(patient_df[meal_mask].index.date)
-    for date, day_meals in daily_meals:
-        # Skip if no meals
-        if len(day_meals) < 1:
-            continue
+    """
+    Keep only the largest meal of each day in 'msg_type_log'.
 
-        # Find the largest meal for the day
-        largest_meal_idx = day_meals['food_g'].idxmax()
+    The largest meal of every day is found with one sort over all meals (ties keep the earliest meal,
+    like idxmax) and the other meals are wiped in a single assignment.
+    """
+    meal_positions = np.flatnonzero((patient_df['msg_type'] == 'ANNOUNCE_MEAL').to_numpy())
+    if len(meal_positions) == 0:
+        return patient_df
 
-        # Wipe all meals except the largest
-        meals_to_remove = day_meals.index[day_meals.index != largest_meal_idx]
-        patient_df.loc[meals_to_remove, 'msg_type_log'] = None
+    meal_days = patient_df.index[meal_positions].normalize().asi8
+    food_g = patient_df['food_g'].to_numpy(dtype='float64')[meal_positions]
+
+    # Sort meals by day, then largest first; the first meal of each day is the one to keep
+    order = np.lexsort((-food_g, meal_days))
+    sorted_days = meal_days[order]
+    is_top = np.ones(len(order), dtype=bool)
+    is_top[1:] = sorted_days[1:] != sorted_days[:-1]
+
+    # Wipe all meals except the largest
+    msg_type_log = patient_df['msg_type_log'].to_numpy(dtype=object, copy=True)
+    msg_type_log[meal_positions[order[~is_top]]] = None
+    patient_df['msg_type_log'] = msg_type_log
 
     return patient_df
 
@@ -131,21 +159,27 @@ def logging_behaviour_obfuscator(
         return patient_df, "none"
 
 
-def generate_meal_logging_distribution(direction='left'):
+def generate_meal_logging_distribution(direction='left', rng=None, size=None):
     """
     Generate distribution parameters with internal direction handling randomly.
     Parameters
     ----------
     direction: 'right', 'left', or 'normal'
+    rng: np.random.Generator used to draw the parameters. Defaults to a freshly seeded generator
+    size: number of independent parameter sets to draw. Defaults to None (a single set of scalars)
 
     Returns
     -------
     For normal: (mean, std, distribution_object)
     For skewed: (shape, scale, offset, distribution_object)
+    Each parameter is an array of length size if size is given
     """
+    if rng is None:
+        rng = np.random.default_rng()
+
     if direction == 'normal':
-        mean = random.uniform(-15, 15)
-        std = random.uniform(4, 15)
+        mean = rng.uniform(-15, 15, size)
+        std = rng.uniform(4, 15, size)
         return mean, std, norm(mean, std)
     else:
         """
@@ -160,19 +194,19 @@ def generate_meal_logging_distribution(direction='left'):
         """
         if direction == 'left':  # Late logger
             # More extreme parameters for late logging
-            shape = random.uniform(2, 4)
-            scale = random.uniform(2.5, 3)
-            offset = random.uniform(10, 30)  # Shift right 10 to 30 mins late
+            shape = rng.uniform(2, 4, size)
+            scale = rng.uniform(2.5, 3, size)
+            offset = rng.uniform(10, 30, size)  # Shift right 10 to 30 mins late
 
         else:  # Early logger
-            shape = random.uniform(1, 3)
-            scale = random.uniform(3, 3.5)
-            offset = random.uniform(10, 15)  # Shift left 10 to 15 mins early
+            shape = rng.uniform(1, 3, size)
+            scale = rng.uniform(3, 3.5, size)
+            offset = rng.uniform(10, 15, size)  # Shift left 10 to 15 mins early
 
         return shape, scale, offset
 
 
-def shift_meals(patient_df, direction):
+def shift_meals(patient_df, direction, rng=None):
     """
     Simulates different meal logging behaviors by shifting meal announcement times based on specified patterns.
 
@@ -192,6 +226,10 @@ def shift_meals(patient_df, direction):
         - 'right': Hasty logger who tends to log before meals
         - 'left': Forgetful logger who tends to log after meals
 
+    rng : np.random.Generator, optional
+        Generator all shifts are drawn from. Pass a per-patient generator (see dataset_seeding.job_rng)
+        for reproducible results. Defaults to a freshly seeded generator.
+
     Returns
     -------
     pd.DataFrame
@@ -206,23 +244,26 @@ def shift_meals(patient_df, direction):
     - New meal times are snapped to the nearest existing time index
     """
 
+    if rng is None:
+        rng = np.random.default_rng()
+
     patient_df['msg_type_log_shifted'] = None
     meal_times = patient_df[patient_df['msg_type_log'] == 'ANNOUNCE_MEAL'].index
 
     # Shift each meal time with random sampling from the distribution
     for meal_time in meal_times:
         if direction == 'normal':
-            mean, std, _ = generate_meal_logging_distribution(direction)
+            mean, std, _ = generate_meal_logging_distribution(direction, rng)
             # Centered around 0?
-            min_to_shift = np.random.normal(0, std)
+            min_to_shift = rng.normal(0, std)
         else:
-            shape, scale, offset = generate_meal_logging_distribution(direction)
+            shape, scale, offset = generate_meal_logging_distribution(direction, rng)
             if direction == 'left':
                 # Late logger
-                min_to_shift = -(gamma.rvs(a=shape, scale=scale, loc=-offset))
+                min_to_shift = -(gamma.rvs(a=shape, scale=scale, loc=-offset, random_state=rng))
             else:
                 # Early logger
-                min_to_shift = gamma.rvs(a=shape, scale=scale, loc=-offset)
+                min_to_shift = gamma.rvs(a=shape, scale=scale, loc=-offset, random_state=rng)
 
         # Shift the meal
         new_time = meal_time + pd.Timedelta(minutes=min_to_shift)
@@ -233,10 +274,115 @@ def shift_meals(patient_df, direction):
     return patient_df
 
 
+def nearest_index_positions(index, times):
+    """
+    Snap times to the position of the nearest entry of a sorted DatetimeIndex with a single searchsorted.
+    Ties resolve to the later entry, like index.get_indexer(..., method='nearest').
+
+    Parameters
+    ----------
+    index : pd.DatetimeIndex
+        Sorted index to snap to
+    times : pd.DatetimeIndex
+        Times to snap
+
+    Returns
+    -------
+    np.ndarray
+        Integer positions into index, -1 for times outside [index.min(), index.max()]
+    """
+    positions = np.full(len(times), -1, dtype=np.intp)
+    if len(index) == 0 or len(times) == 0:
+        return positions
+
+    index_ns = index.asi8
+    times_ns = times.asi8
+    in_range = (times_ns >= index_ns[0]) & (times_ns <= index_ns[-1])
+
+    right = np.clip(index.searchsorted(times[in_range]), 0, len(index) - 1)
+    left = np.clip(right - 1, 0, len(index) - 1)
+    in_range_ns = times_ns[in_range]
+    take_left = (in_range_ns - index_ns[left]) < (index_ns[right] - in_range_ns)
+    positions[in_range] = np.where(take_left, left, right)
+    return positions
+
+
+def draw_meal_shifts(direction, n_meals, rng=None):
+    """
+    Draw the logging shift of every meal of a patient in one call per distribution.
+    Each meal gets its own distribution parameters, as in shift_meals.
+
+    Parameters
+    ----------
+    direction : str
+        'normal', 'right' or 'left', see shift_meals
+    n_meals : int
+        Number of shifts to draw
+    rng : np.random.Generator, optional
+        Generator the shifts are drawn from
+
+    Returns
+    -------
+    np.ndarray
+        Shift in minutes of each meal, positive values are later than the meal
+    """
+    if rng is None:
+        rng = np.random.default_rng()
+
+    if direction == 'normal':
+        _, std, _ = generate_meal_logging_distribution(direction, rng, size=n_meals)
+        return rng.normal(0, std)
+
+    shape, scale, offset = generate_meal_logging_distribution(direction, rng, size=n_meals)
+    shifts = gamma.rvs(a=shape, scale=scale, loc=-offset, size=n_meals, random_state=rng)
+    if direction == 'left':
+        # Late logger
+        return -shifts
+    # Early logger
+    return shifts
+
+
+def shift_meals_vectorized(patient_df, direction, rng=None):
+    """
+    Vectorized equivalent of shift_meals.
+
+    All shifts of the patient are drawn at once, the shifted times are snapped to the index with one
+    searchsorted and the shifted label column is written in one assignment. The shifts follow the same
+    distributions as shift_meals but are not drawn in the same order, so the same rng gives different
+    (equally distributed) results.
+
+    Parameters
+    ----------
+    patient_df : pd.DataFrame
+        DataFrame indexed by date with a 'msg_type_log' column, see shift_meals
+    direction : str
+        'normal', 'right' or 'left', see shift_meals
+    rng : np.random.Generator, optional
+        Generator all shifts are drawn from
+
+    Returns
+    -------
+    pd.DataFrame
+        Input DataFrame with new column 'msg_type_log_shifted'
+    """
+    meal_times = patient_df.index[(patient_df['msg_type_log'] == 'ANNOUNCE_MEAL').to_numpy()]
+    min_to_shift = draw_meal_shifts(direction, len(meal_times), rng)
+
+    new_times = meal_times + pd.to_timedelta(min_to_shift, unit='m')
+    positions = nearest_index_positions(patient_df.index, new_times)
+
+    shifted = np.full(len(patient_df), None, dtype=object)
+    shifted[positions[positions >= 0]] = 'ANNOUNCE_MEAL'
+    patient_df['msg_type_log_shifted'] = shifted
+
+    return patient_df
+
+
 def logging_timing_obfuscator(
         patient_df: pd.DataFrame,
         logger_timeing,
-        distribution=None
+        distribution=None,
+        rng=None
 ):
     """
     Parameters
@@ -249,6 +395,7 @@ def logging_timing_obfuscator(
      - Third range:  Normal Distribution
      - Fourth range: Unchanged
      Default to [0, 0.38, 0.61, 0.89, 1]
+    rng: np.random.Generator passed to shift_meals_vectorized
     Returns
     -------
     tuple(patient_df, logger_type)
@@ -259,17 +406,17 @@ def logging_timing_obfuscator(
     # Should be working with `msg_type_log` column from meal_logging_obfuscator
     if distribution[0] <= logger_timeing < distribution[1]:
         # Type 1: Temporally left skewed
-        patient_df = shift_meals(patient_df, "left")
+        patient_df = shift_meals_vectorized(patient_df, "left", rng)
         return patient_df, "forgetful"
 
     elif distribution[1] <= logger_timeing < distribution[2]:
         # Type 2: Temporally right skewed
-        patient_df = shift_meals(patient_df, "right")
+        patient_df = shift_meals_vectorized(patient_df, "right", rng)
         return patient_df, "hasty"
 
     elif distribution[2] <= logger_timeing < distribution[3]:
         # Type 3: Normal Distribution (28%)
-        patient_df = shift_meals(patient_df, "normal")
+        patient_df = shift_meals_vectorized(patient_df, "normal", rng)
         return patient_df, "normal"
 
     elif distribution[3] <= logger_timeing < distribution[4]:
@@ -277,60 +424,324 @@ def logging_timing_obfuscator(
         return patient_df, "unchanged"
 
 
-def start():
-    project_root = get_root_dir()
-    sim_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'raw', 'sim')
-    processed_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'raw',
-                                 'obfuscated')
+# Ranges for different types of meal logging behavior, see logging_behaviour_obfuscator
+DISTRIBUTION_LOGGING_BEHAVIOUR = [0, 0.20, 0.45, 0.65, 0.85, 1]
 
-    # TODO: Need to figure out why some files from data/raw/sim have a new line character at the end
-    csv_files = [f for f in os.listdir(sim_dir) if f.endswith('.csv')]
+# Ranges for different types of meal logging timing, see logging_timing_obfuscator
+DISTRIBUTION_LOGGING_TIMING = [0, 0.38, 0.61, 0.89, 1]
 
-    patient_count = len(csv_files)
-    print("Total patients: {}".format(patient_count))
 
-    # Ranges for different types of meal logging behavior
-    uniform_dist_logging_behaviour = np.random.uniform(0, 1, patient_count)
-    distribution_logging_behaviour = [0, 0.20, 0.45, 0.65, 0.85, 1]
+def obfuscate_replicas(
+        patient_df,
+        n_replicas,
+        global_seed=None,
+        job_key='',
+        distribution_logging_behaviour=None,
+        distribution_logging_timing=None
+):
+    """
+    Produce n_replicas logging behaviour/timing realizations of one patient in a single pass.
 
-    # Ranges for different types of meal logging timing
-    uniform_dist_logging_timing = np.random.uniform(0, 1, patient_count)
-    distribution_logging_timing = [0, 0.38, 0.61, 0.89, 1]
+    The obfuscators only run on the meal columns (msg_type, food_g); glucose columns are never copied.
+    Replica k draws from its own generator derived from global_seed, job_key and k, so a replica is the
+    same whatever n_replicas is.
 
-    processed_count = 0
+    Parameters
+    ----------
+    patient_df: patient dataframe indexed by date with 'msg_type' and 'food_g' columns. Not modified.
+    n_replicas: number of realizations to produce
+    global_seed: seed of the run
+    job_key: stable name of the patient, e.g. its file name
+    distribution_logging_behaviour: ranges passed to logging_behaviour_obfuscator
+    distribution_logging_timing: ranges passed to logging_timing_obfuscator
 
-    for idx, file in enumerate(csv_files):
-        # Randomly assign a patient to a type of logger based on uniform distribution
-        logger_type = uniform_dist_logging_behaviour[idx]
-        logger_timeing = uniform_dist_logging_timing[idx]
+    Returns
+    -------
+    tuple(labels_df, logger_types)
+     - labels_df: DataFrame with patient_df's index and columns msg_type_log_{k}, msg_type_log_shifted_{k}
+     - logger_types: list of (logger_type, logger_timing) names per replica
+    """
+    if distribution_logging_behaviour is None:
+        distribution_logging_behaviour = DISTRIBUTION_LOGGING_BEHAVIOUR
+    if distribution_logging_timing is None:
+        distribution_logging_timing = DISTRIBUTION_LOGGING_TIMING
+
+    meals_df = patient_df[['msg_type', 'food_g']].copy()
+
+    labels = {}
+    logger_types = []
+    for k in range(n_replicas):
+        msg_type_log, msg_type_log_shifted, replica_types = obfuscate_replica(
+            meals_df, k, global_seed, job_key, distribution_logging_behaviour, distribution_logging_timing
+        )
+        labels[f'msg_type_log_{k}'] = msg_type_log
+        labels[f'msg_type_log_shifted_{k}'] = msg_type_log_shifted
+        logger_types.append(replica_types)
+
+    return pd.DataFrame(labels, index=patient_df.index), logger_types
+
+
+def obfuscate_replica(
+        meals_df,
+        k,
+        global_seed=None,
+        job_key='',
+        distribution_logging_behaviour=None,
+        distribution_logging_timing=None
+):
+    """
+    Produce the k-th logging behaviour/timing realization of one patient, see obfuscate_replicas.
 
-        file_path = os.path.join(sim_dir, file)
-        try:
-            df = pd.read_csv(file_path, parse_dates=['date']).drop('Unnamed: 0', axis=1)
-            df = df.set_index('date')
-            df.index = pd.DatetimeIndex(df.index)
+    Parameters
+    ----------
+    meals_df: dataframe indexed by date with 'msg_type' and 'food_g' columns.
+              Its msg_type_log and msg_type_log_shifted columns are overwritten.
+    k: index of the replica, selects its generator
+    global_seed: seed of the run
+    job_key: stable name of the patient, e.g. its file name
+    distribution_logging_behaviour: ranges passed to logging_behaviour_obfuscator
+    distribution_logging_timing: ranges passed to logging_timing_obfuscator
+
+    Returns
+    -------
+    tuple(msg_type_log, msg_type_log_shifted, (logger_type, logger_timing))
+    """
+    if distribution_logging_behaviour is None:
+        distribution_logging_behaviour = DISTRIBUTION_LOGGING_BEHAVIOUR
+    if distribution_logging_timing is None:
+        distribution_logging_timing = DISTRIBUTION_LOGGING_TIMING
+
+    rng = job_rng(global_seed, (job_key, f'replica_{k}'))
+    logger_type = rng.uniform(0, 1)
+    logger_timeing = rng.uniform(0, 1)
+
+    meals_df, logger_type = logging_behaviour_obfuscator(meals_df, logger_type, distribution_logging_behaviour)
+    meals_df, logger_timeing = logging_timing_obfuscator(meals_df, logger_timeing, distribution_logging_timing, rng)
+
+    return (meals_df['msg_type_log'].to_numpy(), meals_df['msg_type_log_shifted'].to_numpy(),
+            (logger_type, logger_timeing))
+
+
+def obfuscate_file(
+        file_path,
+        output_dir,
+        global_seed=None,
+        distribution_logging_behaviour=None,
+        distribution_logging_timing=None,
+        n_replicas=None,
+        sidecar=True
+):
+    """
+    Obfuscate a single simulated patient file and save the result to output_dir.
+
+    Any error is caught and reported in the returned record, so one bad file never stops a batch.
+    With n_replicas, the label columns of n_replicas realizations are produced (see obfuscate_replicas)
+    instead of one realization.
+
+    By default only the label columns are saved, as a sidecar file referencing the simulated file by hash
+    (see dataset_label_sidecar.LabelSidecar to join them back). With sidecar=False a csv is written instead:
+    the full patient frame for a single realization, or the label columns for replicas.
 
+    Parameters
+    ----------
+    file_path: path of the simulated patient csv
+    output_dir: directory the obfuscated csv is written to
+    global_seed: seed of the run, the file draws from its own generator derived from it and the file name
+    distribution_logging_behaviour: ranges passed to logging_behaviour_obfuscator
+    distribution_logging_timing: ranges passed to logging_timing_obfuscator
+    n_replicas: number of label realizations to produce. Defaults to None (single realization)
+    sidecar: save labels as a sidecar file instead of a csv. Defaults to True
+
+    Returns
+    -------
+    dict with the file name, status ('success' | 'failed'), logger types, output file, error and duration
+    """
+    if distribution_logging_behaviour is None:
+        distribution_logging_behaviour = DISTRIBUTION_LOGGING_BEHAVIOUR
+    if distribution_logging_timing is None:
+        distribution_logging_timing = DISTRIBUTION_LOGGING_TIMING
+
+    file = os.path.basename(file_path)
+    record = {
+        'file': file,
+        'status': 'failed',
+        'logger_type': None,
+        'logger_timing': None,
+        'output_file': None,
+        'error': None,
+        'seconds': None,
+    }
+    tic = time.perf_counter()
+
+    # Randomly assign a patient to a type of logger based on uniform distribution
+    rng = job_rng(global_seed, file)
+    logger_type = rng.uniform(0, 1)
+    logger_timeing = rng.uniform(0, 1)
+
+    try:
+        df = load_sim_patient(file_path)
+        base_name = file.replace('.csv', '')
+
+        if n_replicas is not None:
+            labels_df, logger_types = obfuscate_replicas(df, n_replicas, global_seed, file,
+                                                         distribution_logging_behaviour,
+                                                         distribution_logging_timing)
+            logger_type = [t[0] for t in logger_types]
+            logger_timeing = [t[1] for t in logger_types]
+            output_name = f"{base_name}_replicas{n_replicas}"
+
+        else:
             # Simulate logging behaviour
             patient_df, logger_type = logging_behaviour_obfuscator(df, logger_type, distribution_logging_behaviour)
 
             # Simulate logging timing
             patient_df, logger_timeing = logging_timing_obfuscator(patient_df, logger_timeing,
-                                                                   distribution_logging_timing)
+                                                                   distribution_logging_timing, rng)
+            labels_df = patient_df[['msg_type_log', 'msg_type_log_shifted']]
+            output_name = f"{base_name}_{logger_type}_{logger_timeing}"
+
+        if sidecar:
+            output_file = save_label_sidecar(
+                labels_df,
+                file_path,
+                os.path.join(output_dir, output_name + SIDECAR_SUFFIX),
+                metadata={'logger_type': logger_type, 'logger_timing': logger_timeing,
+                          'global_seed': None if global_seed is None else int(global_seed)}
+            )
+        elif n_replicas is not None:
+            output_file = os.path.join(output_dir, f"{output_name}.csv")
+            labels_df.to_csv(output_file, index=True)
+        else:
+            output_file = os.path.join(output_dir, f"{output_name}.csv")
+            patient_df.reset_index().to_csv(output_file, index=True)
+
+        record.update(status='success', logger_type=logger_type, logger_timing=logger_timeing,
+                      output_file=output_file)
+
+    except Exception as e:
+        record['error'] = f"{type(e).__name__}: {e}"
+
+    record['seconds'] = time.perf_counter() - tic
+    return record
+
 
-            # Remove old .csv extension
-            file = file.replace('.csv', '')
-            file = f"{file}_{logger_type}_{logger_timeing}.csv"
-            output_file = os.path.join(processed_dir, file)
-            df = df.reset_index()
-            df.to_csv(output_file, index=True)
+def _failed_record(file_path, error):
+    return {'file': os.path.basename(file_path), 'status': 'failed', 'error': f"{type(error).__name__}: {error}"}
 
-            print(f"Successfully processed and saved {file}")
-            processed_count += 1
 
+def _obfuscate_isolated(file_path, output_dir, global_seed, **kwargs):
+    """
+    Run obfuscate_file in a process of its own, a crash of that process only fails this file's record.
+    """
+    with ProcessPoolExecutor(max_workers=1) as executor:
+        try:
+            return executor.submit(obfuscate_file, file_path, output_dir, global_seed, **kwargs).result()
         except Exception as e:
-            print(f"Error processing {file}: {str(e)}")
+            return _failed_record(file_path, e)
+
+
+def run_obfuscation(sim_dir, output_dir, global_seed=None, n_jobs=None, progress=True, **kwargs):
+    """
+    Obfuscate every csv file in sim_dir on a process pool.
+
+    Each file runs in isolation with its own random stream (see obfuscate_file), so results are
+    identical for any n_jobs. A failing file only fails its own record. If a worker process dies
+    (segfault, OOM kill), the pool breaks and the files it had not finished are rerun one process
+    per file, so a crashing file also only fails its own record.
+
+    Parameters
+    ----------
+    sim_dir: directory with the simulated patient csv files
+    output_dir: directory the obfuscated files are written to, created if missing
+    global_seed: seed of the run. Defaults to None (not reproducible)
+    n_jobs: number of worker processes. None uses all CPUs, 1 runs in the current process
+    progress: whether to show a progress bar
+    kwargs: passed to obfuscate_file
+
+    Returns
+    -------
+    pd.DataFrame with one record per file, see obfuscate_file
+    """
+    # TODO: Need to figure out why some files from data/raw/sim have a new line character at the end
+    csv_files = sorted(f for f in os.listdir(sim_dir) if f.endswith('.csv'))
+    file_paths = [os.path.join(sim_dir, f) for f in csv_files]
+    os.makedirs(output_dir, exist_ok=True)
+
+    if n_jobs is None:
+        n_jobs = os.cpu_count() or 1
+
+    records = []
+    with tqdm(total=len(file_paths), desc="Obfuscating", disable=not progress) as progress_bar:
+        if n_jobs == 1:
+            for file_path in file_paths:
+                records.append(obfuscate_file(file_path, output_dir, global_seed, **kwargs))
+                progress_bar.update()
+        else:
+            n_workers = min(n_jobs, max(len(file_paths), 1))
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = {
+                    executor.submit(obfuscate_file, file_path, output_dir, global_seed, **kwargs): file_path
+                    for file_path in file_paths
+                }
+                for future in as_completed(futures):
+                    try:
+                        records.append(future.result())
+                    except BrokenProcessPool:
+                        # A worker died (e.g. killed by the OS) and took every pending file down with it
+                        break
+                    except Exception as e:
+                        records.append(_failed_record(futures[future], e))
+                    progress_bar.update()
+
+            # Rerun the files the broken pool didn't finish, each in its own process, so only the file
+            # that kills its worker fails
+            done = {record['file'] for record in records}
+            unfinished = [file_path for file_path in file_paths if os.path.basename(file_path) not in done]
+            if unfinished:
+                with ThreadPoolExecutor(max_workers=n_workers) as threads:
+                    isolated = threads.map(
+                        lambda file_path: _obfuscate_isolated(file_path, output_dir, global_seed, **kwargs),
+                        unfinished,
+                    )
+                    for record in isolated:
+                        records.append(record)
+                        progress_bar.update()
+
+    columns = ['file', 'status', 'logger_type', 'logger_timing', 'output_file', 'error', 'seconds']
+    return pd.DataFrame.from_records(records, columns=columns).sort_values('file', ignore_index=True)
+
+
+def start(global_seed=None, n_jobs=None, n_replicas=None, sidecar=True):
+    """
+    Obfuscate every simulated patient in data/raw/sim and save the results to data/raw/obfuscated.
+
+    Parameters
+    ----------
+    global_seed: seed of the run. Each file draws its logger types and meal shifts from its own
+     generator derived from global_seed and the file name, so outputs don't depend on file order.
+     Defaults to None (not reproducible).
+    n_jobs: number of worker processes, see run_obfuscation
+    n_replicas: number of label realizations per patient, see obfuscate_replicas
+    sidecar: save labels as sidecar files referencing data/raw/sim instead of csv copies, see obfuscate_file
+
+    Returns
+    -------
+    pd.DataFrame with one success/failure record per file
+    """
+    project_root = get_root_dir()
+    sim_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'raw', 'sim')
+    processed_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'raw',
+                                 'obfuscated')
+
+    records = run_obfuscation(sim_dir, processed_dir, global_seed=global_seed, n_jobs=n_jobs,
+                              n_replicas=n_replicas, sidecar=sidecar)
+    print("Total patients: {}".format(len(records)))
+
+    for record in records[records['status'] == 'failed'].itertuples():
+        print(f"Error processing {record.file}: {record.error}")
 
-    print(f"Total file processed: {processed_count}")
+    print(f"Total file processed: {(records['status'] == 'success').sum()}")
+    return records
 
 
 if __name__ == '__main__':
@@ -1,49 +1,111 @@
 import pandas as pd
+import numpy as np
 import os
-from simglucose.simulation.user_interface import simulate
+from simglucose.simulation.sim_engine import SimObj, batch_sim
+from simglucose.simulation.env import T1DSimEnv
 from simglucose.simulation.scenario import CustomScenario
 from simglucose.simulation.scenario_gen import RandomScenario
 from simglucose.controller.basal_bolus_ctrller import BBController
+from simglucose.sensor.cgm import CGMSensor
+from simglucose.actuator.pump import InsulinPump
+from simglucose.patient.t1dpatient import T1DPatient
+from simglucose.analysis.report import report
 from meal_identification.datasets.dataset_operations import get_root_dir
+from meal_identification.datasets.dataset_seeding import job_int_seed
 from datetime import datetime, timedelta
 
 
-def process_simulated_data(df):
+# Typed raw schema emitted for simulated patients. Absent values are NaN/NA rather than
+# empty strings so numeric columns stay numeric when loaded downstream.
+SIM_MSG_TYPES = ['ANNOUNCE_MEAL', 'DOSE_INSULIN']
+SIM_RAW_DTYPES = {
+    'bgl_real': 'float64',
+    'bgl': 'float64',
+    'msg_type': pd.CategoricalDtype(SIM_MSG_TYPES),
+    'food_glycemic_index': 'float64',
+    'affects_iob': 'boolean',
+    'affects_fob': 'boolean',
+    'dose_units': 'float64',
+    'food_g': 'float64',
+}
+SIM_TRACE_COLUMNS = ['Time', 'BG', 'CGM', 'CHO', 'insulin']
+
+
+def basal_rate(insulin):
     """
-    Process individual patient's glucose data into project-specific format.
+    Basal rate of an insulin trace: the most frequent nonzero rate.
+
+    simglucose's basal-bolus controller delivers a constant basal rate between boluses, so the mode
+    is the basal rate even when the pump is suspended (zero) or delivers less for a few samples,
+    which would lower the minimum of the trace and turn every basal sample into a bolus.
 
     Parameters
     ----------
-    df (pd.DataFrame): Input DataFrame with simulation data
+    insulin (np.ndarray): Insulin rates (U/min), NaN where missing
 
     Returns
     -------
-    pd.DataFrame: Processed DataFrame with project-specific format
+    float: The basal rate, 0 if nothing is delivered
     """
-    # Create a copy to avoid modifying the original
-    processed_df = df.copy()
-
-    # Create two separate dataframes for BG and CGM readings
-    processed_df = processed_df[['Time', 'BG', 'CGM', 'CHO']].copy()
+    delivered = insulin[insulin > 0]
+    if len(delivered) == 0:
+        return 0.0
+    rates, counts = np.unique(delivered, return_counts=True)
+    return float(rates[np.argmax(counts)])
 
-    # Add required columns
-    processed_df['msg_type'] = ''
-    processed_df['food_glycemic_index'] = ''
-    processed_df['affects_iob'] = ''
-    processed_df['affects_fob'] = ''
-    processed_df['dose_units'] = ''
 
-    # Map CGM to bgl column, Time to date and BG to bgl_real for reference only
-    processed_df = processed_df.rename(columns={'CGM': 'bgl', 'BG': 'bgl_real', 'Time': 'date'})
+def process_simulated_data(df):
+    """
+    Process individual patient's glucose data into project-specific format.
 
-    processed_df.loc[processed_df['CHO'] > 0, 'msg_type'] = 'ANNOUNCE_MEAL'
+    Meals (CHO > 0) become ANNOUNCE_MEAL events. If the simulator's insulin trace is present,
+    insulin delivered above the basal rate is populated as DOSE_INSULIN events with the bolus
+    amount in dose_units. A meal and its bolus land on the same row; msg_type keeps the meal.
 
-    # Rename CHO to food_g where it's > 0
-    processed_df.loc[processed_df['CHO'] > 0, 'food_g'] = processed_df.loc[processed_df['CHO'] > 0, 'CHO']
+    Parameters
+    ----------
+    df (pd.DataFrame): Input DataFrame with simulation data
 
-    # Drop the CHO column
-    processed_df = processed_df.drop(columns=['CHO'])
+    Returns
+    -------
+    pd.DataFrame: Processed DataFrame with project-specific format and typed columns
+    """
+    n_rows = len(df)
+    date = pd.to_datetime(df['Time']).to_numpy()
+    cho = df['CHO'].to_numpy(dtype='float64')
+    meal_mask = cho > 0
+
+    # Bolus in U: insulin trace is a rate (U/min) averaged over each sample, the basal part of
+    # it is the rate delivered most often (see basal_rate)
+    dose_units = np.full(n_rows, np.nan)
+    dose_mask = np.zeros(n_rows, dtype=bool)
+    if 'insulin' in df.columns and n_rows > 1:
+        insulin = df['insulin'].to_numpy(dtype='float64')
+        sample_minutes = np.diff(date).astype('timedelta64[s]').astype('float64') / 60
+        sample_minutes = np.append(sample_minutes, sample_minutes[-1])
+        bolus = (insulin - basal_rate(insulin)) * sample_minutes
+        dose_mask = bolus > 1e-6
+        dose_units[dose_mask] = bolus[dose_mask]
+
+    msg_codes = np.full(n_rows, -1, dtype='int8')
+    msg_codes[dose_mask] = SIM_MSG_TYPES.index('DOSE_INSULIN')
+    msg_codes[meal_mask] = SIM_MSG_TYPES.index('ANNOUNCE_MEAL')
+
+    affects_iob = pd.array(np.where(dose_mask | meal_mask, dose_mask, None), dtype='boolean')
+    affects_fob = pd.array(np.where(dose_mask | meal_mask, meal_mask, None), dtype='boolean')
 
+    # Map CGM to bgl column, Time to date and BG to bgl_real for reference only
+    processed_df = pd.DataFrame({
+        'date': date,
+        'bgl_real': df['BG'].to_numpy(dtype='float64'),
+        'bgl': df['CGM'].to_numpy(dtype='float64'),
+        'msg_type': pd.Categorical.from_codes(msg_codes, dtype=SIM_RAW_DTYPES['msg_type']),
+        'food_glycemic_index': np.full(n_rows, np.nan),
+        'affects_iob': affects_iob,
+        'affects_fob': affects_fob,
+        'dose_units': dose_units,
+        'food_g': np.where(meal_mask, cho, np.nan),
+    })
 
     return processed_df
 
@@ -59,6 +121,7 @@ def run_glucose_simulation(
         global_seed=123,
         animate=False,
         parallel=True,
+        save_path=None,
 ):
     # Set default values
     if start_time is None:
@@ -68,43 +131,45 @@ def run_glucose_simulation(
     if custom_meal_schedule is None and scenario_type == 'custom':
         custom_meal_schedule = [(1, 20)]  # Default meal at hour 1 with 20g carbs
 
-    # Create controller
-    controller = BBController()
-
     # Set up simulation time
     sim_time = pd.Timedelta(days=simulation_days)
 
-    # Scenario
-    if scenario_type == 'custom':
-        scenario = CustomScenario(
-            start_time=start_time,
-            scenario=custom_meal_schedule
-        )
-    else:
-        scenario = RandomScenario(
-            start_time=start_time,
-            seed=global_seed
-        )
-
     # Set up result directory
-    project_root = get_root_dir()
-    result_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'sim')
+    if save_path is None:
+        project_root = get_root_dir()
+        result_dir = os.path.join(project_root, '0_meal_identification', 'meal_identification', 'data', 'sim')
+    else:
+        result_dir = save_path
     os.makedirs(result_dir, exist_ok=True)
 
+    # Every patient gets its own scenario and sensor seeds derived from global_seed and the
+    # patient's name, so results don't depend on the order or parallelism of the cohort
+    sim_instances = []
+    cgm_sensor = None
+    for patient_name in patient_names:
+        if scenario_type == 'custom':
+            scenario = CustomScenario(
+                start_time=start_time,
+                scenario=custom_meal_schedule
+            )
+        else:
+            scenario = RandomScenario(
+                start_time=start_time,
+                seed=job_int_seed(global_seed, (patient_name, 'scenario'))
+            )
+        cgm_sensor = CGMSensor.withName(cgm_name, seed=job_int_seed(global_seed, (patient_name, 'cgm')))
+        env = T1DSimEnv(
+            T1DPatient.withName(patient_name),
+            cgm_sensor,
+            InsulinPump.withName(insulin_pump_name),
+            scenario
+        )
+        sim_instances.append(SimObj(env, BBController(), sim_time, animate=animate, path=result_dir))
+
     # Run simulation
-    simulate(
-        sim_time=sim_time,
-        scenario=scenario,
-        controller=controller,
-        start_time=start_time,
-        save_path=result_dir,
-        cgm_name=cgm_name,
-        cgm_seed=global_seed,
-        insulin_pump_name=insulin_pump_name,
-        animate=animate,
-        parallel=parallel,
-        patient_names=patient_names,
-    )
+    results = batch_sim(sim_instances, parallel=parallel)
+    df = pd.concat(results, keys=[s.env.patient.name for s in sim_instances])
+    report(df, cgm_sensor, result_dir)
 
     return result_dir
 
@@ -134,10 +199,8 @@ def process_sim_data(simulation_days, naming):
 
         file_path = os.path.join(sim_dir, file)
         try:
-            df = pd.read_csv(file_path)
-
-            # Convert Time column to datetime
-            df['date'] = pd.to_datetime(df['Time'])
+            # Only read the columns the raw schema is built from
+            df = pd.read_csv(file_path, usecols=lambda c: c in SIM_TRACE_COLUMNS, parse_dates=['Time'])
 
             # Process the data
             processed_df = process_simulated_data(df)
@@ -198,6 +261,7 @@ def generate_simulated_data(
     insulin_pump_name (str, optional): Name of the insulin pump device.
          - "Cozmo" | "Insulet". Defaults to "Cozmo".
     global_seed (int, optional): Random seed for reproducibility. Defaults to 123.
+         Each patient's meal scenario and CGM noise are seeded from global_seed and the patient name.
     animate (bool, optional): Whether to animate the simulation. Defaults to False.
     parallel (bool, optional): Whether to run simulations in parallel. Defaults to True.
     patient_names (list, optional): List of patient IDs to simulate.
@@ -0,0 +1,207 @@
+import hashlib
+import json
+import os
+
+import numpy as np
+import pandas as pd
+
+from meal_identification.datasets.dataset_operations import load_sim_patient
+
+# Integer code stored for each label value, absent labels are not stored
+LABEL_CODES = {'ANNOUNCE_MEAL': 1}
+
+SIDECAR_SUFFIX = '.labels.json'
+
+
+def file_sha256(file_path, chunk_size=1 << 20):
+    """
+    Hash of a file's content, used to tie sidecar labels to the exact base file they were made from.
+    """
+    sha = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            sha.update(chunk)
+    return sha.hexdigest()
+
+
+def save_label_sidecar(labels_df, base_file_path, output_path, metadata=None, base_sha256=None):
+    """
+    Save label columns as a compact sidecar table referencing the base file they belong to.
+
+    Only labelled rows are stored, as offsets in seconds from the first timestamp of the base file
+    and a label code (see LABEL_CODES). An empty labels_df gives empty offset and code lists and
+    no start.
+
+    Parameters
+    ----------
+    labels_df : pd.DataFrame
+        Label columns indexed by the base file's dates, e.g. msg_type_log and msg_type_log_shifted
+    base_file_path : str
+        Path of the file labels_df was derived from
+    output_path : str
+        Path of the sidecar file, should end with SIDECAR_SUFFIX
+    metadata : dict, optional
+        Extra JSON serializable information to store, e.g. logger types
+    base_sha256 : str, optional
+        Hash of the base file if already known. Computed from base_file_path otherwise.
+
+    Returns
+    -------
+    str
+        output_path
+    """
+    if base_sha256 is None:
+        base_sha256 = file_sha256(base_file_path)
+
+    index = pd.DatetimeIndex(labels_df.index)
+    start = index[0] if len(index) else None
+    offsets = ((index - start) // pd.Timedelta(seconds=1)).to_numpy() if len(index) else np.array([], dtype=int)
+
+    labels = {}
+    for col in labels_df.columns:
+        values = labels_df[col]
+        codes = values.map(LABEL_CODES)
+        mask = codes.notna().to_numpy()
+        unknown = values.notna().to_numpy() & ~mask
+        if unknown.any():
+            raise ValueError(f"Column {col} has labels without a code: {set(values[unknown])}")
+        labels[col] = {
+            'offset_s': offsets[mask].tolist(),
+            'code': codes[mask].astype(int).tolist(),
+        }
+
+    sidecar = {
+        'base_file': os.path.basename(base_file_path),
+        'base_path': os.path.relpath(os.path.abspath(base_file_path),
+                                     os.path.dirname(os.path.abspath(output_path))),
+        'base_sha256': base_sha256,
+        'start': None if start is None else start.isoformat(),
+        'n_rows': len(labels_df),
+        'label_codes': LABEL_CODES,
+        'metadata': metadata or {},
+        'labels': labels,
+    }
+    with open(output_path, 'w') as f:
+        json.dump(sidecar, f)
+
+    return output_path
+
+
+class LabelSidecar:
+    """
+    Obfuscated labels stored in a sidecar file, joined with their base file on demand.
+
+    Only the sidecar is read on creation. The base file is read (and its hash checked) the first time
+    the labels are joined with it, and kept for later calls.
+    """
+
+    def __init__(self, sidecar_path):
+        """
+        Parameters
+        ----------
+        sidecar_path : str
+            Path of a file written by save_label_sidecar
+        """
+        self.sidecar_path = sidecar_path
+        with open(sidecar_path) as f:
+            self._sidecar = json.load(f)
+        self._base_df = None
+
+    @property
+    def base_file(self):
+        return self._sidecar['base_file']
+
+    @property
+    def base_path(self):
+        return os.path.normpath(os.path.join(os.path.dirname(self.sidecar_path), self._sidecar['base_path']))
+
+    @property
+    def metadata(self):
+        return self._sidecar['metadata']
+
+    @property
+    def columns(self):
+        return list(self._sidecar['labels'])
+
+    def events(self, column):
+        """
+        Times labelled in a column, without reading the base file.
+
+        Returns
+        -------
+        pd.DatetimeIndex
+        """
+        offsets = self._sidecar['labels'][column]['offset_s']
+        if self._sidecar['start'] is None:
+            return pd.DatetimeIndex([])
+        return pd.Timestamp(self._sidecar['start']) + pd.to_timedelta(offsets, unit='s')
+
+    def labels(self, index):
+        """
+        Dense label columns on a base index.
+
+        Parameters
+        ----------
+        index : pd.DatetimeIndex
+            Index of the base file
+
+        Returns
+        -------
+        pd.DataFrame
+            One column per stored label column, None where nothing was labelled
+        """
+        decode = {code: label for label, code in self._sidecar['label_codes'].items()}
+        dense = {}
+        for col, table in self._sidecar['labels'].items():
+            positions = index.get_indexer(self.events(col))
+            if (positions < 0).any():
+                raise ValueError(f"Labels of {col} don't line up with the base index of {self.base_file}")
+            values = np.full(len(index), None, dtype=object)
+            values[positions] = [decode[code] for code in table['code']]
+            dense[col] = values
+        return pd.DataFrame(dense, index=index)
+
+    def load_base(self, loader=load_sim_patient, verify=True):
+        """
+        Read the base file the labels were derived from.
+
+        Parameters
+        ----------
+        loader : callable, optional
+            Function reading the base file path into a DataFrame indexed by date.
+            Defaults to load_sim_patient
+        verify : bool, optional
+            Check the base file still has the hash it had when the labels were saved
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        if self._base_df is None:
+            if verify and file_sha256(self.base_path) != self._sidecar['base_sha256']:
+                raise ValueError(f"{self.base_path} changed since the labels in {self.sidecar_path} were saved")
+            self._base_df = loader(self.base_path)
+        return self._base_df
+
+    def join(self, base_df=None, loader=load_sim_patient, verify=True):
+        """
+        Base frame with the label columns added.
+
+        Parameters
+        ----------
+        base_df : pd.DataFrame, optional
+            Already loaded base frame
+        loader : callable, optional
+            Function reading the base file if base_df is None, see load_base
+        verify : bool, optional
+            Check the base file hash before reading it
+
+        Returns
+        -------
+        pd.DataFrame
+        """
+        if base_df is None:
+            base_df = self.load_base(loader, verify=verify)
+        if len(base_df) != self._sidecar['n_rows']:
+            raise ValueError(f"{self.base_file} has {len(base_df)} rows, labels expect {self._sidecar['n_rows']}")
+        return base_df.join(self.labels(base_df.index))
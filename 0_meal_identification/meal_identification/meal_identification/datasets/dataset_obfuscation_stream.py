@@ -0,0 +1,135 @@
+import queue
+import threading
+
+import pandas as pd
+
+from meal_identification.datasets.dataset_data_obfuscator import obfuscate_replica
+
+# Put by the worker once every epoch has been produced
+_END_OF_STREAM = object()
+
+
+class ObfuscatedLabelStream:
+    """
+    Freshly obfuscated meal labels of one patient for every training epoch.
+
+    Instead of saving obfuscated copies with start(), each epoch runs logging_behaviour_obfuscator and
+    logging_timing_obfuscator on the patient's meals again. Epochs are computed in a background thread
+    and up to `prefetch` of them are kept ready, so the next labels are available as soon as the
+    training loop asks for them.
+
+    Epoch k uses the same generator as replica k of obfuscate_replicas, so a stream is reproducible
+    given global_seed and job_key, and iterating it again yields the same epochs.
+
+    Example
+    -------
+    >>> stream = ObfuscatedLabelStream(patient_df, n_epochs=10, global_seed=42, job_key='500030.csv')
+    >>> for labels_df, (logger_type, logger_timing) in stream:
+    ...     train_model_instance(data_path, model_path, labels=labels_df['msg_type_log_shifted'])
+    """
+
+    def __init__(
+            self,
+            patient_df,
+            n_epochs=None,
+            global_seed=None,
+            job_key='',
+            prefetch=2,
+            distribution_logging_behaviour=None,
+            distribution_logging_timing=None
+    ):
+        """
+        Parameters
+        ----------
+        patient_df : pd.DataFrame
+            Patient data indexed by date with 'msg_type' and 'food_g' columns. Not modified.
+        n_epochs : int, optional
+            Number of epochs to yield. None yields epochs until the iteration is stopped.
+        global_seed : int, optional
+            Seed of the run
+        job_key : str, optional
+            Stable name of the patient, e.g. its file name
+        prefetch : int, optional
+            Number of epochs computed ahead of the training loop
+        distribution_logging_behaviour : list, optional
+            Ranges passed to logging_behaviour_obfuscator
+        distribution_logging_timing : list, optional
+            Ranges passed to logging_timing_obfuscator
+        """
+        if prefetch < 1:
+            raise ValueError(f"prefetch must be at least 1, got {prefetch}")
+
+        # Only the meal columns are needed, the worker never touches glucose data
+        self._meals_df = patient_df[['msg_type', 'food_g']].copy()
+        self.n_epochs = n_epochs
+        self.global_seed = global_seed
+        self.job_key = job_key
+        self.prefetch = prefetch
+        self.distribution_logging_behaviour = distribution_logging_behaviour
+        self.distribution_logging_timing = distribution_logging_timing
+
+    def __len__(self):
+        if self.n_epochs is None:
+            raise TypeError("Stream without n_epochs has no length")
+        return self.n_epochs
+
+    def epoch(self, k):
+        """
+        Compute the labels of epoch k in the current thread.
+
+        Returns
+        -------
+        tuple(labels_df, (logger_type, logger_timing))
+         - labels_df: DataFrame with patient_df's index and columns msg_type_log, msg_type_log_shifted
+        """
+        msg_type_log, msg_type_log_shifted, logger_types = obfuscate_replica(
+            self._meals_df.copy(), k, self.global_seed, self.job_key,
+            self.distribution_logging_behaviour, self.distribution_logging_timing
+        )
+        labels_df = pd.DataFrame({
+            'msg_type_log': msg_type_log,
+            'msg_type_log_shifted': msg_type_log_shifted,
+        }, index=self._meals_df.index)
+        return labels_df, logger_types
+
+    def _produce(self, epochs, stop):
+        """Worker loop, puts epochs (or the error that stopped it) on the queue until stopped."""
+        k = 0
+        try:
+            while not stop.is_set() and (self.n_epochs is None or k < self.n_epochs):
+                item = self.epoch(k)
+                k += 1
+                # Wait for room without missing a stop request
+                while not stop.is_set():
+                    try:
+                        epochs.put(item, timeout=0.1)
+                        break
+                    except queue.Full:
+                        continue
+            item = _END_OF_STREAM
+        except Exception as e:
+            item = e
+        while not stop.is_set():
+            try:
+                epochs.put(item, timeout=0.1)
+                break
+            except queue.Full:
+                continue
+
+    def __iter__(self):
+        epochs = queue.Queue(maxsize=self.prefetch)
+        stop = threading.Event()
+        worker = threading.Thread(target=self._produce, args=(epochs, stop), daemon=True)
+        worker.start()
+        try:
+            while True:
+                item = epochs.get()
+                if item is _END_OF_STREAM:
+                    return
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Also reached when the training loop stops early
+            stop.set()
+            worker.join()
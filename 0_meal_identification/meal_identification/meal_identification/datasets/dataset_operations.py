@@ -66,6 +66,25 @@ def load_data(raw_data_path, keep_cols):
     print("Loaded DataFrames:", list(dataframes.keys()))
     return dataframes
 
+def load_sim_patient(file_path):
+    """
+    Load a simulated patient file from data/raw/sim indexed by date.
+
+    Parameters
+    ----------
+    file_path : str
+        Path to the simulated patient csv
+
+    Returns
+    -------
+    pd.DataFrame
+        The patient data with a DatetimeIndex named 'date'
+    """
+    df = pd.read_csv(file_path, parse_dates=['date']).drop('Unnamed: 0', axis=1)
+    df = df.set_index('date')
+    df.index = pd.DatetimeIndex(df.index)
+    return df
+
 def find_file_loc(output_dir, patient_id):
     """
     Find the directory with given output directory
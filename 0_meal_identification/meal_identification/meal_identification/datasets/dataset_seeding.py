@@ -0,0 +1,51 @@
+import zlib
+
+import numpy as np
+
+
+def job_seed_sequence(global_seed, job_key):
+    """
+    Derive the seed sequence of a single job (patient, file, replica...) from a global seed.
+
+    The job's sequence is spawned from the global seed using a key computed from the job's
+    name rather than its position, so results do not change when jobs are reordered or
+    distributed across processes.
+
+    Parameters
+    ----------
+    global_seed : int or None
+        Seed of the whole run. None draws fresh entropy from the OS.
+    job_key : str or tuple of str
+        Stable identifier of the job, e.g. a patient name or file name
+
+    Returns
+    -------
+    np.random.SeedSequence
+    """
+    if isinstance(job_key, str):
+        job_key = (job_key,)
+    spawn_key = tuple(zlib.crc32(str(key).encode('utf-8')) for key in job_key)
+    return np.random.SeedSequence(entropy=global_seed, spawn_key=spawn_key)
+
+
+def job_rng(global_seed, job_key):
+    """
+    Independent random generator of a single job, see job_seed_sequence.
+
+    Returns
+    -------
+    np.random.Generator
+    """
+    return np.random.default_rng(job_seed_sequence(global_seed, job_key))
+
+
+def job_int_seed(global_seed, job_key):
+    """
+    Integer seed of a single job for libraries that only accept int seeds (e.g. simglucose).
+
+    Returns
+    -------
+    int
+        Seed in [0, 2**32)
+    """
+    return int(job_seed_sequence(global_seed, job_key).generate_state(1)[0])
@@ -0,0 +1,209 @@
+import cProfile
+import json
+import os
+import pstats
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+import pandas as pd
+import typer
+from loguru import logger
+
+from meal_identification.config import REPORTS_DIR
+from meal_identification.datasets.dataset_glucose_simulator import run_glucose_simulation
+
+app = typer.Typer()
+
+BENCHMARK_DIR = REPORTS_DIR / "benchmarks"
+BENCHMARK_FILE = BENCHMARK_DIR / "simulation_benchmark.jsonl"
+
+# Fixed cohort so results are comparable between runs
+BENCHMARK_PATIENTS = ['adult#001', 'adolescent#001', 'child#001']
+BENCHMARK_DAYS = 1
+BENCHMARK_SEED = 123
+
+# (path suffix, function name) of the simglucose functions each component is attributed to
+SIMULATION_COMPONENTS = {
+    'patient_ode': ('simglucose/patient/t1dpatient.py', 'step'),
+    'controller': ('simglucose/controller/basal_bolus_ctrller.py', 'policy'),
+    'sensor': ('simglucose/sensor/cgm.py', 'measure'),
+    'csv_writing': ('simglucose/simulation/sim_engine.py', 'save_results'),
+    'report_plotting': ('simglucose/analysis/report.py', 'report'),
+}
+
+
+def component_times(profile_stats):
+    """
+    Sum the cumulative time spent in each simulation component.
+
+    Parameters
+    ----------
+    profile_stats : pstats.Stats
+        Stats collected while running the simulation
+
+    Returns
+    -------
+    dict
+        Seconds spent per component name in SIMULATION_COMPONENTS
+    """
+    times = {name: 0.0 for name in SIMULATION_COMPONENTS}
+    for (filename, _, func_name), (_, _, _, cumtime, _) in profile_stats.stats.items():
+        filename = filename.replace(os.sep, '/')
+        for name, (path_suffix, target_func) in SIMULATION_COMPONENTS.items():
+            if func_name == target_func and filename.endswith(path_suffix):
+                times[name] += cumtime
+    return times
+
+
+def run_simulation_benchmark(
+        patient_names=None,
+        simulation_days=BENCHMARK_DAYS,
+        global_seed=BENCHMARK_SEED,
+        cgm_name="Dexcom",
+        insulin_pump_name="Cozmo",
+):
+    """
+    Run run_glucose_simulation on a fixed cohort under cProfile and measure its throughput.
+    The simulation runs serially because the profiler only sees the current process.
+
+    Parameters
+    ----------
+    patient_names : list of str, optional
+        Cohort to simulate. Defaults to BENCHMARK_PATIENTS.
+    simulation_days : int, optional
+        Simulated days per patient.
+    global_seed : int, optional
+        Seed for the random scenario and CGM sensor.
+    cgm_name : str, optional
+        Name of the cgm device.
+    insulin_pump_name : str, optional
+        Name of the insulin pump device.
+
+    Returns
+    -------
+    dict
+        Benchmark record with wall time, patient-days/sec and seconds per component
+    """
+    if patient_names is None:
+        patient_names = BENCHMARK_PATIENTS
+
+    profiler = cProfile.Profile()
+    with tempfile.TemporaryDirectory() as save_path:
+        tic = time.perf_counter()
+        profiler.enable()
+        run_glucose_simulation(
+            start_time=pd.Timestamp('2024-01-01 00:00:00'),
+            simulation_days=simulation_days,
+            scenario_type='random',
+            patient_names=patient_names,
+            cgm_name=cgm_name,
+            insulin_pump_name=insulin_pump_name,
+            global_seed=global_seed,
+            animate=False,
+            parallel=False,
+            save_path=save_path,
+        )
+        profiler.disable()
+        wall_time = time.perf_counter() - tic
+
+    patient_days = len(patient_names) * simulation_days
+    return {
+        'timestamp': datetime.now().isoformat(timespec='seconds'),
+        'patient_names': list(patient_names),
+        'simulation_days': simulation_days,
+        'global_seed': global_seed,
+        'cgm_name': cgm_name,
+        'insulin_pump_name': insulin_pump_name,
+        'patient_days': patient_days,
+        'wall_time_s': wall_time,
+        'patient_days_per_sec': patient_days / wall_time,
+        'components_s': component_times(pstats.Stats(profiler)),
+    }
+
+
+def load_benchmark_results(results_file=BENCHMARK_FILE):
+    """
+    Load the stored benchmark records, oldest first.
+
+    Parameters
+    ----------
+    results_file : Path, optional
+        JSON lines file the records are appended to
+
+    Returns
+    -------
+    list of dict
+    """
+    if not os.path.exists(results_file):
+        return []
+    with open(results_file) as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def save_benchmark_result(record, results_file=BENCHMARK_FILE):
+    """Append a benchmark record to the results file."""
+    os.makedirs(os.path.dirname(results_file), exist_ok=True)
+    with open(results_file, 'a') as f:
+        f.write(json.dumps(record) + '\n')
+
+
+def check_regression(record, previous_records, tolerance=0.2):
+    """
+    Compare a record against the best previous run of the same cohort.
+
+    Parameters
+    ----------
+    record : dict
+        Record returned by run_simulation_benchmark
+    previous_records : list of dict
+        Stored records to compare against
+    tolerance : float, optional
+        Allowed relative drop in patient-days/sec before it counts as a regression
+
+    Returns
+    -------
+    bool
+        True if throughput dropped by more than tolerance
+    """
+    config_keys = ['patient_names', 'simulation_days', 'global_seed', 'cgm_name', 'insulin_pump_name']
+    comparable = [
+        r for r in previous_records
+        if all(r.get(key) == record[key] for key in config_keys)
+    ]
+    if not comparable:
+        return False
+
+    best = max(r['patient_days_per_sec'] for r in comparable)
+    return record['patient_days_per_sec'] < (1 - tolerance) * best
+
+
+@app.command()
+def main(
+    simulation_days: int = BENCHMARK_DAYS,
+    results_file: Path = BENCHMARK_FILE,
+    tolerance: float = 0.2,
+    save: bool = True,
+):
+    logger.info(f"Benchmarking simulation of {BENCHMARK_PATIENTS} for {simulation_days} day(s)...")
+    previous_records = load_benchmark_results(results_file)
+    record = run_simulation_benchmark(simulation_days=simulation_days)
+
+    logger.info(f"{record['patient_days_per_sec']:.3f} patient-days/sec ({record['wall_time_s']:.1f}s total)")
+    for name, seconds in record['components_s'].items():
+        logger.info(f"  {name}: {seconds:.2f}s ({100 * seconds / record['wall_time_s']:.1f}%)")
+
+    regressed = check_regression(record, previous_records, tolerance=tolerance)
+    if save:
+        save_benchmark_result(record, results_file)
+        logger.info(f"Benchmark result saved to {results_file}")
+
+    if regressed:
+        logger.error(f"Simulation throughput dropped by more than {tolerance:.0%} against previous runs")
+        raise typer.Exit(code=1)
+    logger.success("Simulation benchmark complete.")
+
+
+if __name__ == '__main__':
+    app()
@@ -0,0 +1,230 @@
+from pathlib import Path
+from typing import List, Optional
+import typer
+from loguru import logger
+import pandas as pd
+import numpy as np
+import json
+import os
+from sklearn.base import clone
+
+# Transformer Imports
+from sktime.transformations.series.scaledlogit import ScaledLogitTransformer
+
+from meal_identification.modeling.train import load_features
+from meal_identification.modeling.sweep import expand_grid, run_jobs, DEFAULT_GRID, METRIC_COLUMNS
+
+# Paths
+from meal_identification.config import (
+    REPORTS_DIR,
+    INTERIM_DATA_DIR
+)
+
+app = typer.Typer()
+
+# Column of the interim data holding the (shifted) day each row belongs to, see dataset_generator
+DAY_COLUMN = "day_start_shift"
+
+# Columns of the per-fold table of cross_validate
+FOLD_COLUMNS = (['dataset', 'model', 'params', 'fold', 'train_start', 'train_end', 'test_end', 'status',
+                 'error', 'fit_seconds'] + METRIC_COLUMNS)
+
+
+def day_starts(days):
+    """
+    Positions of the first row of each day.
+
+    Parameters
+    ----------
+    days : array-like
+        Day of each row, sorted, e.g. the day_start_shift column.
+
+    Returns
+    -------
+    np.ndarray
+    """
+    days = np.asarray(days)
+    if len(days) == 0:
+        return np.array([], dtype=int)
+    return np.concatenate([[0], np.flatnonzero(days[1:] != days[:-1]) + 1])
+
+
+def rolling_origin_folds(starts, n_rows, initial_days=7, horizon_days=1, step_days=1, max_train_days=None,
+                         max_folds=None):
+    """
+    Day-aligned train/test folds whose origin rolls forward through the series.
+
+    Fold k trains on the days before its origin, initial_days + k * step_days, and tests on the
+    horizon_days after it. The training window expands from the first day, or keeps the last
+    max_train_days days (a rolling window), which bounds the cost of each refit so the total cost
+    grows linearly with the number of folds rather than quadratically.
+
+    Parameters
+    ----------
+    starts : np.ndarray
+        Positions of the first row of each day, see day_starts.
+    n_rows : int
+        Number of rows of the series.
+    initial_days : int, optional
+        Days in the first training window, by default 7.
+    horizon_days : int, optional
+        Days tested in each fold, by default 1.
+    step_days : int, optional
+        Days the origin moves between folds, by default 1.
+    max_train_days : int or None, optional
+        Length of a rolling training window in days, by default an expanding window.
+    max_folds : int or None, optional
+        Keep only the last max_folds folds, by default every fold.
+
+    Returns
+    -------
+    list of tuple(int, int, int)
+        train_start, train_end (= test start) and test_end row positions of each fold.
+    """
+    boundaries = np.append(starts, n_rows)
+    n_days = len(starts)
+    folds = []
+    for origin in range(initial_days, n_days - horizon_days + 1, step_days):
+        first_day = 0 if max_train_days is None else max(0, origin - max_train_days)
+        folds.append((int(boundaries[first_day]), int(boundaries[origin]), int(boundaries[origin + horizon_days])))
+    if max_folds is not None:
+        folds = folds[-max_folds:] if max_folds > 0 else []
+    return folds
+
+
+def cross_validate(data_paths, grid, transformer=None, initial_days=7, horizon_days=1, step_days=1,
+                   max_train_days=None, max_folds=None, supervised=False, n_jobs=None, timeout=None,
+                   cache_dir=None):
+    """
+    Rolling-origin cross-validation of a grid of models on each dataset.
+
+    Each dataset is loaded and transformed once and every fold is a slice of the same features.
+    This assumes the transformer is stateless, as ScaledLogitTransformer (fixed bounds) is: a
+    transformer learning from the data would see the test days of each fold. All the fits of every
+    dataset, model and fold run in parallel processes, see sweep.run_jobs.
+
+    Parameters
+    ----------
+    data_paths : list of Path
+        Interim data CSV files with a day_start_shift column.
+    grid : dict
+        Models and hyperparameters to evaluate, see sweep.expand_grid.
+    transformer : sktime transformer, optional
+        Transformer of the features, by default ScaledLogitTransformer().
+    initial_days, horizon_days, step_days, max_train_days, max_folds :
+        Fold layout, see rolling_origin_folds.
+    supervised, n_jobs, timeout :
+        See sweep.run_jobs.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache, see load_features. By default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (dataset, model, hyperparameters, fold) with the columns of FOLD_COLUMNS,
+        see summarize_folds to aggregate them.
+    """
+    if transformer is None:
+        transformer = ScaledLogitTransformer()
+    combinations = expand_grid(grid)
+
+    rows, jobs = [], []
+    for data_path in data_paths:
+        features = load_features(data_path, transformer=clone(transformer), cache_dir=cache_dir)
+        if features is None:
+            logger.error(f"Skipping {data_path}, its data could not be prepared.")
+            continue
+        X, Y = features
+        days = pd.read_csv(data_path, usecols=[DAY_COLUMN])[DAY_COLUMN]
+        folds = rolling_origin_folds(day_starts(days), len(X), initial_days=initial_days,
+                                     horizon_days=horizon_days, step_days=step_days,
+                                     max_train_days=max_train_days, max_folds=max_folds)
+        if not folds:
+            logger.warning(f"{data_path} has too few days for a single fold.")
+
+        for model_name, params in combinations:
+            for fold, (train_start, train_end, test_end) in enumerate(folds):
+                rows.append({'dataset': str(data_path), 'model': model_name,
+                             'params': json.dumps(params, sort_keys=True, default=str), 'fold': fold,
+                             'train_start': train_start, 'train_end': train_end, 'test_end': test_end})
+                data = (X.iloc[train_start:train_end], X.iloc[train_end:test_end],
+                        Y.iloc[train_start:train_end], Y.iloc[train_end:test_end])
+                jobs.append((model_name, params, data))
+
+    logger.info(f"Running {len(jobs)} fits for cross-validation")
+    for row, result in zip(rows, run_jobs(jobs, supervised=supervised, n_jobs=n_jobs, timeout=timeout)):
+        row.update(result)
+
+    return pd.DataFrame(rows, columns=FOLD_COLUMNS)
+
+
+def summarize_folds(folds):
+    """
+    Aggregate the folds of cross_validate.
+
+    Parameters
+    ----------
+    folds : pd.DataFrame
+        Result of cross_validate.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (dataset, model, hyperparameters): number of folds, number of successful folds,
+        total fit time, and the mean and standard deviation of each metric over the successful folds
+        where it is defined, with the number of successful folds where it is not (n_undefined, e.g.
+        the hausdorff_error of a test day without meals).
+    """
+    keys = ['dataset', 'model', 'params']
+    grouped = folds.groupby(keys, sort=False)
+    summary = pd.DataFrame({
+        'n_folds': grouped.size(),
+        'n_ok': grouped['status'].agg(lambda status: int((status == 'ok').sum())),
+        'fit_seconds': grouped['fit_seconds'].sum(),
+    })
+    ok = folds[folds['status'] == 'ok']
+    metrics = ok.groupby(keys, sort=False)[METRIC_COLUMNS].agg(['mean', 'std'])
+    metrics.columns = [f"{metric}_{stat}" for metric, stat in metrics.columns]
+    undefined = ok[METRIC_COLUMNS].isna().groupby([ok[key] for key in keys], sort=False).sum()
+    metrics = metrics.join(undefined.add_suffix('_n_undefined'))
+    return summary.join(metrics).reset_index()
+
+
+@app.command()
+def main(
+    data_paths: Optional[List[Path]] = typer.Option(None, "--data-path"),
+    grid_path: Optional[Path] = None,
+    initial_days: int = 7,
+    horizon_days: int = 1,
+    step_days: int = 1,
+    max_train_days: Optional[int] = None,
+    output_path: Path = REPORTS_DIR / "cross_validation.csv",
+    n_jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    cache_dir: Optional[Path] = None,
+):
+    """
+    Cross-validate a grid of models (see sweep.main) with rolling-origin folds and save the per-fold
+    metrics and their summary.
+    """
+    if not data_paths:
+        data_paths = [INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"]
+    grid = DEFAULT_GRID
+    if grid_path is not None:
+        with open(grid_path) as f:
+            grid = json.load(f)
+
+    folds = cross_validate(data_paths, grid, initial_days=initial_days, horizon_days=horizon_days,
+                           step_days=step_days, max_train_days=max_train_days, n_jobs=n_jobs,
+                           timeout=timeout, cache_dir=cache_dir)
+    summary = summarize_folds(folds)
+
+    os.makedirs(output_path.parent, exist_ok=True)
+    folds.to_csv(output_path, index=False)
+    summary_path = output_path.with_name(f"{output_path.stem}_summary.csv")
+    summary.to_csv(summary_path, index=False)
+    logger.success(f"Cross-validation results saved to {output_path} and {summary_path}")
+
+
+if __name__ == "__main__":
+    app()
@@ -0,0 +1,102 @@
+from pathlib import Path
+from loguru import logger
+import pandas as pd
+import numpy as np
+import json
+import os
+import shutil
+import tempfile
+
+from meal_identification.datasets.dataset_label_sidecar import file_sha256
+from meal_identification.transformations.pipeline_cache import step_cache_key
+
+# Bumped whenever the preprocessing of prepare_data changes, so older entries are not reused
+FEATURE_CACHE_VERSION = 1
+
+
+class FeatureCache:
+    """
+    Transformed features and processed labels of data files, saved as .npy arrays that are memory
+    mapped when loaded.
+
+    Entries are keyed by the sha256 of the data file and the class and parameters of the
+    transformer (see pipeline_cache.step_cache_key), so a file is only preprocessed again when its
+    content or the transformer changes. Loading an entry reads no data up front: the returned
+    DataFrames are backed by read-only memory maps, and the pages used by a fit are shared between
+    the processes training on the same data.
+
+    Usage:
+        cache = FeatureCache(".../data/cache/features")
+        key = cache.key(data_path, ScaledLogitTransformer())
+        cached = cache.load(key)       # (X, Y) or None
+        cache.save(key, X, Y)
+    """
+
+    def __init__(self, cache_dir):
+        """
+        Parameters
+        ----------
+        cache_dir : str or Path
+            Directory of the cache, created if missing.
+        """
+        self.cache_dir = Path(cache_dir)
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def key(self, data_path, transformer):
+        """
+        Cache key of a data file preprocessed with transformer
+
+        Returns
+        -------
+        str
+        """
+        return step_cache_key(f"v{FEATURE_CACHE_VERSION}:{file_sha256(data_path)}", transformer)
+
+    def load(self, key):
+        """
+        Cached features and labels
+
+        Returns
+        -------
+        tuple(pd.DataFrame, pd.DataFrame) or None
+            X and Y, or None if key is not cached
+        """
+        entry = self.cache_dir / key
+        if not entry.is_dir():
+            return None
+        with open(entry / "meta.json") as f:
+            meta = json.load(f)
+        X = np.load(entry / "X.npy", mmap_mode="r")
+        Y = np.load(entry / "Y.npy", mmap_mode="r")
+        index = pd.Index(np.load(entry / "index.npy")) if meta["index"] else pd.RangeIndex(len(X))
+        frames = [pd.DataFrame(values, index=index, columns=meta[f"{name}_columns"], copy=False)
+                  for name, values in (("X", X), ("Y", Y))]
+        logger.info(f"Features loaded from cache {entry}")
+        return tuple(frames)
+
+    def save(self, key, X, Y):
+        """
+        Cache features X and labels Y. Each frame is stored as one 2D array, so its columns must
+        share a numeric dtype, and the index must be numeric or datetime.
+        """
+        entry = self.cache_dir / key
+        if entry.is_dir():
+            return
+        # Write to a temporary directory moved into place at the end, so a concurrent reader or
+        # writer never sees a partial entry
+        tmp_dir = tempfile.mkdtemp(dir=self.cache_dir, prefix=".tmp_")
+        try:
+            has_index = not X.index.equals(pd.RangeIndex(len(X)))
+            if has_index:
+                np.save(os.path.join(tmp_dir, "index.npy"), X.index.to_numpy())
+            np.save(os.path.join(tmp_dir, "X.npy"), X.to_numpy())
+            np.save(os.path.join(tmp_dir, "Y.npy"), Y.to_numpy())
+            with open(os.path.join(tmp_dir, "meta.json"), "w") as f:
+                json.dump({"X_columns": list(X.columns), "Y_columns": list(Y.columns), "index": has_index}, f)
+            os.rename(tmp_dir, entry)
+        except OSError:
+            # Another process saved the same entry first
+            if not entry.is_dir():
+                raise
+        finally:
+            shutil.rmtree(tmp_dir, ignore_errors=True)
@@ -0,0 +1,24 @@
+# sktime's HMM annotators (GaussianHMM, GMMHMM, PoissonHMM) keep the hmmlearn estimator they fit in
+# a private attribute. Every access to it goes through these two functions, which
+# tests/model_training/test_hmm_estimator.py checks against the installed sktime.
+
+
+def get_hmm_estimator(model):
+    """
+    hmmlearn estimator wrapped by a fitted sktime HMM annotator, None for unfitted or other models.
+    """
+    return getattr(model, "_hmm_estimator", None)
+
+
+def set_hmm_estimator(model, estimator):
+    """
+    Make an sktime HMM annotator use an hmmlearn estimator, which is fitted separately (see
+    train.fit_hmm), as if model.fit had fitted it.
+
+    Returns
+    -------
+    model
+    """
+    model._hmm_estimator = estimator
+    model._is_fitted = True
+    return model
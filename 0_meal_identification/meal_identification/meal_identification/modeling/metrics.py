@@ -0,0 +1,188 @@
+import numpy as np
+import pandas as pd
+
+# Metrics computed by evaluate_model on the training and validation sets
+METRIC_NAMES = ['count_error', 'hausdorff_error', 'prediction_ratio', 'precision', 'recall', 'detection_delay']
+
+# Metrics where higher is better, the others are errors
+HIGHER_IS_BETTER = ['precision', 'recall']
+
+# Default tolerance of a detection, in rows: one hour of 5 minute data
+DEFAULT_TOLERANCE = 12
+
+
+def label_events(labels):
+    """
+    Positions of the meals in a label series.
+
+    Parameters
+    ----------
+    labels : array-like
+        Processed labels, 1 at meals and 0 elsewhere (see process_labels). A one column DataFrame
+        is accepted.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions.
+    """
+    return np.flatnonzero(np.asarray(labels).reshape(-1) == 1)
+
+
+def change_points(states):
+    """
+    Positions where a predicted state sequence (e.g. HMM hidden states or segment labels) changes.
+
+    Returns
+    -------
+    np.ndarray
+        Sorted positions of the first row of each new segment.
+    """
+    states = np.asarray(states).reshape(-1)
+    return np.flatnonzero(states[1:] != states[:-1]) + 1
+
+
+def nearest_distances(events, reference):
+    """
+    Distance from each event to the nearest reference event, found with a binary search.
+
+    Parameters
+    ----------
+    events : array-like
+        Positions.
+    reference : array-like
+        Sorted positions.
+
+    Returns
+    -------
+    np.ndarray
+        One distance per event, inf if there are no reference events.
+    """
+    events = np.asarray(events, dtype=float)
+    reference = np.asarray(reference, dtype=float)
+    if len(reference) == 0:
+        return np.full(len(events), np.inf)
+    right = np.searchsorted(reference, events).clip(max=len(reference) - 1)
+    left = (right - 1).clip(min=0)
+    return np.minimum(np.abs(events - reference[left]), np.abs(reference[right] - events))
+
+
+def count_error(true_events, pred_events):
+    """
+    Difference between the number of true and predicted events
+    """
+    return abs(len(true_events) - len(pred_events))
+
+
+def hausdorff_error(true_events, pred_events):
+    """
+    Symmetric Hausdorff distance between the true and predicted events: the largest distance from
+    an event of either set to the nearest event of the other one. 0 if both are empty.
+
+    The distance is undefined when only one set is empty and nan is returned rather than inf, so
+    that averages over folds or datasets can skip it (np.nanmean) and count it separately instead
+    of becoming infinite.
+    """
+    if len(true_events) == 0 and len(pred_events) == 0:
+        return 0.0
+    if len(true_events) == 0 or len(pred_events) == 0:
+        return np.nan
+    return float(max(nearest_distances(true_events, pred_events).max(),
+                     nearest_distances(pred_events, true_events).max()))
+
+
+def prediction_ratio(true_events, pred_events):
+    """
+    Number of predicted events per true event, nan if there are no true events
+    """
+    if len(true_events) == 0:
+        return np.nan
+    return len(pred_events) / len(true_events)
+
+
+def precision_recall(true_events, pred_events, tolerance=DEFAULT_TOLERANCE):
+    """
+    Precision and recall of the predicted events within a tolerance.
+
+    A predicted event is correct if a true event is at most tolerance rows away, and a true event
+    is detected if a predicted event is at most tolerance rows away.
+
+    Returns
+    -------
+    tuple(float, float)
+        precision and recall, nan when there are no predicted (resp. true) events.
+    """
+    precision = (nearest_distances(pred_events, true_events) <= tolerance).mean() if len(pred_events) else np.nan
+    recall = (nearest_distances(true_events, pred_events) <= tolerance).mean() if len(true_events) else np.nan
+    return float(precision), float(recall)
+
+
+def detection_delays(true_events, pred_events, tolerance=DEFAULT_TOLERANCE):
+    """
+    Rows between each true event and the first predicted event at or after it.
+
+    Returns
+    -------
+    np.ndarray
+        One delay per true event, nan if no event is predicted within tolerance rows after it.
+    """
+    true_events = np.asarray(true_events)
+    pred_events = np.asarray(pred_events)
+    delays = np.full(len(true_events), np.nan)
+    if len(pred_events) == 0:
+        return delays
+    after = np.searchsorted(pred_events, true_events)
+    found = after < len(pred_events)
+    delay = pred_events[after[found]] - true_events[found]
+    delays[np.flatnonzero(found)[delay <= tolerance]] = delay[delay <= tolerance]
+    return delays
+
+
+def annotation_metrics(labels, states, tolerance=DEFAULT_TOLERANCE):
+    """
+    Every metric of METRIC_NAMES, comparing the meals of labels with the change points of states.
+
+    Parameters
+    ----------
+    labels : array-like
+        Processed labels, see label_events.
+    states : array-like
+        Predicted state of each row, see change_points.
+    tolerance : int, optional
+        Rows a detection can be away from a meal, by default DEFAULT_TOLERANCE.
+
+    Returns
+    -------
+    dict
+        detection_delay is the mean delay of the detected meals.
+    """
+    true_events = label_events(labels)
+    pred_events = change_points(states)
+    precision, recall = precision_recall(true_events, pred_events, tolerance)
+    delays = detection_delays(true_events, pred_events, tolerance)
+    return {
+        'count_error': count_error(true_events, pred_events),
+        'hausdorff_error': hausdorff_error(true_events, pred_events),
+        'prediction_ratio': prediction_ratio(true_events, pred_events),
+        'precision': precision,
+        'recall': recall,
+        'detection_delay': float(np.nanmean(delays)) if np.isfinite(delays).any() else np.nan,
+    }
+
+
+def metric_loss(value, metric):
+    """
+    Loss of a metric value, lower is better. prediction_ratio is best at 1, precision and recall
+    at 1, the errors at 0. Missing values (failed or timed out fits) have an infinite loss, while
+    undefined metrics (nan, e.g. the hausdorff_error of a split without meals) have a nan loss that
+    is left out of averages. Used to rank models by search and profiling.cost_accuracy.
+    """
+    if value is None:
+        return np.inf
+    if pd.isna(value):
+        return np.nan
+    if metric.endswith('prediction_ratio'):
+        return abs(value - 1)
+    if metric.split('_', 1)[1] in HIGHER_IS_BETTER:
+        return 1 - value
+    return value
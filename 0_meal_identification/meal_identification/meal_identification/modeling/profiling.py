@@ -0,0 +1,181 @@
+from pathlib import Path
+from contextlib import contextmanager
+import pandas as pd
+import numpy as np
+import json
+import mmap
+import threading
+import time
+
+from meal_identification.modeling.metrics import metric_loss
+from meal_identification.modeling.hmm_estimator import get_hmm_estimator
+
+# File written next to the model files of a saved model, see save_model
+PROFILE_FILE = "resource_profile.json"
+
+# Seconds between two reads of the resident set size while a block is profiled
+RSS_SAMPLE_INTERVAL = 0.005
+
+
+def rss_mb():
+    """
+    Current resident set size of the process, in MB, None where /proc is unavailable (not Linux).
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * mmap.PAGESIZE / 2 ** 20
+
+
+class _RSSSampler:
+    """
+    Read the resident set size in a background thread and keep its maximum.
+    """
+
+    def __init__(self, interval=RSS_SAMPLE_INTERVAL):
+        self.interval = interval
+        self.start = self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self):
+        if self.start is not None:
+            self._thread.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.start is not None:
+            self._stop.set()
+            self._thread.join()
+            self.peak = max(self.peak, rss_mb())
+
+    @property
+    def increase_mb(self):
+        """
+        Peak resident set size above the one at the start, None where it can't be measured
+        """
+        return None if self.start is None else self.peak - self.start
+
+
+@contextmanager
+def profile_resources(prefix):
+    """
+    Measure the wall time, CPU time and peak memory of a block.
+
+    The memory is the highest resident set size reached during the block minus the one at its
+    start, so blocks run one after the other in the same process (e.g. the models of train.main)
+    are measured on their own. It is sampled every RSS_SAMPLE_INTERVAL seconds, so allocations
+    freed faster than that can be missed, and is None where /proc is unavailable (see rss_mb).
+
+    Usage:
+        with profile_resources("fit") as profile:
+            model.fit(X)
+        profile  # {"fit_wall_seconds": ..., "fit_cpu_seconds": ..., "fit_peak_rss_increase_mb": ...}
+
+    Yields
+    ------
+    dict
+        Filled in when the block ends.
+    """
+    profile = {}
+    wall, cpu = time.perf_counter(), time.process_time()
+    try:
+        with _RSSSampler() as rss:
+            yield profile
+    finally:
+        profile[f"{prefix}_wall_seconds"] = time.perf_counter() - wall
+        profile[f"{prefix}_cpu_seconds"] = time.process_time() - cpu
+        profile[f"{prefix}_peak_rss_increase_mb"] = rss.increase_mb
+
+
+def convergence_info(model):
+    """
+    EM iterations run and convergence of an HMM annotator, None for the other models.
+
+    Returns
+    -------
+    dict
+        n_iter_run and converged
+    """
+    monitor = getattr(get_hmm_estimator(model), "monitor_", None)
+    if monitor is None:
+        return {"n_iter_run": None, "converged": None}
+    return {"n_iter_run": int(monitor.iter), "converged": bool(monitor.converged)}
+
+
+def save_profile(profile, model_path):
+    """
+    Write a profile to the directory of a saved model
+    """
+    with open(Path(model_path) / PROFILE_FILE, "w") as f:
+        json.dump(profile, f, indent=2, default=_json_default)
+
+
+def load_profile(model_path):
+    """
+    Profile of a saved model, None if it has none
+    """
+    path = Path(model_path) / PROFILE_FILE
+    if not path.exists():
+        return None
+    with open(path) as f:
+        return json.load(f)
+
+
+def load_profiles(models_dir):
+    """
+    Profiles of every model saved in models_dir.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per model, indexed by the model's directory name.
+    """
+    profiles = {
+        path.parent.name: load_profile(path.parent)
+        for path in sorted(Path(models_dir).glob(f"*/{PROFILE_FILE}"))
+    }
+    return pd.DataFrame.from_dict(profiles, orient="index")
+
+
+def cost_accuracy(profiles, metric="test_recall", cost="fit_cpu_seconds"):
+    """
+    Compare the cost and accuracy of saved models.
+
+    Parameters
+    ----------
+    profiles : pd.DataFrame
+        See load_profiles.
+    metric : str, optional
+        Accuracy metric, one of the train_ or test_ metrics of evaluate_model, by default "test_recall".
+    cost : str, optional
+        Cost column, e.g. fit_cpu_seconds, fit_peak_rss_increase_mb or predict_wall_seconds, by default
+        "fit_cpu_seconds".
+
+    Returns
+    -------
+    pd.DataFrame
+        model, cost and metric of each model, cheapest first. pareto marks the models that no other
+        model beats on both cost and accuracy, accuracy being ranked by metrics.metric_loss.
+    """
+    table = profiles[["model", cost, metric]].dropna(subset=[cost, metric])
+    # Rank models on the loss of the metric, as search does (prediction_ratio is best at 1)
+    losses = np.array([metric_loss(value, metric) for value in table[metric]], dtype=float)
+    order = np.lexsort((losses, table[cost].to_numpy(dtype=float)))
+    table, losses = table.iloc[order], losses[order]
+
+    # Walking from the cheapest model, a model is on the front if it is more accurate than all cheaper ones
+    best_so_far = np.minimum.accumulate(np.concatenate([[np.inf], losses]))[:-1]
+    return table.assign(pareto=losses < best_so_far)
+
+
+def _json_default(value):
+    if isinstance(value, np.generic):
+        return value.item()
+    return str(value)
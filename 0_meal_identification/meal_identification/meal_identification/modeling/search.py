@@ -0,0 +1,245 @@
+from pathlib import Path
+from typing import List, Optional
+import typer
+from loguru import logger
+import pandas as pd
+import numpy as np
+import json
+import math
+import os
+from sklearn.model_selection import ParameterGrid, ParameterSampler
+
+from meal_identification.modeling.sweep import prepare_datasets, run_jobs, METRIC_COLUMNS
+from meal_identification.modeling.metrics import metric_loss
+
+# Paths
+from meal_identification.config import (
+    REPORTS_DIR,
+    INTERIM_DATA_DIR
+)
+
+app = typer.Typer()
+
+# Hyperparameters searched when no grid is given
+DEFAULT_PARAM_GRIDS = {
+    "GaussianHMM": {"n_components": [2, 3, 4], "covariance_type": ["diag", "full"], "init_params": ["s", "stmc"]},
+    "GMMHMM": {"n_components": [2, 3, 4], "n_mix": [1, 2, 3], "covariance_type": ["diag", "full"]},
+    "PoissonHMM": {"n_components": [2, 3, 4], "init_params": ["s", "stl"]},
+    "GreedyGaussianSegmentation": {"k_max": [3, 5, 10, 20], "lamb": [0.1, 1.0, 10.0]},
+}
+
+# Budget a fit can be given: a fraction of the training data, or a number of EM iterations
+RESOURCES = ["n_samples", "n_iter"]
+
+# Columns of the history table of successive_halving
+HISTORY_COLUMNS = (['bracket', 'rung', 'resource', 'candidate', 'params', 'dataset', 'status', 'error',
+                    'fit_seconds'] + METRIC_COLUMNS + ['loss'])
+
+
+def _candidates(param_grid, n_candidates=None, random_state=None):
+    """
+    Every point of param_grid, or n_candidates points sampled from it (lists are sampled uniformly,
+    scipy distributions are sampled from).
+    """
+    if n_candidates is None:
+        return list(ParameterGrid(param_grid))
+    return list(ParameterSampler(param_grid, n_iter=n_candidates, random_state=random_state))
+
+
+def _with_resource(params, data, resource, amount):
+    """
+    Hyperparameters and data of a fit given amount of resource
+    """
+    if resource == "n_iter":
+        return {**params, 'n_iter': int(amount)}, data
+    X_train, X_val, Y_train, Y_val = data
+    n_rows = max(1, math.ceil(amount * len(X_train)))
+    return params, (X_train.iloc[:n_rows], X_val, Y_train.iloc[:n_rows], Y_val)
+
+
+def successive_halving(datasets, model, candidates, resource="n_samples", min_resource=None,
+                       max_resource=None, eta=3, metric="test_count_error", supervised=False, n_jobs=None,
+                       timeout=None, bracket=0):
+    """
+    Keep the best 1/eta of the candidates after each round of fits, giving eta times more resource
+    to the survivors each round, until the last candidates are fitted with max_resource.
+
+    Parameters
+    ----------
+    datasets : dict
+        Prepared datasets, see sweep.prepare_datasets. A candidate's loss is its mean over the datasets
+        where its metric is defined, candidates without any defined loss rank last.
+    model : str
+        Model to tune, see build_model.
+    candidates : list of dict
+        Hyperparameters to compare.
+    resource : str, optional
+        "n_samples" fits on the first fraction of each training split (resource amounts are fractions
+        in (0, 1]), "n_iter" sets the model's n_iter (HMMs). By default "n_samples".
+    min_resource : float or None, optional
+        Resource of the first round, by default max_resource / eta ** (number of rounds - 1).
+    max_resource : float or None, optional
+        Resource of the last round, by default 1.0 for n_samples and 100 for n_iter.
+    eta : int, optional
+        Fraction of candidates kept and factor by which the resource grows each round, by default 3.
+    metric : str, optional
+        Validation metric to minimise (one of METRIC_COLUMNS), by default "test_count_error".
+    supervised, n_jobs, timeout :
+        See sweep.run_jobs.
+    bracket : int, optional
+        Label of the run in the history, used by hyperband.
+
+    Returns
+    -------
+    dict
+        Best hyperparameters
+    pd.DataFrame
+        Every fit made, with the columns of HISTORY_COLUMNS
+    """
+    if resource not in RESOURCES:
+        raise ValueError(f"Unknown resource {resource}, expected one of {RESOURCES}")
+    if metric not in METRIC_COLUMNS:
+        raise ValueError(f"Unknown metric {metric}, expected one of {METRIC_COLUMNS}")
+    if not candidates:
+        raise ValueError("No candidates to search")
+    datasets = {name: data for name, data in datasets.items() if data is not None}
+    if not datasets:
+        raise ValueError("None of the datasets could be prepared")
+    if max_resource is None:
+        max_resource = 1.0 if resource == "n_samples" else 100
+
+    n_rungs = int(math.floor(math.log(len(candidates), eta) + 1e-9)) + 1
+    if min_resource is None:
+        min_resource = max_resource / eta ** (n_rungs - 1)
+    else:
+        # Fewer rounds if there isn't enough resource to grow by eta each round
+        n_rungs = min(n_rungs, int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9)) + 1)
+
+    history = []
+    alive = list(range(len(candidates)))
+    for rung in range(n_rungs):
+        amount = max_resource if rung == n_rungs - 1 else min_resource * eta ** rung
+        if resource == "n_iter":
+            amount = max(1, int(round(amount)))
+
+        rows, jobs = [], []
+        for candidate in alive:
+            for name, data in datasets.items():
+                params, fit_data = _with_resource(candidates[candidate], data, resource, amount)
+                rows.append({'bracket': bracket, 'rung': rung, 'resource': amount, 'candidate': candidate,
+                             'params': json.dumps(candidates[candidate], sort_keys=True, default=str),
+                             'dataset': name})
+                jobs.append((model, params, fit_data))
+        for row, result in zip(rows, run_jobs(jobs, supervised=supervised, n_jobs=n_jobs, timeout=timeout)):
+            row.update(result)
+            row['loss'] = metric_loss(row.get(metric), metric)
+        history.extend(rows)
+
+        losses = pd.DataFrame(rows).groupby('candidate')['loss'].mean()
+        n_keep = max(1, math.ceil(len(alive) / eta))
+        alive = list(losses.sort_values(kind='stable').index[:n_keep])
+        logger.info(f"Bracket {bracket} rung {rung}: {len(losses)} candidates with {resource}={amount}, "
+                    f"best {metric} loss {losses.min()}")
+
+    best = candidates[alive[0]]
+    return best, pd.DataFrame(history, columns=HISTORY_COLUMNS)
+
+
+def hyperband(datasets, model, param_grid, resource="n_samples", min_resource=None, max_resource=None, eta=3,
+              metric="test_count_error", supervised=False, n_jobs=None, timeout=None, random_state=None):
+    """
+    Run successive_halving brackets trading off the number of candidates against their starting
+    resource: the first bracket samples many candidates and fits them on min_resource, the last one
+    fits a few candidates on max_resource only. The total budget is fixed by max_resource, min_resource
+    and eta.
+
+    Parameters
+    ----------
+    datasets : dict
+        Prepared datasets, see sweep.prepare_datasets.
+    model : str
+        Model to tune, see build_model.
+    param_grid : dict
+        Hyperparameters to sample candidates from, see sklearn's ParameterSampler.
+    min_resource : float or None, optional
+        Smallest resource of a fit, by default max_resource / eta ** 3 (about 4% of the training data
+        for n_samples with eta=3).
+    random_state : int or None, optional
+        Seed of the candidate sampling.
+    resource, max_resource, eta, metric, supervised, n_jobs, timeout :
+        See successive_halving.
+
+    Returns
+    -------
+    dict
+        Best hyperparameters, compared on their fit with max_resource
+    pd.DataFrame
+        Every fit made, with the columns of HISTORY_COLUMNS
+    """
+    if max_resource is None:
+        max_resource = 1.0 if resource == "n_samples" else 100
+    if min_resource is None:
+        min_resource = max_resource / eta ** 3
+    s_max = int(math.floor(math.log(max_resource / min_resource, eta) + 1e-9))
+    rng = np.random.default_rng(random_state)
+
+    histories = []
+    best, best_loss = None, np.inf
+    for bracket, s in enumerate(range(s_max, -1, -1)):
+        n_candidates = math.ceil((s_max + 1) / (s + 1) * eta ** s)
+        candidates = _candidates(param_grid, n_candidates=n_candidates,
+                                 random_state=int(rng.integers(2 ** 31)))
+        params, history = successive_halving(
+            datasets, model, candidates, resource=resource, min_resource=max_resource / eta ** s,
+            max_resource=max_resource, eta=eta, metric=metric, supervised=supervised, n_jobs=n_jobs,
+            timeout=timeout, bracket=bracket,
+        )
+        histories.append(history)
+        last_rung = history[history['rung'] == history['rung'].max()]
+        loss = last_rung[last_rung['params'] == json.dumps(params, sort_keys=True, default=str)]['loss'].mean()
+        if best is None or loss < best_loss:
+            best, best_loss = params, loss
+
+    return best, pd.concat(histories, ignore_index=True)
+
+
+@app.command()
+def main(
+    model: str = "GaussianHMM",
+    data_paths: Optional[List[Path]] = typer.Option(None, "--data-path"),
+    grid_path: Optional[Path] = None,
+    resource: str = "n_samples",
+    eta: int = 3,
+    metric: str = "test_count_error",
+    use_hyperband: bool = typer.Option(False, "--hyperband"),
+    output_path: Path = REPORTS_DIR / "hyperparameter_search.csv",
+    n_jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    random_state: Optional[int] = None,
+):
+    """
+    Tune a model's hyperparameters (a JSON file of parameter name -> values, by default
+    DEFAULT_PARAM_GRIDS[model]) by successive halving or Hyperband and save every fit made.
+    """
+    if not data_paths:
+        data_paths = [INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"]
+    param_grid = DEFAULT_PARAM_GRIDS.get(model, {})
+    if grid_path is not None:
+        with open(grid_path) as f:
+            param_grid = json.load(f)
+
+    datasets = prepare_datasets(data_paths)
+    if use_hyperband:
+        best, history = hyperband(datasets, model, param_grid, resource=resource, eta=eta, metric=metric,
+                                  n_jobs=n_jobs, timeout=timeout, random_state=random_state)
+    else:
+        best, history = successive_halving(datasets, model, _candidates(param_grid), resource=resource,
+                                           eta=eta, metric=metric, n_jobs=n_jobs, timeout=timeout)
+
+    os.makedirs(output_path.parent, exist_ok=True)
+    history.to_csv(output_path, index=False)
+    logger.success(f"Best {model} hyperparameters: {best}, search history saved to {output_path}")
+
+
+if __name__ == "__main__":
+    app()
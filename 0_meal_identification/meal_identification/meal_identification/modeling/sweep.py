@@ -0,0 +1,268 @@
+from pathlib import Path
+from typing import List, Optional
+import typer
+from loguru import logger
+import pandas as pd
+import json
+import multiprocessing
+import os
+import time
+from collections import deque
+from multiprocessing.connection import wait
+from sklearn.base import clone
+from sklearn.model_selection import ParameterGrid
+
+# Transformer Imports
+from sktime.transformations.series.scaledlogit import ScaledLogitTransformer
+
+from meal_identification.modeling.train import prepare_data, build_model, evaluate_model
+from meal_identification.modeling.metrics import METRIC_NAMES
+
+# Paths
+from meal_identification.config import (
+    REPORTS_DIR,
+    INTERIM_DATA_DIR
+)
+
+app = typer.Typer()
+
+# Models trained by train.main, swept with their default hyperparameters
+DEFAULT_GRID = {
+    "PoissonHMM": {},
+    "GaussianHMM": {},
+    "GreedyGaussianSegmentation": {},
+}
+
+# Columns of the results table of run_sweep
+METRIC_COLUMNS = [f'{split}_{name}' for split in ('train', 'test') for name in METRIC_NAMES]
+RESULT_COLUMNS = ['dataset', 'model', 'params', 'status', 'error', 'fit_seconds'] + METRIC_COLUMNS
+
+
+def expand_grid(grid):
+    """
+    List every (model, hyperparameters) combination of a grid.
+
+    Parameters
+    ----------
+    grid : dict
+        Model name -> hyperparameter grid, i.e. a dict (or list of dicts) of parameter name -> list
+        of values as taken by sklearn's ParameterGrid. An empty grid trains the model with the
+        defaults of build_model.
+
+    Returns
+    -------
+    list of tuple(str, dict)
+    """
+    return [(model, params) for model, param_grid in grid.items() for params in ParameterGrid(param_grid)]
+
+
+def _fit_job(conn, model_name, params, data, supervised):
+    """
+    Fit and evaluate one model in a worker process, sending the result back through conn.
+    """
+    try:
+        X_train, X_val, Y_train, Y_val = data
+        model = build_model(model_name, **params)
+        if model is None:
+            raise ValueError(f"Unknown model type: {model_name}")
+        start = time.perf_counter()
+        model.fit(X_train, Y_train) if supervised else model.fit(X_train)
+        fit_seconds = time.perf_counter() - start
+        result = {'status': 'ok', 'fit_seconds': fit_seconds}
+        result.update(evaluate_model(model, X_train, X_val, Y_train, Y_val))
+    except Exception as e:
+        result = {'status': 'error', 'error': repr(e)}
+    conn.send(result)
+    conn.close()
+
+
+def _start_method():
+    """
+    Start method of the fit processes: fork where the platform has it (Linux, macOS), spawn
+    otherwise (Windows).
+    """
+    return "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn"
+
+
+def prepare_datasets(data_paths, transformer=None, validation_split=0.2, cache_dir=None):
+    """
+    Load, transform and split each dataset once, see prepare_data.
+
+    Parameters
+    ----------
+    data_paths : list of Path
+        Data CSV files.
+    transformer : sktime transformer, optional
+        Transformer fitted on each dataset, by default ScaledLogitTransformer().
+    validation_split : float, optional
+        Fraction of the data to use for validation, by default 0.2.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache, see prepare_data. By default None.
+
+    Returns
+    -------
+    dict
+        str(data_path) -> (X_train, X_val, Y_train, Y_val), or None if the dataset could not be prepared.
+    """
+    if transformer is None:
+        transformer = ScaledLogitTransformer()
+    return {
+        str(data_path): prepare_data(data_path, transformer=clone(transformer), validation_split=validation_split,
+                                     cache_dir=cache_dir)
+        for data_path in data_paths
+    }
+
+
+def run_jobs(jobs, supervised=False, n_jobs=None, timeout=None):
+    """
+    Fit and evaluate models in parallel, each in its own process.
+
+    Where the platform can fork (Linux, macOS) the processes are forked and inherit the prepared
+    data without copying or pickling it. Elsewhere (Windows) they are spawned: each process imports
+    this module again and receives a pickled copy of its job's data, which is slower to start and
+    uses more memory. At most n_jobs fits run at a time, and a fit still running after timeout
+    seconds is terminated.
+
+    Parameters
+    ----------
+    jobs : list of tuple(str, dict, tuple)
+        Model name, hyperparameters (see build_model) and prepared data (see prepare_data) of each fit.
+    supervised : bool, optional
+        Fit the models on the labels as well, by default False.
+    n_jobs : int or None, optional
+        Number of fits running at the same time, by default the number of CPUs.
+    timeout : float or None, optional
+        Seconds after which a fit is terminated, by default no limit.
+
+    Returns
+    -------
+    list of dict
+        Result of each job, in order: status ("ok", "error" or "timeout"), error, fit_seconds and the
+        metrics of evaluate_model.
+    """
+    n_jobs = n_jobs or os.cpu_count()
+    results = [{} for _ in jobs]
+    pending = deque(enumerate(jobs))
+    context = multiprocessing.get_context(_start_method())
+    running = {}
+    while pending or running:
+        while pending and len(running) < n_jobs:
+            i, (model_name, params, data) = pending.popleft()
+            receiver, sender = context.Pipe(duplex=False)
+            process = context.Process(target=_fit_job, args=(sender, model_name, params, data, supervised),
+                                      daemon=True)
+            process.start()
+            sender.close()
+            deadline = None if timeout is None else time.monotonic() + timeout
+            running[process.sentinel] = (i, process, receiver, deadline)
+
+        deadlines = [deadline for _, _, _, deadline in running.values() if deadline is not None]
+        wait_for = None if not deadlines else max(0, min(deadlines) - time.monotonic())
+        done = set(wait(list(running), timeout=wait_for))
+
+        for sentinel in list(running):
+            i, process, receiver, deadline = running[sentinel]
+            if sentinel in done:
+                if receiver.poll():
+                    results[i].update(receiver.recv())
+                else:
+                    results[i].update(status='error', error=f"Process exited with code {process.exitcode}")
+            elif deadline is not None and time.monotonic() >= deadline:
+                process.terminate()
+                results[i].update(status='timeout', error=f"Fit did not finish within {timeout}s")
+            else:
+                continue
+            process.join()
+            receiver.close()
+            del running[sentinel]
+
+    return results
+
+
+def run_sweep(data_paths, grid, transformer=None, validation_split=0.2, supervised=False, n_jobs=None,
+              timeout=None, cache_dir=None):
+    """
+    Train every model of a grid on every dataset and collect their annotation metrics.
+
+    Each dataset is loaded, transformed and split once, then the fits run in parallel processes
+    (see run_jobs).
+
+    Parameters
+    ----------
+    data_paths : list of Path
+        Data CSV files, see train_model_instance.
+    grid : dict
+        Models and hyperparameters to try, see expand_grid.
+    transformer : sktime transformer, optional
+        Transformer fitted on each dataset, by default ScaledLogitTransformer().
+    validation_split : float, optional
+        Fraction of the data to use for validation, by default 0.2.
+    supervised : bool, optional
+        Fit the models on the labels as well, by default False.
+    n_jobs : int or None, optional
+        Number of fits running at the same time, by default the number of CPUs.
+    timeout : float or None, optional
+        Seconds after which a fit is terminated, by default no limit.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache, see prepare_data. By default None.
+
+    Returns
+    -------
+    pd.DataFrame
+        One row per (dataset, model, hyperparameters) with the columns of RESULT_COLUMNS. status is
+        "ok", "error" (the error column holds the exception) or "timeout".
+    """
+    datasets = prepare_datasets(data_paths, transformer=transformer, validation_split=validation_split,
+                                cache_dir=cache_dir)
+    combinations = expand_grid(grid)
+
+    rows = []
+    jobs = []
+    for dataset, data in datasets.items():
+        for model_name, params in combinations:
+            rows.append({'dataset': dataset, 'model': model_name,
+                         'params': json.dumps(params, sort_keys=True, default=str)})
+            if data is None:
+                rows[-1].update(status='error', error=f"Could not prepare {dataset}")
+            else:
+                jobs.append((len(rows) - 1, (model_name, params, data)))
+
+    logger.info(f"Running {len(jobs)} fits on {len(datasets)} datasets")
+    results = run_jobs([job for _, job in jobs], supervised=supervised, n_jobs=n_jobs, timeout=timeout)
+    for (i, _), result in zip(jobs, results):
+        rows[i].update(result)
+        logger.info(f"{rows[i]['model']} {rows[i]['params']} on {rows[i]['dataset']}: {rows[i]['status']}")
+
+    return pd.DataFrame(rows, columns=RESULT_COLUMNS)
+
+
+@app.command()
+def main(
+    data_paths: Optional[List[Path]] = typer.Option(None, "--data-path"),
+    grid_path: Optional[Path] = None,
+    output_path: Path = REPORTS_DIR / "training_sweep.csv",
+    n_jobs: Optional[int] = None,
+    timeout: Optional[float] = None,
+    supervised: bool = False,
+    cache_dir: Optional[Path] = None,
+):
+    """
+    Train a grid of models (a JSON file of model name -> hyperparameter grid, by default the models
+    of train.main) on each dataset and save the metrics table.
+    """
+    if not data_paths:
+        data_paths = [INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"]
+    grid = DEFAULT_GRID
+    if grid_path is not None:
+        with open(grid_path) as f:
+            grid = json.load(f)
+
+    results = run_sweep(data_paths, grid, n_jobs=n_jobs, timeout=timeout, supervised=supervised,
+                        cache_dir=cache_dir)
+    os.makedirs(output_path.parent, exist_ok=True)
+    results.to_csv(output_path, index=False)
+    logger.success(f"Sweep results saved to {output_path}")
+
+
+if __name__ == "__main__":
+    app()
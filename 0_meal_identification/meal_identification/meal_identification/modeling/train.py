@@ -3,13 +3,15 @@ import typer
 from loguru import logger
 from tqdm import tqdm
 import pandas as pd
+import numpy as np
+import copy
+import joblib
 import os
+import tempfile
 import sktime as sktime
+from sklearn.base import clone
 from sklearn.model_selection import train_test_split
 from sktime.utils import mlflow_sktime  
-from sktime.performance_metrics.annotation.metrics import count_error
-from sktime.performance_metrics.annotation.metrics import hausdorff_error
-from sktime.performance_metrics.annotation.metrics import prediction_ratio
 
 # Model Imports
 from sktime.annotation.hmm_learn import GMMHMM 
@@ -27,6 +29,11 @@ from sktime.annotation.hmm import HMM
 # Transformer Imports
 from sktime.transformations.series.scaledlogit import ScaledLogitTransformer
 
+from meal_identification.modeling.feature_cache import FeatureCache
+from meal_identification.modeling.metrics import annotation_metrics, DEFAULT_TOLERANCE
+from meal_identification.modeling.profiling import profile_resources, convergence_info, save_profile
+from meal_identification.modeling.hmm_estimator import get_hmm_estimator, set_hmm_estimator
+
 # Paths
 from meal_identification.config import (
     MODELS_DIR, 
@@ -37,7 +44,7 @@ from meal_identification.config import (
 app = typer.Typer()
 
 # Function to save a model
-def save_model(model, model_path: Path):
+def save_model(model, model_path: Path, profile=None):
     """
     Save the trained model to the specified file path.
 
@@ -47,6 +54,9 @@ def save_model(model, model_path: Path):
         The model to save.
     model_path : Path
         The path where the model will be saved.
+    profile : dict or None, optional
+        Resource profile and metrics of the model's training, saved next to the model files
+        (see profiling.load_profiles), by default None.
     """
     try:
         mlflow_sktime.save_model(
@@ -54,6 +64,8 @@ def save_model(model, model_path: Path):
             path = str(model_path),
             serialization_format='pickle'
             )
+        if profile is not None:
+            save_profile(profile, model_path)
         logger.info(f"Model saved to {model_path}")
     except Exception as e:
         logger.error(f"Error saving model: {e}")
@@ -170,6 +182,223 @@ def process_labels(Y: pd.DataFrame) -> pd.DataFrame:
     return Y
 
 
+def load_features(data_path: Path, transformer=None, labels=None, cache_dir=None):
+    """
+    Load a dataset, transform its features and process its labels.
+
+    Parameters
+    ----------
+    data_path : Path
+        Path to the data CSV file.
+    transformer : sktime transformer
+        A transformer that preprocesses the data.
+    labels : array-like or None, optional
+        Meal labels to use instead of the data's msg_type column, see train_model_instance.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache. The transformed features and processed labels are loaded from
+        it if this file was already preprocessed with the same transformer parameters (the
+        transformer is then left unfitted), and saved to it otherwise. By default no cache.
+
+    Returns
+    -------
+    tuple or None
+        X, Y, or None if the data could not be loaded.
+    """
+    cache, cached = None, None
+    if cache_dir is not None:
+        cache = FeatureCache(cache_dir)
+        try:
+            key = cache.key(data_path, transformer)
+        except OSError as e:
+            logger.error(f"Error loading data from {data_path}: {e}")
+            return None
+        cached = cache.load(key)
+
+    if cached is not None:
+        X, Y = cached
+    else:
+        # Load the data
+        data = load_data(data_path)
+        if data is None:
+            logger.error("Data loading failed. Exiting training.")
+            return None
+        X, Y = xy_split(data)
+        # Apply the transformer to the data
+        X = transform_data(data = X, transformer=transformer)
+        # Process labels:
+        Y = process_labels(Y = Y)
+        if cache is not None:
+            cache.save(key, X, Y)
+
+    if labels is not None:
+        if len(labels) != len(Y):
+            logger.error(f"Got {len(labels)} labels for {len(Y)} rows of data. Exiting training.")
+            return None
+        Y = process_labels(Y = pd.DataFrame({'msg_type': list(labels)}, index=Y.index))
+    return X, Y
+
+
+def prepare_data(data_path: Path, transformer=None, validation_split=0.2, labels=None, cache_dir=None):
+    """
+    Load a dataset, transform its features and split it into training and validation sets.
+
+    Parameters
+    ----------
+    data_path : Path
+        Path to the data CSV file.
+    transformer : sktime transformer
+        A transformer that preprocesses the data.
+    validation_split : float, optional
+        Fraction of the data to use for validation, by default 0.2.
+    labels : array-like or None, optional
+        Meal labels to use instead of the data's msg_type column, see train_model_instance.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache, see load_features. By default no cache.
+
+    Returns
+    -------
+    tuple or None
+        X_train, X_val, Y_train, Y_val, or None if the data could not be prepared.
+    """
+    features = load_features(data_path, transformer=transformer, labels=labels, cache_dir=cache_dir)
+    if features is None:
+        return None
+    X, Y = features
+    # Split the data into training and validation sets
+    return train_test_split(X, Y, test_size=validation_split, shuffle=False)
+
+
+def build_model(model="GMMHMM", n_iter=100, n_components=2, n_mix=3, covariance_type='full',
+                verbose=True, period_length=10, n_cps=2, n_neighbors=36, window_size=288,
+                init_params="s", k_max=3, step=5, alpha=0.01, k=15, knn_algorithm='ball_tree',
+                outlier_tail='both', clusterer=None, member=None, penalty=None, max_shuffles=250,
+                lamb=1.0, emission_funcs=None, transition_prob_mat=None, initial_probs=None,
+                random_state=None, tol=0.01):
+    """
+    Create an unfitted model from its name and hyperparameters.
+
+    Parameters
+    ----------
+    model : str, optional
+        Model to create, by default "GMMHMM".
+    **hyperparameters :
+        See train_model_instance for the hyperparameters used by each model type.
+
+    Returns
+    -------
+    model or None
+        The model, or None if the model type is unknown.
+    """
+    if model == "GMMHMM":
+        model = GMMHMM(n_components=n_components, 
+                        n_mix = n_mix, 
+                        covariance_type=covariance_type, 
+                        n_iter=n_iter, 
+                        init_params=init_params,
+                        random_state=random_state,
+                        tol=tol,
+                        verbose=verbose)
+    elif model == "ClaSPSegmentation":
+        model = ClaSPSegmentation(period_length=period_length, 
+                                    n_cps=n_cps)
+    elif model == "SubLOF":
+        model = SubLOF(n_neighbors=n_neighbors, window_size=window_size)
+    elif model == "PoissonHMM":
+        model = PoissonHMM(n_components=n_components,   
+                            n_iter=n_iter,
+                            init_params=init_params,
+                            random_state=random_state,
+                            tol=tol,
+                            verbose=verbose)
+    elif model == "GaussianHMM":
+        model = GaussianHMM(n_components=n_components, 
+                            covariance_type=covariance_type,
+                            n_iter=n_iter,
+                            init_params=init_params,
+                            random_state=random_state,
+                            tol=tol,
+                            verbose=verbose)
+    elif model == "InformationGainSegmentation":
+        model = InformationGainSegmentation(k_max = k_max, step = step)
+    elif model == "STRAY":
+        model = STRAY(
+            alpha=alpha,
+            k=k,
+            knn_algorithm=knn_algorithm,
+            outlier_tail=outlier_tail
+        )
+    elif model == "ClusterSegmenter":
+        model = ClusterSegmenter(clusterer=clusterer)
+    elif model == "EAgglo":
+        model = EAgglo(member=member, alpha=alpha, penalty=penalty)
+    elif model == "GreedyGaussianSegmentation":
+        model = GreedyGaussianSegmentation(
+            k_max= k_max, 
+            lamb= lamb, 
+            max_shuffles = max_shuffles, 
+            random_state = random_state,
+            verbose=verbose
+        )
+    elif model == "HMM":
+        model = HMM(emission_funcs = emission_funcs, 
+                    transition_prob_mat = transition_prob_mat, 
+                    initial_probs = initial_probs
+        )
+    else:
+        logger.error(f"Unknown model type: {model}")
+        return None
+
+    return model
+
+
+def evaluate_model(model, X_train, X_val, Y_train, Y_val, tolerance=DEFAULT_TOLERANCE):
+    """
+    Compute the annotation metrics of a fitted model on the training and validation sets.
+
+    The meals of the labels are compared with the change points of the predicted states, see
+    metrics.annotation_metrics.
+
+    Parameters
+    ----------
+    tolerance : int, optional
+        Rows a detected change point can be away from a meal, by default one hour of 5 minute data.
+
+    Returns
+    -------
+    dict
+        The metrics of metrics.METRIC_NAMES, prefixed by train_ or test_.
+    """
+    hidden_states_train = model.predict(X_train)
+    hidden_states_test = model.predict(X_val)
+
+    metrics = {}
+    for split, Y, hidden_states in (('train', Y_train, hidden_states_train), ('test', Y_val, hidden_states_test)):
+        for name, value in annotation_metrics(Y, hidden_states, tolerance=tolerance).items():
+            metrics[f'{split}_{name}'] = value
+    return metrics
+
+
+def training_profile(model, X_train, X_val, fit_profile, predict_profile, metrics):
+    """
+    Profile saved with a trained model: its type and parameters, input lengths, resource use of the
+    fit and of the evaluation (see profiling.profile_resources), EM convergence and metrics.
+
+    Returns
+    -------
+    dict
+    """
+    return {
+        'model': type(model).__name__,
+        'params': model.get_params(deep=False),
+        'n_train_rows': len(X_train),
+        'n_val_rows': len(X_val),
+        **fit_profile,
+        **predict_profile,
+        **convergence_info(model),
+        **metrics,
+    }
+
+
 def train_model_instance(data_path: Path, model_path: Path, model="GMMHMM", supervised=False, 
                             validation_split=0.2, n_iter=100, 
                             n_components=2, n_mix=3, covariance_type='full', 
@@ -180,7 +409,8 @@ def train_model_instance(data_path: Path, model_path: Path, model="GMMHMM", supe
                             member=None, penalty=None, max_shuffles = 250,
                             lamb = 1.0, emission_funcs = None, transition_prob_mat = None,
                             initial_probs = None,
-                            random_state=None, transformer=None):
+                            random_state=None, transformer=None, labels=None, cache_dir=None,
+                            tol=0.01, warm_start_path=None, checkpoint_path=None, checkpoint_every=10):
     """
     Train a model on the given data.
 
@@ -248,14 +478,30 @@ def train_model_instance(data_path: Path, model_path: Path, model="GMMHMM", supe
         Random state for reproducibility, by default None.
     transformer : sktime transformer or None, optional
         A transformer that preprocesses the data, by default None.
+    labels : array-like or None, optional
+        Meal labels to use instead of the data's msg_type column, one per row of the data,
+        e.g. the obfuscated labels of an epoch of ObfuscatedLabelStream. By default None.
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache reused across calls on the same data, see prepare_data.
+        By default None.
+    tol : float, optional
+        EM stops early once an iteration improves the log-likelihood by less than tol, for HMM models,
+        by default 0.01.
+    warm_start_path : Path or None, optional
+        Saved model (see save_model) or checkpoint (see save_checkpoint) of the same HMM to start EM
+        from instead of a fresh initialization, by default None.
+    checkpoint_path : Path or None, optional
+        File the HMM is checkpointed to every checkpoint_every iterations, see fit_hmm. By default None.
+    checkpoint_every : int, optional
+        Iterations between checkpoints, by default 10.
 
     hyperparameters :
         Hyperparameters for each model type:
-        - GMMHMM: n_components, n_mix, covariance_type, n_iter, init_params, random_state, verbose
+        - GMMHMM: n_components, n_mix, covariance_type, n_iter, init_params, random_state, tol, verbose
         - ClaSPSegmentation: period_length, n_cps
         - SubLOF: n_neighbors, window_size
-        - PoissonHMM: n_components, n_iter, init_params, random_state, verbose
-        - GaussianHMM: n_components, covariance_type, n_iter, init_params, random_state, verbose
+        - PoissonHMM: n_components, n_iter, init_params, random_state, tol, verbose
+        - GaussianHMM: n_components, covariance_type, n_iter, init_params, random_state, tol, verbose
         - InformationGainSegmentation: k_max, step
         - STRAY: alpha, k, knn_algorithm, outlier_tail
         - ClusterSegmenter: clusterer
@@ -280,110 +526,340 @@ def train_model_instance(data_path: Path, model_path: Path, model="GMMHMM", supe
     logger.remove()
     logger.add(log_file)
 
-    # Load the data
-    data = load_data(data_path)
-    if data is None:
-        logger.error("Data loading failed. Exiting training.")
+    # Load, transform and split the data
+    prepared = prepare_data(data_path, transformer=transformer, validation_split=validation_split, labels=labels,
+                            cache_dir=cache_dir)
+    if prepared is None:
         return None
-    X, Y = xy_split(data)
-    # Apply the transformer to the data
-    X = transform_data(data = X, transformer=transformer)
-    # Process labels:
-    Y = process_labels(Y = Y)
-    # Split the data into training and validation sets
-    X_train, X_val, Y_train, Y_val = train_test_split(X, Y, test_size=validation_split, shuffle=False)
-
-    if model == "GMMHMM":
-        model = GMMHMM(n_components=n_components, 
-                        n_mix = n_mix, 
-                        covariance_type=covariance_type, 
-                        n_iter=n_iter, 
-                        init_params=init_params,
-                        random_state=random_state,
-                        verbose=verbose)
-    elif model == "ClaSPSegmentation":
-        model = ClaSPSegmentation(period_length=period_length, 
-                                    n_cps=n_cps)
-    elif model == "SubLOF":
-        model = SubLOF(n_neighbors=n_neighbors, window_size=window_size)
-    elif model == "PoissonHMM":
-        model = PoissonHMM(n_components=n_components,   
-                            n_iter=n_iter,
-                            init_params=init_params,
-                            random_state=random_state,
-                            verbose=verbose)
-    elif model == "GaussianHMM":
-        model = GaussianHMM(n_components=n_components, 
-                            covariance_type=covariance_type,
-                            n_iter=n_iter,
-                            init_params=init_params,
-                            random_state=random_state,
-                            verbose=verbose)
-    elif model == "InformationGainSegmentation":
-        model = InformationGainSegmentation(k_max = k_max, step = step)
-    elif model == "STRAY":
-        model = STRAY(
-            alpha=alpha,
-            k=k,
-            knn_algorithm=knn_algorithm,
-            outlier_tail=outlier_tail
-        )
-    elif model == "ClusterSegmenter":
-        model = ClusterSegmenter(clusterer=clusterer)
-    elif model == "EAgglo":
-        model = EAgglo(member=member, alpha=alpha, penalty=penalty)
-    elif model == "GreedyGaussianSegmentation":
-        model = GreedyGaussianSegmentation(
-            k_max= k_max, 
-            lamb= lamb, 
-            max_shuffles = max_shuffles, 
-            random_state = random_state,
-            verbose=verbose
-        )
-    elif model == "HMM":
-        model = HMM(emission_funcs = emission_funcs, 
-                    transition_prob_mat = transition_prob_mat, 
-                    initial_probs = initial_probs
-        )
-    else:
-        logger.error(f"Unknown model type: {model}")
+    X_train, X_val, Y_train, Y_val = prepared
+
+    model = build_model(model, n_iter=n_iter, n_components=n_components, n_mix=n_mix,
+                        covariance_type=covariance_type, verbose=verbose, period_length=period_length,
+                        n_cps=n_cps, n_neighbors=n_neighbors, window_size=window_size,
+                        init_params=init_params, k_max=k_max, step=step, alpha=alpha, k=k,
+                        knn_algorithm=knn_algorithm, outlier_tail=outlier_tail, clusterer=clusterer,
+                        member=member, penalty=penalty, max_shuffles=max_shuffles, lamb=lamb,
+                        emission_funcs=emission_funcs, transition_prob_mat=transition_prob_mat,
+                        initial_probs=initial_probs, random_state=random_state, tol=tol)
+    if model is None:
         return None
 
+    warm_start = None
+    if warm_start_path is not None or checkpoint_path is not None:
+        if type(model).__name__ not in COHORT_MODELS:
+            logger.error(f"Warm start and checkpoints are only supported for {COHORT_MODELS}, got {model}")
+            return None
+        if warm_start_path is not None:
+            warm_start = load_warm_start(warm_start_path)
+            if warm_start is None:
+                return None
+
     logger.info(f"Training {'supervised' if supervised else 'unsupervised'} model: {model}...")
     try:
-        model.fit(X_train, Y_train) if supervised else model.fit(X_train)
+        with profile_resources("fit") as fit_profile:
+            if warm_start is not None or checkpoint_path is not None:
+                fit_hmm(model, [X_train], warm_start=warm_start, checkpoint_path=checkpoint_path,
+                        checkpoint_every=checkpoint_every)
+            else:
+                model.fit(X_train, Y_train) if supervised else model.fit(X_train)
     except Exception as e:
         logger.error(f"Error during model fitting: {e}")
         return None
     logger.info("Model training complete.")
 
-    hidden_states_train = model.predict(X_train)
-    hidden_states_test = model.predict(X_val)
-
-    train_count_error = count_error(Y_train, hidden_states_train)
-    train_hausdorff_error = hausdorff_error(Y_train, hidden_states_train)
-    train_prediction_ratio = prediction_ratio(Y_train, hidden_states_train)
-
-    test_count_error = count_error(Y_val, hidden_states_test)
-    test_hausdorff_error = hausdorff_error(Y_val, hidden_states_test)
-    test_prediction_ratio = prediction_ratio(Y_val, hidden_states_test)
+    with profile_resources("predict") as predict_profile:
+        metrics = evaluate_model(model, X_train, X_val, Y_train, Y_val)
 
-    logger.info(f"count error for training data: {train_count_error}")
-    logger.info(f"hausdorff error for training data: {train_hausdorff_error}")
-    logger.info(f"prediction ratio for training data: {train_prediction_ratio}")
+    logger.info(f"count error for training data: {metrics['train_count_error']}")
+    logger.info(f"hausdorff error for training data: {metrics['train_hausdorff_error']}")
+    logger.info(f"prediction ratio for training data: {metrics['train_prediction_ratio']}")
 
-    logger.info(f"count error for test data: {test_count_error}")
-    logger.info(f"hausdorff error for test data: {test_hausdorff_error}")
-    logger.info(f"prediction ratio for test data: {test_prediction_ratio}")
+    logger.info(f"count error for test data: {metrics['test_count_error']}")
+    logger.info(f"hausdorff error for test data: {metrics['test_hausdorff_error']}")
+    logger.info(f"prediction ratio for test data: {metrics['test_prediction_ratio']}")
 
     try:
-        save_model(model, model_path=model_path)
+        save_model(model, model_path=model_path,
+                   profile=training_profile(model, X_train, X_val, fit_profile, predict_profile, metrics))
         logger.info("Model saved to 0_meal_identification/meal_identification/models")
     except Exception as e:
         logger.error(f"Error saving model: {e}")
 
     return model
 
+
+# Models whose hmmlearn estimator can be fitted on several sequences at once
+COHORT_MODELS = ["GaussianHMM", "GMMHMM", "PoissonHMM"]
+
+
+def split_sequences(X, sequence_length=None):
+    """
+    Split a series into consecutive sequences of at most sequence_length rows.
+
+    Parameters
+    ----------
+    X : pd.DataFrame
+        Series to split.
+    sequence_length : int or None, optional
+        Rows per sequence, e.g. 288 for days of 5 minute data, by default the whole series.
+
+    Returns
+    -------
+    list of pd.DataFrame
+    """
+    if sequence_length is None:
+        return [X]
+    return [X.iloc[start:start + sequence_length] for start in range(0, len(X), sequence_length)]
+
+
+def fit_cohort(model, sequences):
+    """
+    Fit an HMM annotator on several independent sequences in a single EM run.
+
+    Concatenating the sequences and calling model.fit would learn transitions between the end of one
+    sequence and the start of the next. Here the wrapped hmmlearn estimator is given the length of
+    each sequence instead, so the forward-backward passes restart at every sequence boundary.
+
+    Parameters
+    ----------
+    model : sktime GaussianHMM, GMMHMM or PoissonHMM
+        Unfitted model, see build_model.
+    sequences : list of pd.DataFrame
+        Sequences of the same features, e.g. one per patient or per day.
+
+    Returns
+    -------
+    model
+        The fitted model, used like a model fitted with model.fit.
+    """
+    return fit_hmm(model, sequences)
+
+
+def fit_hmm(model, sequences, warm_start=None, checkpoint_path=None, checkpoint_every=10):
+    """
+    Fit an HMM annotator on one or more sequences (see fit_cohort), optionally starting from a
+    previously fitted model and checkpointing along the way.
+
+    EM runs for at most the model's n_iter iterations and stops as soon as an iteration improves
+    the log-likelihood by less than the model's tol. Warm starting from a model fitted on similar
+    data (e.g. yesterday's model when retraining on one more day) usually meets tol in a few
+    iterations.
+
+    Parameters
+    ----------
+    model : sktime GaussianHMM, GMMHMM or PoissonHMM
+        Unfitted model, see build_model. Its parameters (n_iter, tol, ...) are used for the fit.
+    sequences : list of pd.DataFrame
+        Sequences of the same features.
+    warm_start : fitted model or None, optional
+        Model of the same type, number of states and covariance type (see load_warm_start). EM
+        starts from its fitted parameters, which are left unchanged. By default a fresh initialization.
+    checkpoint_path : Path or None, optional
+        File the model is saved to (see save_checkpoint) every checkpoint_every iterations and at
+        the end, so an interrupted fit can be resumed by warm starting from it. By default None.
+    checkpoint_every : int, optional
+        Iterations between checkpoints, by default 10.
+
+    Returns
+    -------
+    model
+        The fitted model. Its hmmlearn monitor_ counts the iterations of the whole fit.
+    """
+    # import inside fit_hmm like the sktime wrappers, hmmlearn is a soft dependency of sktime
+    from hmmlearn import hmm
+    from hmmlearn.base import ConvergenceMonitor
+
+    model_name = type(model).__name__
+    if model_name not in COHORT_MODELS:
+        raise ValueError(f"Cohort training is only supported for {COHORT_MODELS}, got {model_name}")
+    sequences = [np.asarray(sequence).reshape(len(sequence), -1) for sequence in sequences if len(sequence)]
+    if not sequences:
+        raise ValueError("No data to fit the model on")
+    X = np.concatenate(sequences)
+    lengths = [len(sequence) for sequence in sequences]
+
+    # The sktime wrappers take the same parameters as the hmmlearn estimators they wrap
+    params = model.get_params()
+    if warm_start is None:
+        estimator = getattr(hmm, model_name)(**params)
+    else:
+        previous = get_hmm_estimator(warm_start)
+        if type(warm_start) is not type(model) or previous is None:
+            raise ValueError(f"Can only warm start from a fitted {model_name}, got {type(warm_start).__name__}")
+        for name in ('n_components', 'covariance_type', 'n_mix'):
+            if name in params and params[name] != getattr(previous, name):
+                raise ValueError(f"Can't warm start a model with {name}={params[name]} "
+                                 f"from one with {name}={getattr(previous, name)}")
+        estimator = copy.deepcopy(previous)
+        estimator.set_params(**params)
+        # Keep the fitted parameters instead of initializing them
+        estimator.init_params = ''
+
+    set_hmm_estimator(model, estimator)
+
+    n_iter, tol = params['n_iter'], params['tol']
+    chunk = n_iter if checkpoint_path is None else checkpoint_every
+    history = []
+    n_iter_run = 0
+    while n_iter_run < n_iter:
+        # Each call continues from the parameters of the previous one
+        estimator.n_iter = min(chunk, n_iter - n_iter_run)
+        estimator.monitor_ = ConvergenceMonitor(tol, estimator.n_iter, estimator.verbose)
+        estimator.fit(X, lengths=lengths)
+        estimator.init_params = ''
+        n_iter_run += estimator.monitor_.iter
+        history.extend(estimator.monitor_.history)
+        if checkpoint_path is not None:
+            save_checkpoint(model, checkpoint_path)
+        if len(history) >= 2 and history[-1] - history[-2] < tol:
+            break
+
+    # Restore the model's parameters, with a monitor covering the whole fit
+    estimator.set_params(n_iter=n_iter, init_params=params['init_params'])
+    estimator.monitor_ = ConvergenceMonitor(tol, n_iter, estimator.verbose)
+    estimator.monitor_.iter = n_iter_run
+    estimator.monitor_.history.extend(history)
+    if checkpoint_path is not None:
+        save_checkpoint(model, checkpoint_path)
+    return model
+
+
+def save_checkpoint(model, checkpoint_path: Path):
+    """
+    Save a model being trained to a single file, replaced atomically so an interrupted save never
+    leaves a corrupt checkpoint.
+    """
+    checkpoint_dir = os.path.dirname(os.path.abspath(checkpoint_path))
+    os.makedirs(checkpoint_dir, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=checkpoint_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            joblib.dump(model, f)
+        os.replace(tmp_path, checkpoint_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+
+
+def load_checkpoint(checkpoint_path: Path):
+    """
+    Load a model saved by save_checkpoint.
+    """
+    return joblib.load(checkpoint_path)
+
+
+def load_warm_start(path: Path):
+    """
+    Load the model to warm start a fit from: a checkpoint file (see save_checkpoint) or a model
+    directory (see save_model).
+
+    Returns
+    -------
+    model or None
+        None if the model could not be loaded.
+    """
+    if os.path.isfile(path):
+        try:
+            return load_checkpoint(path)
+        except Exception as e:
+            logger.error(f"Error loading checkpoint: {e}")
+            return None
+    return load_model(path)
+
+
+def train_cohort_model(data_paths, model_path: Path, model="GaussianHMM", sequence_length=None,
+                       validation_split=0.2, transformer=None, cache_dir=None, warm_start_path=None,
+                       checkpoint_path=None, checkpoint_every=10, **hyperparameters):
+    """
+    Train one HMM on the data of a whole cohort.
+
+    Each patient file is transformed and split into training and validation sets on its own. The
+    training sets (optionally cut into sequences of sequence_length rows, e.g. days) are fitted as
+    separate sequences in one EM run, see fit_cohort, and the model is evaluated on each patient.
+
+    Parameters
+    ----------
+    data_paths : list of Path
+        Data CSV files, one per patient.
+    model_path : Path
+        Path to save the trained model.
+    model : str, optional
+        One of COHORT_MODELS, by default "GaussianHMM".
+    sequence_length : int or None, optional
+        Rows per training sequence, by default one sequence per patient.
+    validation_split : float, optional
+        Fraction of each patient's data to use for validation, by default 0.2.
+    transformer : sktime transformer, optional
+        Transformer fitted on each patient's data, by default ScaledLogitTransformer().
+    cache_dir : Path or None, optional
+        Directory of a FeatureCache, see prepare_data. By default None.
+    warm_start_path : Path or None, optional
+        Saved model or checkpoint to start EM from, see load_warm_start. By default None.
+    checkpoint_path : Path or None, optional
+        File the model is checkpointed to during the fit, see fit_hmm. By default None.
+    checkpoint_every : int, optional
+        Iterations between checkpoints, by default 10.
+    **hyperparameters :
+        Hyperparameters of the model, see train_model_instance.
+
+    Returns
+    -------
+    model or None
+        The trained model, or None if training failed.
+    pd.DataFrame or None
+        Metrics of evaluate_model for each patient, indexed by data path.
+    """
+    if model not in COHORT_MODELS:
+        logger.error(f"Cohort training is only supported for {COHORT_MODELS}, got {model}")
+        return None, None
+    if transformer is None:
+        transformer = ScaledLogitTransformer()
+
+    datasets = {}
+    for data_path in data_paths:
+        prepared = prepare_data(data_path, transformer=clone(transformer), validation_split=validation_split,
+                                cache_dir=cache_dir)
+        if prepared is None:
+            logger.error(f"Skipping {data_path}, its data could not be prepared.")
+            continue
+        datasets[str(data_path)] = prepared
+    if not datasets:
+        logger.error("No data to train on. Exiting training.")
+        return None, None
+
+    warm_start = None
+    if warm_start_path is not None:
+        warm_start = load_warm_start(warm_start_path)
+        if warm_start is None:
+            return None, None
+
+    model_name = model
+    model = build_model(model_name, **hyperparameters)
+    sequences = [sequence for X_train, _, _, _ in datasets.values()
+                 for sequence in split_sequences(X_train, sequence_length)]
+
+    logger.info(f"Training {model_name} on {len(sequences)} sequences from {len(datasets)} patients...")
+    try:
+        with profile_resources("fit") as fit_profile:
+            fit_hmm(model, sequences, warm_start=warm_start, checkpoint_path=checkpoint_path,
+                    checkpoint_every=checkpoint_every)
+    except Exception as e:
+        logger.error(f"Error during model fitting: {e}")
+        return None, None
+    logger.info("Model training complete.")
+
+    with profile_resources("predict") as predict_profile:
+        metrics = pd.DataFrame.from_dict(
+            {name: evaluate_model(model, *data) for name, data in datasets.items()}, orient='index'
+        )
+    logger.info(f"Mean metrics over the cohort:\n{metrics.mean()}")
+
+    X_train = pd.concat([data[0] for data in datasets.values()])
+    X_val = pd.concat([data[1] for data in datasets.values()])
+    profile = training_profile(model, X_train, X_val, fit_profile, predict_profile, metrics.mean().to_dict())
+    save_model(model, model_path=model_path, profile=profile)
+    return model, metrics
+
 @app.command()
 def main(       
     # ---- REPLACE DEFAULT PATHS AS APPROPRIATE ----
@@ -72,6 +72,26 @@ def noisy_df():
     }
     return pd.DataFrame(data, index=dates)
 
+@pytest.fixture
+def sim_patient_df():
+    """
+    Two weeks of simulated patient data at 5 minute intervals indexed by date, with 3-5 meals a day
+    -> Same shape as the data/raw/sim files the obfuscator works on
+    """
+    rng = np.random.default_rng(0)
+    dates = pd.date_range(start='2024-02-01 04:00:00', periods=14 * 288, freq='5min', name='date')
+    df = pd.DataFrame({
+        'bgl': rng.normal(140, 20, len(dates)),
+        'msg_type': None,
+        'food_g': np.nan,
+    }, index=dates)
+    for day in range(14):
+        n_meals = rng.integers(3, 6)
+        meal_rows = day * 288 + np.sort(rng.choice(np.arange(30, 260), n_meals, replace=False))
+        df.iloc[meal_rows, df.columns.get_loc('msg_type')] = 'ANNOUNCE_MEAL'
+        df.iloc[meal_rows, df.columns.get_loc('food_g')] = rng.uniform(5, 90, n_meals).round()
+    return df
+
 def pytest_generate_tests(metafunc):
     '''
     Uses pytest hooks to generate tests for multiple values of min_carbs
@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from meal_identification.datasets.dataset_data_obfuscator import obfuscate_replicas
+from meal_identification.datasets.dataset_label_sidecar import LabelSidecar, save_label_sidecar
+from meal_identification.datasets.dataset_operations import load_sim_patient
+
+
+@pytest.fixture
+def base_file(tmp_path, sim_patient_df):
+    """A simulated patient saved the way data/raw/sim files are"""
+    sim_dir = tmp_path / 'sim'
+    sim_dir.mkdir()
+    file_path = sim_dir / 'adu001_Dexcom_Cozmo_2024-02-01_2024-02-15.csv'
+    sim_patient_df.reset_index().to_csv(file_path)
+    return str(file_path)
+
+
+@pytest.fixture
+def obfuscated_dir(tmp_path):
+    obfuscated_dir = tmp_path / 'obfuscated'
+    obfuscated_dir.mkdir()
+    return obfuscated_dir
+
+
+class TestLabelSidecar:
+    def test_round_trip(self, base_file, obfuscated_dir):
+        """Joining the sidecar back gives the same labels that were saved"""
+        base_df = load_sim_patient(base_file)
+        labels_df, _ = obfuscate_replicas(base_df, 2, global_seed=0, job_key='adu001')
+        sidecar_path = save_label_sidecar(labels_df, base_file, obfuscated_dir / 'adu001.labels.json',
+                                          metadata={'logger_type': ['full', 'once']})
+
+        labels = LabelSidecar(sidecar_path)
+        assert labels.metadata == {'logger_type': ['full', 'once']}
+        joined = labels.join()
+        pd.testing.assert_frame_equal(joined[labels_df.columns], labels_df)
+        pd.testing.assert_frame_equal(joined[base_df.columns], base_df)
+
+    def test_events_without_base(self, base_file, obfuscated_dir):
+        base_df = load_sim_patient(base_file)
+        labels_df = pd.DataFrame({'msg_type_log': base_df['msg_type']}, index=base_df.index)
+        labels = LabelSidecar(save_label_sidecar(labels_df, base_file, obfuscated_dir / 'a.labels.json'))
+        expected = base_df.index[(base_df['msg_type'] == 'ANNOUNCE_MEAL').to_numpy()]
+        np.testing.assert_array_equal(labels.events('msg_type_log'), expected)
+
+    def test_much_smaller_than_full_copy(self, base_file, obfuscated_dir):
+        base_df = load_sim_patient(base_file)
+        labels_df, _ = obfuscate_replicas(base_df, 1, global_seed=0, job_key='adu001')
+        sidecar_path = save_label_sidecar(labels_df, base_file, obfuscated_dir / 'a.labels.json')
+        assert os.path.getsize(sidecar_path) * 10 < os.path.getsize(base_file)
+
+    def test_changed_base_is_detected(self, base_file, obfuscated_dir):
+        base_df = load_sim_patient(base_file)
+        labels_df = pd.DataFrame({'msg_type_log': base_df['msg_type']}, index=base_df.index)
+        sidecar_path = save_label_sidecar(labels_df, base_file, obfuscated_dir / 'a.labels.json')
+
+        with open(base_file, 'a') as f:
+            f.write('\n')
+        with pytest.raises(ValueError):
+            LabelSidecar(sidecar_path).join()
+
+    def test_unknown_label_rejected(self, base_file, obfuscated_dir):
+        base_df = load_sim_patient(base_file)
+        labels_df = pd.DataFrame({'msg_type_log': 'DOSE_INSULIN'}, index=base_df.index)
+        with pytest.raises(ValueError):
+            save_label_sidecar(labels_df, base_file, obfuscated_dir / 'a.labels.json')
+
+    def test_empty_labels(self, base_file, obfuscated_dir):
+        """An empty frame is saved with no events and joins back on an empty base"""
+        base_df = load_sim_patient(base_file).iloc[:0]
+        labels_df = pd.DataFrame({'msg_type_log': base_df['msg_type']}, index=base_df.index)
+        labels = LabelSidecar(save_label_sidecar(labels_df, base_file, obfuscated_dir / 'a.labels.json'))
+
+        assert labels._sidecar['labels'] == {'msg_type_log': {'offset_s': [], 'code': []}}
+        assert len(labels.events('msg_type_log')) == 0
+        assert len(labels.join(base_df)) == 0
@@ -0,0 +1,75 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from meal_identification.datasets.dataset_data_obfuscator import (
+    find_meals_thresholds,
+    find_meals_threshold_daily,
+    find_meals_threshold_weekly,
+    keep_daily_top_meal,
+)
+
+
+def grouped_thresholds(patient_df, target_meals_per_day=1.8, target_meals_per_week=3):
+    """Thresholds computed with plain pandas groupbys, as the obfuscator used to"""
+    meals = patient_df[patient_df['msg_type'] == 'ANNOUNCE_MEAL']
+    per_day = meals.groupby(meals.index.date).size().mean()
+    per_week = meals.groupby(meals.index.isocalendar().week).size().mean()
+    return {
+        'daily': np.percentile(meals['food_g'], (1 - target_meals_per_day / per_day) * 100),
+        'weekly': np.percentile(meals['food_g'], (1 - target_meals_per_week / per_week) * 100),
+    }
+
+
+class TestFindMealsThresholds:
+    def test_matches_grouped_thresholds(self, sim_patient_df):
+        """Both thresholds match the ones computed with per-period groupbys"""
+        thresholds = find_meals_thresholds(sim_patient_df)
+        expected = grouped_thresholds(sim_patient_df)
+        assert thresholds['daily'] == pytest.approx(expected['daily'])
+        assert thresholds['weekly'] == pytest.approx(expected['weekly'])
+        assert find_meals_threshold_daily(sim_patient_df) == thresholds['daily']
+        assert find_meals_threshold_weekly(sim_patient_df) == thresholds['weekly']
+
+    def test_input_untouched(self, sim_patient_df):
+        """No helper column (e.g. 'week') is left on, or added to, the input frame"""
+        original = sim_patient_df.copy()
+        find_meals_thresholds(sim_patient_df)
+        find_meals_threshold_weekly(sim_patient_df)
+        pd.testing.assert_frame_equal(sim_patient_df, original)
+
+    def test_too_few_meals_keeps_all(self, sim_patient_df):
+        """Asking for more meals than there are keeps every meal instead of failing"""
+        thresholds = find_meals_thresholds(sim_patient_df, target_meals_per_day=10, target_meals_per_week=100)
+        assert thresholds['daily'] == sim_patient_df['food_g'].min()
+        assert thresholds['weekly'] == sim_patient_df['food_g'].min()
+
+
+class TestKeepDailyTopMeal:
+    def test_one_largest_meal_per_day(self, sim_patient_df):
+        """Exactly the largest meal of each day stays logged"""
+        sim_patient_df['msg_type_log'] = sim_patient_df['msg_type']
+        result = keep_daily_top_meal(sim_patient_df.copy())
+
+        meals = sim_patient_df[sim_patient_df['msg_type'] == 'ANNOUNCE_MEAL']
+        expected = meals.groupby(meals.index.date)['food_g'].idxmax()
+        logged = result.index[(result['msg_type_log'] == 'ANNOUNCE_MEAL').to_numpy()]
+        assert list(logged) == list(expected)
+
+    def test_ties_keep_earliest_meal(self):
+        """Meals of the same size keep the first one of the day, like idxmax"""
+        dates = pd.date_range(start='2024-02-01 06:00', periods=6, freq='4h', name='date')
+        df = pd.DataFrame({
+            'msg_type': 'ANNOUNCE_MEAL',
+            'food_g': [20.0, 50.0, 50.0, 10.0, 30.0, 30.0],
+        }, index=dates)
+        df['msg_type_log'] = df['msg_type']
+        result = keep_daily_top_meal(df)
+        assert result['msg_type_log'].notna().tolist() == [False, True, False, False, False, True]
+
+    def test_no_meals(self, sim_patient_df):
+        """Frames without meals are returned as they are"""
+        sim_patient_df['msg_type'] = None
+        sim_patient_df['msg_type_log'] = None
+        result = keep_daily_top_meal(sim_patient_df.copy())
+        assert result['msg_type_log'].isna().all()
@@ -0,0 +1,41 @@
+import numpy as np
+import pandas as pd
+
+from meal_identification.datasets.dataset_data_obfuscator import (
+    logging_behaviour_obfuscator,
+    logging_timing_obfuscator,
+    obfuscate_replicas,
+)
+from meal_identification.datasets.dataset_seeding import job_rng
+
+
+class TestObfuscateReplicas:
+    def test_only_label_columns(self, sim_patient_df):
+        """K replicas give 2K label columns on the patient's index and leave the patient untouched"""
+        original = sim_patient_df.copy()
+        labels_df, logger_types = obfuscate_replicas(sim_patient_df, 4, global_seed=0, job_key='p.csv')
+
+        assert list(labels_df.columns) == [
+            f'msg_type_log{suffix}_{k}' for k in range(4) for suffix in ['', '_shifted']
+        ]
+        assert labels_df.index.equals(sim_patient_df.index)
+        assert len(logger_types) == 4
+        pd.testing.assert_frame_equal(sim_patient_df, original)
+
+    def test_replica_matches_single_realization(self, sim_patient_df):
+        """Replica k is the same realization the obfuscators give with replica k's generator"""
+        labels_df, logger_types = obfuscate_replicas(sim_patient_df, 3, global_seed=5, job_key='p.csv')
+
+        rng = job_rng(5, ('p.csv', 'replica_2'))
+        patient_df, logger_type = logging_behaviour_obfuscator(sim_patient_df.copy(), rng.uniform(0, 1))
+        patient_df, logger_timing = logging_timing_obfuscator(patient_df, rng.uniform(0, 1), rng=rng)
+
+        assert logger_types[2] == (logger_type, logger_timing)
+        np.testing.assert_array_equal(labels_df['msg_type_log_2'], patient_df['msg_type_log'])
+        np.testing.assert_array_equal(labels_df['msg_type_log_shifted_2'], patient_df['msg_type_log_shifted'])
+
+    def test_replicas_independent_of_count(self, sim_patient_df):
+        """Asking for more replicas doesn't change the first ones"""
+        few, _ = obfuscate_replicas(sim_patient_df, 2, global_seed=1, job_key='p.csv')
+        many, _ = obfuscate_replicas(sim_patient_df, 5, global_seed=1, job_key='p.csv')
+        pd.testing.assert_frame_equal(few, many[few.columns])
@@ -0,0 +1,82 @@
+import os
+from unittest import mock
+
+import pandas as pd
+import pytest
+
+from meal_identification.datasets import dataset_data_obfuscator
+from meal_identification.datasets.dataset_data_obfuscator import obfuscate_file, run_obfuscation
+from meal_identification.datasets.dataset_label_sidecar import LabelSidecar
+
+
+@pytest.fixture
+def sim_dir(tmp_path, sim_patient_df):
+    """A data/raw/sim style directory with three patients and one unreadable file"""
+    sim_dir = tmp_path / 'sim'
+    sim_dir.mkdir()
+    for i, name in enumerate(['ado001', 'adu002', 'chi003']):
+        df = sim_patient_df.copy()
+        df['bgl'] += i
+        df.reset_index().to_csv(sim_dir / f'{name}_Dexcom_Cozmo_2024-02-01_2024-02-15.csv')
+    (sim_dir / 'broken_Dexcom_Cozmo_2024-02-01_2024-02-15.csv').write_text('not,a\nsim,file\n')
+    return sim_dir
+
+
+def _crash_on_chi(file_path, *args, **kwargs):
+    """obfuscate_file, except that chi003 kills its worker process"""
+    if os.path.basename(file_path).startswith('chi003'):
+        os._exit(1)
+    return obfuscate_file(file_path, *args, **kwargs)
+
+
+class TestRunObfuscation:
+    def test_records(self, sim_dir, tmp_path):
+        """Every file gets a record, the broken file fails without stopping the others"""
+        records = run_obfuscation(sim_dir, tmp_path / 'out', global_seed=1, n_jobs=2, progress=False)
+        assert len(records) == 4
+        assert (records['status'] == 'success').sum() == 3
+
+        failed = records[records['status'] == 'failed'].iloc[0]
+        assert failed['file'].startswith('broken')
+        assert failed['error']
+
+        for output_file in records['output_file'].dropna():
+            assert os.path.exists(output_file)
+
+    def test_crashing_worker(self, sim_dir, tmp_path):
+        """A file killing its worker process only fails its own record"""
+        with mock.patch.object(dataset_data_obfuscator, 'obfuscate_file', _crash_on_chi):
+            records = run_obfuscation(sim_dir, tmp_path / 'out', global_seed=1, n_jobs=2, progress=False)
+        assert len(records) == 4
+        status = dict(zip(records['file'].str[:6], records['status']))
+        assert status == {'ado001': 'success', 'adu002': 'success', 'broken': 'failed', 'chi003': 'failed'}
+        assert 'BrokenProcessPool' in records.loc[records['file'].str.startswith('chi003'), 'error'].iloc[0]
+
+    def test_parallel_matches_serial(self, sim_dir, tmp_path):
+        """Process pool and in-process runs give bit-identical outputs"""
+        serial = run_obfuscation(sim_dir, tmp_path / 'serial', global_seed=1, n_jobs=1, progress=False)
+        parallel = run_obfuscation(sim_dir, tmp_path / 'parallel', global_seed=1, n_jobs=3, progress=False)
+        pd.testing.assert_series_equal(serial['logger_type'], parallel['logger_type'])
+
+        for serial_file, parallel_file in zip(serial['output_file'].dropna(), parallel['output_file'].dropna()):
+            assert os.path.basename(serial_file) == os.path.basename(parallel_file)
+            pd.testing.assert_frame_equal(LabelSidecar(serial_file).join(), LabelSidecar(parallel_file).join())
+
+    def test_csv_mode_writes_full_frame(self, sim_dir, tmp_path):
+        """With sidecar=False the whole patient frame is written with the label columns"""
+        records = run_obfuscation(sim_dir, tmp_path / 'out', global_seed=1, n_jobs=1, progress=False,
+                                  sidecar=False)
+        output_df = pd.read_csv(records['output_file'].dropna().iloc[0])
+        assert {'bgl', 'msg_type_log', 'msg_type_log_shifted'} <= set(output_df.columns)
+
+    def test_replica_mode_writes_labels_only(self, sim_dir, tmp_path):
+        """With n_replicas each patient gets one label file instead of a full copy"""
+        records = run_obfuscation(sim_dir, tmp_path / 'out', global_seed=1, n_jobs=1, progress=False,
+                                  n_replicas=3)
+        success = records[records['status'] == 'success']
+        assert len(success) == 3
+        assert all(len(types) == 3 for types in success['logger_type'])
+
+        labels = LabelSidecar(success['output_file'].iloc[0])
+        assert len(labels.columns) == 6
+        assert len(labels.metadata['logger_type']) == 3
@@ -0,0 +1,46 @@
+import threading
+
+import pandas as pd
+import pytest
+
+from meal_identification.datasets.dataset_data_obfuscator import obfuscate_replicas
+from meal_identification.datasets.dataset_obfuscation_stream import ObfuscatedLabelStream
+
+
+class TestObfuscatedLabelStream:
+    def test_epochs_match_replicas(self, sim_patient_df):
+        """Epoch k holds the same labels as replica k of obfuscate_replicas"""
+        replicas_df, replica_types = obfuscate_replicas(sim_patient_df, 4, global_seed=3, job_key='p1')
+        stream = ObfuscatedLabelStream(sim_patient_df, n_epochs=4, global_seed=3, job_key='p1')
+
+        epochs = list(stream)
+        assert len(epochs) == len(stream) == 4
+        for k, (labels_df, logger_types) in enumerate(epochs):
+            assert list(labels_df.columns) == ['msg_type_log', 'msg_type_log_shifted']
+            assert labels_df.index.equals(sim_patient_df.index)
+            assert labels_df['msg_type_log'].tolist() == replicas_df[f'msg_type_log_{k}'].tolist()
+            assert labels_df['msg_type_log_shifted'].tolist() == replicas_df[f'msg_type_log_shifted_{k}'].tolist()
+            assert logger_types == replica_types[k]
+
+    def test_input_untouched(self, sim_patient_df):
+        """Obfuscating never adds label columns to the patient frame"""
+        original = sim_patient_df.copy()
+        list(ObfuscatedLabelStream(sim_patient_df, n_epochs=2, global_seed=0))
+        pd.testing.assert_frame_equal(sim_patient_df, original)
+
+    def test_early_stop_ends_worker(self, sim_patient_df):
+        """Leaving an endless stream early stops its background worker"""
+        n_threads = threading.active_count()
+        stream = iter(ObfuscatedLabelStream(sim_patient_df, global_seed=0, prefetch=1))
+        for _ in range(3):
+            next(stream)
+        stream.close()
+        assert threading.active_count() == n_threads
+
+    def test_worker_error_raised(self, sim_patient_df):
+        """Errors in the worker are raised in the training loop"""
+        # Daily thresholds need a date index
+        stream = ObfuscatedLabelStream(sim_patient_df.reset_index(drop=True), n_epochs=2,
+                                       distribution_logging_behaviour=[0, 0, 1, 1, 1, 1])
+        with pytest.raises(AttributeError):
+            list(stream)
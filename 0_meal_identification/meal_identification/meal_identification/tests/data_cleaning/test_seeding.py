@@ -0,0 +1,43 @@
+import numpy as np
+import pandas as pd
+
+from meal_identification.datasets.dataset_seeding import job_rng, job_int_seed
+from meal_identification.datasets.dataset_data_obfuscator import (
+    logging_behaviour_obfuscator,
+    logging_timing_obfuscator,
+)
+
+
+def obfuscate(patient_df, global_seed, file):
+    """Same steps as dataset_data_obfuscator.start() for a single file"""
+    rng = job_rng(global_seed, file)
+    patient_df, _ = logging_behaviour_obfuscator(patient_df.copy(), rng.uniform(0, 1))
+    patient_df, _ = logging_timing_obfuscator(patient_df, 0.1, rng=rng)
+    return patient_df
+
+
+class TestJobSeeding:
+    def test_same_job_same_stream(self):
+        assert job_rng(123, 'adult#001').random() == job_rng(123, 'adult#001').random()
+        assert job_int_seed(123, ('adult#001', 'cgm')) == job_int_seed(123, ('adult#001', 'cgm'))
+
+    def test_jobs_are_independent(self):
+        assert job_int_seed(123, 'adult#001') != job_int_seed(123, 'adult#002')
+        assert job_int_seed(123, ('adult#001', 'cgm')) != job_int_seed(123, ('adult#001', 'scenario'))
+        assert job_int_seed(123, 'adult#001') != job_int_seed(124, 'adult#001')
+
+    def test_int_seed_range(self):
+        assert 0 <= job_int_seed(0, 'child#010') < 2 ** 32
+
+    def test_obfuscation_is_order_independent(self, sim_patient_df):
+        """Obfuscating files in a different order gives bit-identical outputs per file"""
+        files = ['a.csv', 'b.csv', 'c.csv']
+        forward = {f: obfuscate(sim_patient_df, 7, f) for f in files}
+        backward = {f: obfuscate(sim_patient_df, 7, f) for f in reversed(files)}
+        for f in files:
+            pd.testing.assert_frame_equal(forward[f], backward[f])
+
+    def test_obfuscation_depends_on_seed(self, sim_patient_df):
+        first = obfuscate(sim_patient_df, 7, 'a.csv')['msg_type_log_shifted']
+        second = obfuscate(sim_patient_df, 8, 'a.csv')['msg_type_log_shifted']
+        assert not np.array_equal(first.notna().to_numpy(), second.notna().to_numpy())
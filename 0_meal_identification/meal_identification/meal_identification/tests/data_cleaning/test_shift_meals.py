@@ -0,0 +1,70 @@
+import numpy as np
+import pandas as pd
+import pytest
+from scipy.stats import ks_2samp
+
+from meal_identification.datasets.dataset_data_obfuscator import (
+    nearest_index_positions,
+    shift_meals,
+    shift_meals_vectorized,
+)
+
+
+@pytest.fixture
+def spaced_meals_df():
+    """
+    1 minute resolution data with a logged meal every 6 hours, so shifted meals keep their order
+    and the shift of each meal can be read back from the shifted labels
+    """
+    dates = pd.date_range(start='2024-02-01', periods=800 * 360, freq='1min', name='date')
+    df = pd.DataFrame({'msg_type_log': None}, index=dates)
+    df.iloc[180::360, 0] = 'ANNOUNCE_MEAL'
+    return df
+
+
+def observed_shifts(df):
+    """Minutes between each logged meal and its shifted label"""
+    original = df.index[(df['msg_type_log'] == 'ANNOUNCE_MEAL').to_numpy()]
+    shifted = df.index[(df['msg_type_log_shifted'] == 'ANNOUNCE_MEAL').to_numpy()]
+    assert len(original) == len(shifted)
+    return (shifted - original).total_seconds().to_numpy() / 60
+
+
+class TestShiftMealsVectorized:
+    @pytest.mark.parametrize('direction', ['normal', 'left', 'right'])
+    def test_same_distribution_as_loop(self, spaced_meals_df, direction):
+        """Shifts from the vectorized version follow the same distribution as shift_meals"""
+        loop_shifts = observed_shifts(shift_meals(spaced_meals_df.copy(), direction, np.random.default_rng(1)))
+        vec_shifts = observed_shifts(
+            shift_meals_vectorized(spaced_meals_df.copy(), direction, np.random.default_rng(2))
+        )
+        assert ks_2samp(loop_shifts, vec_shifts).pvalue > 0.01
+        assert abs(np.mean(loop_shifts) - np.mean(vec_shifts)) < 1.5
+
+    def test_direction_of_shifts(self, spaced_meals_df):
+        """Forgetful loggers log late, hasty loggers log early"""
+        late = observed_shifts(shift_meals_vectorized(spaced_meals_df.copy(), 'left', np.random.default_rng(0)))
+        early = observed_shifts(shift_meals_vectorized(spaced_meals_df.copy(), 'right', np.random.default_rng(0)))
+        assert np.mean(late) > 10
+        assert np.mean(early) < -5
+
+    def test_out_of_range_meals_dropped(self):
+        """Meals shifted past either end of the series are ignored"""
+        dates = pd.date_range(start='2024-02-01', periods=12, freq='5min', name='date')
+        df = pd.DataFrame({'msg_type_log': None}, index=dates)
+        df.iloc[[0, -1], 0] = 'ANNOUNCE_MEAL'
+        result = shift_meals_vectorized(df, 'left', np.random.default_rng(0))
+        assert (result['msg_type_log_shifted'] == 'ANNOUNCE_MEAL').sum() == 1
+
+    def test_nearest_matches_get_indexer(self):
+        """Snapping agrees with get_indexer(method='nearest'), including ties"""
+        index = pd.date_range(start='2024-02-01', periods=50, freq='5min')
+        offsets = np.random.default_rng(0).uniform(0, 245, 500)
+        times = index[0] + pd.to_timedelta(np.append(offsets, [2.5, 7.5, 0, 245]), unit='m')
+        expected = index.get_indexer(times, method='nearest')
+        np.testing.assert_array_equal(nearest_index_positions(index, times), expected)
+
+    def test_nearest_out_of_range(self):
+        index = pd.date_range(start='2024-02-01', periods=5, freq='5min')
+        times = pd.DatetimeIndex([index[0] - pd.Timedelta(minutes=1), index[-1] + pd.Timedelta(minutes=1)])
+        np.testing.assert_array_equal(nearest_index_positions(index, times), [-1, -1])
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from meal_identification.datasets.dataset_glucose_simulator import process_simulated_data, SIM_RAW_DTYPES
+
+
+@pytest.fixture
+def sim_trace_df():
+    """A short simglucose-style trace with one meal (and its bolus) and one correction bolus"""
+    basal = 0.02
+    return pd.DataFrame({
+        'Time': pd.date_range(start='2024-01-01', periods=6, freq='3min'),
+        'BG': [120.0, 121.0, 125.0, 140.0, 160.0, 150.0],
+        'CGM': [118.0, 119.0, 126.0, 138.0, 162.0, 149.0],
+        'CHO': [0.0, 15.0, 0.0, 0.0, 0.0, 0.0],
+        'insulin': [basal, basal + 1.0, basal, basal, basal + 0.5, basal],
+        'LBGI': [0.0] * 6,
+        'HBGI': [0.0] * 6,
+        'Risk': [0.0] * 6,
+    })
+
+
+class TestProcessSimulatedData:
+    def test_typed_columns(self, sim_trace_df):
+        """Absent values are NaN/NA and every column carries its raw schema dtype"""
+        result_df = process_simulated_data(sim_trace_df)
+        assert list(result_df.columns) == ['date'] + list(SIM_RAW_DTYPES)
+        for col, dtype in SIM_RAW_DTYPES.items():
+            assert result_df[col].dtype == dtype, col
+        assert pd.api.types.is_datetime64_any_dtype(result_df['date'])
+        assert not (result_df.astype(object) == '').any().any()
+
+    def test_numeric_columns_stay_numeric(self, sim_trace_df):
+        """dose_units and food_glycemic_index are picked up as numeric columns"""
+        numeric_cols = process_simulated_data(sim_trace_df)._get_numeric_data().columns
+        assert {'bgl', 'bgl_real', 'food_g', 'dose_units', 'food_glycemic_index'} <= set(numeric_cols)
+        assert 'msg_type' not in numeric_cols
+
+    def test_meal_and_dose_events(self, sim_trace_df):
+        """Meals keep their msg_type, boluses above basal become DOSE_INSULIN events"""
+        result_df = process_simulated_data(sim_trace_df)
+        assert result_df['msg_type'].isna().tolist() == [True, False, True, True, False, True]
+        assert result_df.loc[1, 'msg_type'] == 'ANNOUNCE_MEAL'
+        assert result_df.loc[4, 'msg_type'] == 'DOSE_INSULIN'
+        assert result_df.loc[1, 'food_g'] == 15.0
+        assert result_df['food_g'].isna().sum() == 5
+        # insulin trace is U/min over a 3 minute sample
+        np.testing.assert_allclose(result_df.loc[[1, 4], 'dose_units'], [3.0, 1.5])
+        assert result_df['dose_units'].isna().sum() == 4
+        assert bool(result_df.loc[4, 'affects_iob']) and not bool(result_df.loc[4, 'affects_fob'])
+        assert result_df['affects_iob'].isna().sum() == 4
+
+    def test_suspended_insulin(self, sim_trace_df):
+        """A sample without insulin delivery (suspended pump) doesn't turn basal samples into boluses"""
+        sim_trace_df.loc[3, 'insulin'] = 0.0
+        result_df = process_simulated_data(sim_trace_df)
+        assert result_df['msg_type'].isna().tolist() == [True, False, True, True, False, True]
+        np.testing.assert_allclose(result_df.loc[[1, 4], 'dose_units'], [3.0, 1.5])
+        assert result_df['dose_units'].isna().sum() == 4
+
+    def test_without_insulin_trace(self, sim_trace_df):
+        """Older traces without insulin still produce meal events only"""
+        result_df = process_simulated_data(sim_trace_df.drop(columns=['insulin']))
+        assert (result_df['msg_type'] == 'ANNOUNCE_MEAL').sum() == 1
+        assert result_df['dose_units'].isna().all()
@@ -0,0 +1,36 @@
+from meal_identification.datasets.dataset_simulation_benchmark import (
+    check_regression,
+    load_benchmark_results,
+    save_benchmark_result,
+)
+
+
+def make_record(patient_days_per_sec, patient_names=('adult#001',)):
+    return {
+        'patient_names': list(patient_names),
+        'simulation_days': 1,
+        'global_seed': 123,
+        'cgm_name': 'Dexcom',
+        'insulin_pump_name': 'Cozmo',
+        'patient_days_per_sec': patient_days_per_sec,
+    }
+
+
+class TestSimulationBenchmark:
+    def test_no_history_is_not_a_regression(self):
+        assert not check_regression(make_record(1.0), [])
+
+    def test_regression_against_best_run(self):
+        history = [make_record(1.0), make_record(2.0)]
+        assert check_regression(make_record(1.5), history, tolerance=0.2)
+        assert not check_regression(make_record(1.7), history, tolerance=0.2)
+
+    def test_only_same_cohort_is_compared(self):
+        history = [make_record(10.0, patient_names=('child#001',))]
+        assert not check_regression(make_record(1.0), history)
+
+    def test_results_round_trip(self, tmp_path):
+        results_file = tmp_path / 'benchmarks' / 'simulation_benchmark.jsonl'
+        save_benchmark_result(make_record(1.0), results_file)
+        save_benchmark_result(make_record(2.0), results_file)
+        assert [r['patient_days_per_sec'] for r in load_benchmark_results(results_file)] == [1.0, 2.0]
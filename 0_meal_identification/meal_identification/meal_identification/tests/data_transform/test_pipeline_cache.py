@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sktime.transformations.compose import TransformerPipeline
+from sktime.transformations.series.cos import CosineTransformer
+from sktime.transformations.series.func_transform import FunctionTransformer
+from sktime.transformations.series.impute import Imputer
+
+from meal_identification.transformations.data_transformations import run_pipeline
+from meal_identification.transformations.pipeline_cache import CachedTransformerPipeline, hash_data, step_cache_key
+
+
+@pytest.fixture
+def bgl_df():
+    return pd.DataFrame({'bgl': [115.0, np.nan, 130.0, 98.0, np.nan, 101.0]})
+
+
+def steps(impute_method="mean"):
+    return [CosineTransformer(), Imputer(method=impute_method)]
+
+
+class TestCachedTransformerPipeline:
+    def test_same_output_as_pipeline(self, bgl_df, tmp_path):
+        """Cached and uncached pipelines transform the data the same way, hits or not"""
+        expected = TransformerPipeline(steps()).fit_transform(bgl_df)
+
+        first = CachedTransformerPipeline(steps(), cache_dir=str(tmp_path))
+        pd.testing.assert_frame_equal(first.fit_transform(bgl_df), expected)
+        assert first.cache_hits_ == []
+
+        second = CachedTransformerPipeline(steps(), cache_dir=str(tmp_path))
+        pd.testing.assert_frame_equal(second.fit_transform(bgl_df), expected)
+        assert second.cache_hits_ == ['CosineTransformer', 'Imputer']
+
+    def test_changed_last_step_reuses_upstream(self, bgl_df, tmp_path):
+        """Only the changed step and the ones after it are refitted"""
+        CachedTransformerPipeline(steps("mean"), cache_dir=str(tmp_path)).fit(bgl_df)
+        changed = CachedTransformerPipeline(steps("median"), cache_dir=str(tmp_path)).fit(bgl_df)
+        assert changed.cache_hits_ == ['CosineTransformer']
+
+    def test_changed_data_misses(self, bgl_df, tmp_path):
+        """Different data is never served from the cache"""
+        CachedTransformerPipeline(steps(), cache_dir=str(tmp_path)).fit(bgl_df)
+        other_df = bgl_df.fillna(120.0)
+        pipe = CachedTransformerPipeline(steps(), cache_dir=str(tmp_path)).fit(other_df)
+        assert pipe.cache_hits_ == []
+
+    def test_transform_other_data(self, bgl_df, tmp_path):
+        """Data other than the fitted data goes through the fitted steps"""
+        other_df = pd.DataFrame({'bgl': [np.nan, 90.0, 150.0]})
+        expected = TransformerPipeline(steps()).fit(bgl_df).transform(other_df)
+        pipe = CachedTransformerPipeline(steps(), cache_dir=str(tmp_path)).fit(bgl_df)
+        pd.testing.assert_frame_equal(pipe.transform(other_df), expected)
+
+    def test_run_pipeline_cache(self, bgl_df, tmp_path):
+        """run_pipeline gives the same results with a cache"""
+        data = [bgl_df, bgl_df * 1.1]
+        expected = run_pipeline(TransformerPipeline(steps()), data)
+        for _ in range(2):
+            result = run_pipeline(TransformerPipeline(steps()), data, cache_dir=str(tmp_path))
+            for result_df, expected_df in zip(result, expected):
+                pd.testing.assert_frame_equal(result_df, expected_df)
+
+
+def test_hash_data(bgl_df):
+    """Hashes change with values, columns and dtypes"""
+    assert hash_data(bgl_df) == hash_data(bgl_df.copy())
+    assert hash_data(bgl_df) != hash_data(bgl_df.fillna(0))
+    assert hash_data(bgl_df) != hash_data(bgl_df.rename(columns={'bgl': 'cgm'}))
+    assert hash_data(bgl_df) != hash_data(bgl_df.astype('float32'))
+    assert hash_data(bgl_df) != hash_data(bgl_df, bgl_df)
+
+
+class _Offset:
+    """Parameter object with the default repr, which includes its memory address"""
+    def __init__(self, value):
+        self.value = value
+
+
+def test_step_cache_key_hashes_params_by_value():
+    """Large arrays differing past numpy's print threshold get different keys, equal objects the same key"""
+    values = np.zeros(5000)
+    changed = values.copy()
+    changed[2500] = 1.0
+    assert step_cache_key('data', FunctionTransformer(kw_args={'offset': values})) != \
+        step_cache_key('data', FunctionTransformer(kw_args={'offset': changed}))
+
+    assert step_cache_key('data', FunctionTransformer(kw_args={'offset': _Offset(1.0)})) == \
+        step_cache_key('data', FunctionTransformer(kw_args={'offset': _Offset(1.0)}))
+    assert step_cache_key('data', FunctionTransformer(kw_args={'offset': _Offset(1.0)})) != \
+        step_cache_key('data', FunctionTransformer(kw_args={'offset': _Offset(2.0)}))
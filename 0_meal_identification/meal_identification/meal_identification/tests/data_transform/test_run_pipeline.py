@@ -0,0 +1,54 @@
+import pandas as pd
+import pytest
+from sktime.transformations.compose import TransformerPipeline
+from sktime.transformations.series.cos import CosineTransformer
+from sktime.transformations.series.impute import Imputer
+
+from meal_identification.transformations.data_transformations import run_pipeline, stack_panel, unstack_panel
+from meal_identification.transformations.pipeline_benchmark import benchmark_run_pipeline, synthetic_cohort
+
+
+@pytest.fixture
+def cohort():
+    return synthetic_cohort(n_patients=4, n_days=2, missing_rate=0.1)
+
+
+def pipeline():
+    return TransformerPipeline(steps=[CosineTransformer(), Imputer(method="mean")])
+
+
+class TestPanelMode:
+    def test_same_as_list(self, cohort):
+        """Panel mode fits each patient on its own data, like the list mode"""
+        expected = run_pipeline(pipeline(), cohort)
+        result = run_pipeline(pipeline(), cohort, panel=True)
+        assert len(result) == len(expected)
+        for result_df, expected_df in zip(result, expected):
+            pd.testing.assert_frame_equal(result_df, expected_df, check_freq=False)
+
+    def test_with_cache(self, cohort, tmp_path):
+        """Panel mode and step caching can be combined"""
+        expected = run_pipeline(pipeline(), cohort)
+        for _ in range(2):
+            result = run_pipeline(pipeline(), cohort, cache_dir=str(tmp_path), panel=True)
+            for result_df, expected_df in zip(result, expected):
+                pd.testing.assert_frame_equal(result_df, expected_df, check_freq=False)
+
+    def test_stack_round_trip(self, cohort):
+        """Stacking and unstacking gives the data back, Series included"""
+        data = [cohort[0], cohort[1]['bgl']]
+        panel = stack_panel(data)
+        assert panel.index.names == ['instance', 'date']
+        unstacked = unstack_panel(panel, data)
+        pd.testing.assert_frame_equal(unstacked[0], data[0], check_freq=False)
+        pd.testing.assert_series_equal(unstacked[1], data[1], check_freq=False)
+
+
+def test_benchmark_run_pipeline(cohort):
+    """The benchmark reports both modes on the whole cohort"""
+    record = benchmark_run_pipeline(pipeline(), cohort, n_repeats=1)
+    assert record['steps'] == ['CosineTransformer', 'Imputer']
+    assert record['n_series'] == 4
+    assert record['n_rows'] == 4 * 2 * 288
+    assert record['list_s'] > 0 and record['panel_s'] > 0
+    assert record['panel_speedup'] == pytest.approx(record['list_s'] / record['panel_s'])
@@ -0,0 +1,75 @@
+import os
+import sqlite3
+from concurrent.futures import ProcessPoolExecutor
+
+import pytest
+
+from meal_identification.transformations.run_registry import RunRegistry
+
+
+def allocate_runs(processed_dir, n_runs=5):
+    registry = RunRegistry(processed_dir)
+    return [registry.allocate_run()[0] for _ in range(n_runs)]
+
+
+class TestRunRegistry:
+    def test_legacy_runs(self, tmp_path):
+        """Runs saved before the registry are indexed and numbering continues after them"""
+        os.mkdir(tmp_path / "run_1")
+        os.mkdir(tmp_path / "run_4")
+        os.mkdir(tmp_path / "not_a_run_7")
+        registry = RunRegistry(str(tmp_path))
+        assert registry.runs() == [1, 4]
+        assert registry.get(4)['status'] == 'legacy'
+
+        run, run_dir = registry.allocate_run()
+        assert run == 5
+        assert run_dir == str(tmp_path / "run_5") and os.path.isdir(run_dir)
+
+    def test_complete_and_get(self, tmp_path):
+        """Completed runs record their inputs, pipeline and artifacts"""
+        registry = RunRegistry(str(tmp_path))
+        run, _ = registry.allocate_run()
+        assert registry.runs(status='allocated') == [run]
+
+        registry.complete_run(
+            run,
+            input_files=['a.csv'],
+            pipeline_config={'steps': '[CosineTransformer()]'},
+            artifacts={'a.csv': {'data': 'data/a.parquet', 'pipeline': 'pipelines/Pipeline_a.zip'}},
+            data_hashes={'inputs': {'a.csv': 'abc'}, 'outputs': {'a.csv': 'def'}},
+        )
+        record = RunRegistry(str(tmp_path)).get(run)
+        assert record['status'] == 'complete'
+        assert record['input_files'] == ['a.csv']
+        assert record['artifacts']['a.csv']['data'] == 'data/a.parquet'
+        assert record['data_hashes']['outputs'] == {'a.csv': 'def'}
+        assert record['run_dir'] == str(tmp_path / "run_1")
+
+    def test_unknown_run(self, tmp_path):
+        registry = RunRegistry(str(tmp_path))
+        with pytest.raises(KeyError):
+            registry.get(3)
+        with pytest.raises(KeyError):
+            registry.complete_run(3)
+
+    def test_readonly(self, tmp_path):
+        """A read-only registry never creates or writes the database"""
+        with pytest.raises(FileNotFoundError):
+            RunRegistry(str(tmp_path), readonly=True)
+        assert not os.path.exists(tmp_path / "runs.sqlite")
+
+        run, _ = RunRegistry(str(tmp_path)).allocate_run()
+        registry = RunRegistry(str(tmp_path), readonly=True)
+        assert registry.get(run)['status'] == 'allocated'
+        assert registry.runs() == [run]
+        with pytest.raises(sqlite3.OperationalError):
+            registry.allocate_run()
+
+    def test_concurrent_allocation(self, tmp_path):
+        """Processes allocating at the same time never share a run number"""
+        with ProcessPoolExecutor(max_workers=4) as executor:
+            allocated = list(executor.map(allocate_runs, [str(tmp_path)] * 4))
+        runs = sorted(run for runs in allocated for run in runs)
+        assert runs == list(range(1, 21))
+        assert sorted(os.listdir(tmp_path)) == sorted(['runs.sqlite'] + [f"run_{run}" for run in runs])
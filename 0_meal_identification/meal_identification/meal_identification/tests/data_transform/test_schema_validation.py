@@ -0,0 +1,54 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from meal_identification.transformations.schema_validation import ColumnSchema, DataFrameSchema
+
+
+@pytest.fixture
+def transformed_df():
+    return pd.DataFrame({
+        'bgl': [0.5, -0.2, np.nan, 1.0],
+        'food_g': [np.nan, np.nan, 0.1, -1.0],
+        'msg_type': ['ANNOUNCE_MEAL', None, None, None],
+    })
+
+
+class TestDataFrameSchema:
+    def test_report(self, transformed_df):
+        """Valid data gives a report of every checked column"""
+        schema = DataFrameSchema(columns={
+            'bgl': ColumnSchema(dtype='float', ge=-1, le=1, max_nan=1),
+            'food_g': ColumnSchema(dtype='numeric', ge=-1, le=1),
+            'msg_type': ColumnSchema(dtype='object'),
+        })
+        report = schema.validate_df(transformed_df)
+        assert report['bgl'] == {'dtype': 'float64', 'nan_count': 1, 'min': -0.2, 'max': 1.0}
+        assert report['food_g']['nan_count'] == 2
+        assert report['msg_type']['min'] is None
+
+    def test_all_violations_listed(self, transformed_df):
+        """Dtype, range, NaN count and missing column violations are all reported at once"""
+        schema = DataFrameSchema(columns={
+            'bgl': ColumnSchema(ge=0, max_nan=0),
+            'food_g': ColumnSchema(le=0),
+            'msg_type': ColumnSchema(dtype='float'),
+            'dose_units': ColumnSchema(),
+            'food_glycemic_index': ColumnSchema(required=False),
+        })
+        with pytest.raises(ValueError) as error:
+            schema.validate_df(transformed_df, name='500030.csv')
+        message = str(error.value)
+        assert message.startswith('500030.csv does not match the schema')
+        assert 'bgl has 1 values below 0' in message
+        assert 'bgl has 1 NaN values, at most 0 allowed' in message
+        assert 'food_g has 1 values above 0' in message
+        assert 'msg_type has dtype object, expected float' in message
+        assert 'missing column dose_units' in message
+        assert 'food_glycemic_index' not in message
+
+    def test_all_nan_column(self):
+        """Columns without values have no range to check"""
+        schema = DataFrameSchema(columns={'bgl': ColumnSchema(dtype='float', ge=-1, le=1)})
+        report = schema.validate_df(pd.DataFrame({'bgl': [np.nan, np.nan]}))
+        assert report['bgl']['min'] is None and report['bgl']['nan_count'] == 2
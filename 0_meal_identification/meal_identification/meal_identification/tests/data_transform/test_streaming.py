@@ -0,0 +1,61 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sktime.transformations.compose import TransformerPipeline
+from sktime.transformations.series.cos import CosineTransformer
+from sktime.transformations.series.impute import Imputer
+from sktime.transformations.series.lag import Lag
+
+from meal_identification.transformations.streaming import iter_chunks, stream_transform, stream_transform_to_csv
+
+
+@pytest.fixture
+def long_df():
+    """Series with gaps of up to 5 rows, too short for the forward fill to reach past history"""
+    rng = np.random.default_rng(0)
+    bgl = rng.normal(140, 20, 1000)
+    for start in rng.choice(np.arange(1, 990), 60, replace=False):
+        bgl[start:start + rng.integers(1, 6)] = np.nan
+    return pd.DataFrame({'bgl': bgl, 'msg_type': np.where(rng.random(1000) < 0.01, 'ANNOUNCE_MEAL', None)})
+
+
+def fitted_pipeline(df, steps):
+    return TransformerPipeline(steps=steps).fit(df[['bgl']])
+
+
+class TestStreamTransform:
+    @pytest.mark.parametrize('steps', [
+        [Imputer(method='ffill'), CosineTransformer()],
+        [Imputer(method='ffill'), Lag(3, index_out='original')],
+    ])
+    def test_same_as_whole_series(self, long_df, steps):
+        """Chunks with carried history give the transform of the whole series"""
+        pipe = fitted_pipeline(long_df, steps)
+        expected = pipe.transform(long_df[['bgl']])
+        chunks = stream_transform(pipe, iter_chunks(long_df[['bgl']], 64), history=10)
+        pd.testing.assert_frame_equal(pd.concat(chunks), expected)
+
+    def test_without_history_differs(self, long_df):
+        """Without history, chunks starting in a gap are back filled from the chunk instead"""
+        pipe = fitted_pipeline(long_df, [Imputer(method='ffill')])
+        expected = pipe.transform(long_df[['bgl']])
+        result = pd.concat(stream_transform(pipe, iter_chunks(long_df[['bgl']], 7), history=0))
+        assert not result.equals(expected)
+
+    def test_untransformed_columns(self, long_df):
+        """Columns outside of `columns` are passed through"""
+        pipe = fitted_pipeline(long_df, [Imputer(method='ffill'), CosineTransformer()])
+        result = pd.concat(stream_transform(pipe, iter_chunks(long_df, 100), history=10, columns=['bgl']))
+        pd.testing.assert_series_equal(result['msg_type'], long_df['msg_type'])
+        pd.testing.assert_series_equal(result['bgl'], pipe.transform(long_df[['bgl']])['bgl'])
+
+    def test_to_csv(self, long_df, tmp_path):
+        """Chunks read from a csv are appended to the output file as they are transformed"""
+        long_df.to_csv(tmp_path / 'in.csv', index=False)
+        pipe = fitted_pipeline(long_df, [Imputer(method='ffill'), CosineTransformer()])
+        n_rows = stream_transform_to_csv(pipe, iter_chunks(str(tmp_path / 'in.csv'), 128), tmp_path / 'out.csv',
+                                         history=10, columns=['bgl'], column_order=['msg_type', 'bgl'])
+        assert n_rows == len(long_df)
+        result = pd.read_csv(tmp_path / 'out.csv', index_col=0)
+        assert list(result.columns) == ['msg_type', 'bgl']
+        np.testing.assert_allclose(result['bgl'], pipe.transform(long_df[['bgl']])['bgl'])
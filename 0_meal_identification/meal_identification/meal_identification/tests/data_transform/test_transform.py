@@ -5,7 +5,10 @@ import tempfile
 import shutil
 import unittest
 from meal_identification.transformations.pipeline_generator import PipelineGenerator
-from meal_identification.transformations.pydantic_test_models import NumericColumns, CategoricalColumns, CosineTransformed
+from meal_identification.transformations.run_registry import RunRegistry
+from meal_identification.datasets.dataset_label_sidecar import file_sha256
+from meal_identification.transformations.pydantic_test_models import NumericColumns, CategoricalColumns, CosineTransformed, COSINE_TRANSFORMED_SCHEMA
+from meal_identification.transformations.pydantic_test_models import NUMERIC_COLUMNS_SCHEMA, CATEGORICAL_COLUMNS_SCHEMA, TRANSFORMED_SCHEMA
 from meal_identification.datasets.pydantic_test_models import DataFrameValidator
 from sktime.transformations.series.cos import CosineTransformer
 
@@ -81,6 +84,21 @@ class TestTransformation(unittest.TestCase):
         # dfs are not indexed with date col
         assert DataFrameValidator(CategoricalColumns, index_field='date').validate_df(result_df, True)
 
+    def test_vectorized_column_schemas(self):
+        """
+        Tests that the vectorized schemas accept the loaded data like their pydantic models, and catch
+        the same violations
+        """
+        gen = PipelineGenerator()
+        gen.load_data([self.filename])
+        NUMERIC_COLUMNS_SCHEMA.validate_df(gen.data_num[self.filename])
+        CATEGORICAL_COLUMNS_SCHEMA.validate_df(gen.data_cat[self.filename])
+
+        with pytest.raises(ValueError, match="food_g has 1 values below 0"):
+            NUMERIC_COLUMNS_SCHEMA.validate_df(gen.data_num[self.filename].assign(food_g=[-5.0, None]))
+        with pytest.raises(ValueError, match="date has dtype object"):
+            CATEGORICAL_COLUMNS_SCHEMA.validate_df(gen.data_cat[self.filename].assign(date='2024-07-01'))
+
 
     def test_transformed(self):
         """
@@ -96,3 +114,225 @@ class TestTransformation(unittest.TestCase):
         gen.fit_transform()
         result_df = gen.save_output()[interim_file]
         assert DataFrameValidator(CosineTransformed, index_field='date').validate_df(result_df, True)
+
+    def _transform_copies(self, n_copies=3, **kwargs):
+        """Fit/transform n_copies of the sample data (with different bgl values) with the given options"""
+        files = []
+        for i in range(n_copies):
+            filename = f'interim_data_{i}.csv'
+            copy_df = self.sample_interim_data.assign(bgl=self.sample_interim_data['bgl'] + 10 * i)
+            copy_df.to_csv(os.path.join(self.full_interim_path, filename), index=False)
+            files.append(filename)
+
+        gen = PipelineGenerator(**kwargs)
+        gen.load_data(files)
+        gen.generate_pipeline([
+            CosineTransformer(),
+            Imputer(method = "constant", value = 0)
+        ])
+        gen.fit_transform()
+        return gen
+
+    def test_parallel_matches_serial(self):
+        """
+        Tests that thread and process backends, with or without low memory mode, give the serial results
+        """
+        serial = self._transform_copies()
+        for kwargs in [
+            dict(n_jobs=2, backend="threading"),
+            dict(n_jobs=2, backend="loky"),
+            dict(n_jobs=2, backend="threading", low_memory=True),
+        ]:
+            gen = self._transform_copies(**kwargs)
+            assert list(gen.data_num) == list(serial.data_num)
+            for key in serial.data_num:
+                pd.testing.assert_frame_equal(gen.data_num[key], serial.data_num[key])
+                gen.pipe[key].check_is_fitted()
+
+    def test_fit_then_transform(self):
+        """
+        Tests that fit and transform run separately in parallel give the fit_transform results
+        """
+        serial = self._transform_copies()
+        gen = PipelineGenerator(n_jobs=2, backend="loky")
+        gen.load_data(list(serial.data_num))
+        gen.generate_pipeline([
+            CosineTransformer(),
+            Imputer(method = "constant", value = 0)
+        ])
+        gen.fit()
+        gen.transform()
+        for key in serial.data_num:
+            pd.testing.assert_frame_equal(gen.data_num[key], serial.data_num[key])
+
+    def test_cached_pipelines(self):
+        """
+        Tests that a second generator with the same cache reuses every fitted step
+        """
+        cache_dir = os.path.join(self.project_root, "cache")
+        first = self._transform_copies(cache_dir=cache_dir)
+        second = self._transform_copies(cache_dir=cache_dir)
+        for key in first.data_num:
+            pd.testing.assert_frame_equal(second.data_num[key], first.data_num[key])
+            assert second.pipe[key].cache_hits_ == ['CosineTransformer', 'Imputer']
+
+    def test_run_artifacts(self):
+        """
+        Tests that saved runs are described by their manifest and read back as they were saved
+        """
+        gen = self._transform_copies(n_copies=2)
+        for run, data_format in enumerate(["parquet", "feather", "csv"], start=1):
+            processed_data = gen.save_output(data_format=data_format)
+            artifacts = gen.load_run(run)
+            assert artifacts.run == run
+            assert artifacts.data_format == data_format
+            assert artifacts.datasets == list(processed_data)
+            assert artifacts.column_order == list(self.sample_interim_data.columns)
+            for key, expected_df in processed_data.items():
+                result_df = artifacts.data(key)
+                assert list(result_df.columns) == artifacts.column_order
+                pd.testing.assert_series_equal(result_df['bgl'], expected_df['bgl'])
+                assert artifacts.data(key) is result_df
+                artifacts.pipeline(key).check_is_fitted()
+
+        assert os.path.exists(os.path.join(self.full_processed_path, "run_1", "data", "interim_data_0.parquet"))
+        assert os.path.exists(os.path.join(self.full_processed_path, "run_2", "data", "interim_data_0.arrow"))
+
+        # pipelines of past runs are found through the manifest
+        new_gen = PipelineGenerator()
+        new_gen.load_data(artifacts.datasets)
+        new_gen.generate_pipeline(run=1)
+        assert new_gen.pipe["interim_data_0.csv"].get_params()["Imputer__value"] == 0
+
+    def test_legacy_run_without_pipeline(self):
+        """
+        Tests that a run saved before the registry without a pipeline is reported, and that looking
+        it up doesn't create the registry
+        """
+        os.makedirs(os.path.join(self.full_processed_path, "run_1", "pipelines"))
+        gen = PipelineGenerator()
+        gen.load_data([self.filename])
+        for run in [1, 2]:
+            with self.assertRaisesRegex(ValueError, f"run {run} has no saved pipeline"):
+                gen.generate_pipeline(run=run)
+        assert not os.path.exists(os.path.join(self.full_processed_path, "runs.sqlite"))
+
+    def test_run_registered(self):
+        """
+        Tests that saved runs are indexed with their inputs, artifacts and hashes
+        """
+        gen = self._transform_copies(n_copies=2)
+        gen.save_output()
+        gen.save_output()
+        registry = RunRegistry(self.full_processed_path)
+        assert registry.runs(status="complete") == [1, 2]
+        record = registry.get(2)
+        assert record["input_files"] == ["interim_data_0.csv", "interim_data_1.csv"]
+        assert record["artifacts"] == gen.load_run(2).manifest["datasets"]
+        assert record["data_hashes"]["inputs"]["interim_data_0.csv"] == file_sha256(
+            os.path.join(self.full_interim_path, "interim_data_0.csv"))
+        assert record["data_hashes"]["outputs"]["interim_data_1.csv"] == file_sha256(
+            os.path.join(record["run_dir"], "data", "interim_data_1.parquet"))
+
+    def test_stream_transform(self):
+        """
+        Tests that streaming a dataset in chunks writes the same data as transforming it whole
+        """
+        long_data = pd.concat([self.sample_interim_data] * 50, ignore_index=True)
+        long_data['date'] = pd.date_range('2024-07-01', periods=len(long_data), freq='5min', tz='UTC')
+        long_data.loc[long_data.index % 7 == 3, 'bgl'] = None
+        long_data.to_csv(self.file_path, index=False)
+
+        gen = PipelineGenerator()
+        gen.load_data([self.filename])
+        gen.generate_pipeline([
+            Imputer(method = "ffill"),
+            CosineTransformer()
+        ])
+        gen.fit_transform()
+        expected = gen.save_output(data_format="csv")[self.filename]
+
+        output_path = os.path.join(self.project_root, "streamed.csv")
+        n_rows = gen.stream_transform(self.filename, output_path, chunksize=16, history=4)
+        assert n_rows == len(long_data)
+        result = pd.read_csv(output_path, index_col=0)
+        assert list(result.columns) == list(expected.columns)
+        pd.testing.assert_series_equal(result['bgl'], expected['bgl'])
+
+    def test_shared_fit(self):
+        """
+        Tests that a shared pipeline is fitted once on the pooled datasets and saved once
+        """
+        self.sample_interim_data['bgl'] = [115.0, None]
+        gen = self._transform_copies(n_copies=3, shared_fit=True)
+        keys = list(gen.pipe)
+        assert all(gen.pipe[key] is gen.pipe[keys[0]] for key in keys)
+        gen.pipe[keys[0]].check_is_fitted()
+
+        # the constant imputer of the pipeline fills the same value for everyone
+        assert [gen.data_num[key]['bgl'].iloc[1] for key in keys] == [0, 0, 0]
+
+        gen.save_output()
+        assert os.listdir(os.path.join(self.full_processed_path, "run_1", "pipelines")) == ["Pipeline_shared.zip"]
+        artifacts = gen.load_run(1)
+        assert artifacts.manifest["shared_fit"]
+        assert artifacts.pipeline(keys[0]) is artifacts.pipeline(keys[2])
+
+    def test_shared_fit_pooled_sample(self):
+        """
+        Tests that the shared pipeline is fitted on the pooled data of fit_sample datasets
+        """
+        self.sample_interim_data['bgl'] = [115.0, None]
+        gen = PipelineGenerator(shared_fit=True)
+        files = []
+        for i in range(4):
+            filename = f'interim_data_{i}.csv'
+            self.sample_interim_data.assign(bgl=[10.0 * (i + 1), None]).to_csv(
+                os.path.join(self.full_interim_path, filename), index=False)
+            files.append(filename)
+        gen.load_data(files)
+        assert gen.pooled_data()['bgl'].tolist()[::2] == [10.0, 20.0, 30.0, 40.0]
+
+        gen.generate_pipeline([Imputer(method = "mean")])
+        gen.fit_transform()
+        # pooled mean of the four datasets
+        assert [gen.data_num[key]['bgl'].iloc[1] for key in files] == [25.0] * 4
+
+        gen = PipelineGenerator(shared_fit=True, fit_sample=2, random_state=0)
+        gen.load_data(files)
+        assert len(gen.pooled_data()) == 4
+        gen.generate_pipeline([Imputer(method = "mean")])
+        gen.fit_transform()
+        sampled_mean = gen.pooled_data()['bgl'].mean()
+        assert [gen.data_num[key]['bgl'].iloc[1] for key in files] == [sampled_mean] * 4
+
+    def test_schema_checked_after_transform(self):
+        """
+        Tests that transformed data is checked against the schema and that violations are raised
+        """
+        gen = self._transform_copies(n_copies=2, schema=COSINE_TRANSFORMED_SCHEMA)
+        assert set(gen.validation_reports) == set(gen.data_num)
+        report = gen.validation_reports["interim_data_0.csv"]
+        assert report["bgl"]["nan_count"] == 0
+        assert -1 <= report["bgl"]["min"] <= report["bgl"]["max"] <= 1
+
+        gen = PipelineGenerator(schema=COSINE_TRANSFORMED_SCHEMA)
+        gen.load_data([self.filename])
+        gen.generate_pipeline([Imputer(method = "constant", value = 0)])
+        with pytest.raises(ValueError, match="bgl has 2 values above 1"):
+            gen.fit_transform()
+
+    def test_default_schema(self):
+        """
+        Tests that transformed data is checked against TRANSFORMED_SCHEMA unless validation is turned off
+        """
+        gen = self._transform_copies(n_copies=1)
+        assert gen.schema is TRANSFORMED_SCHEMA
+        assert set(gen.validation_reports["interim_data_0.csv"]) == set(gen.numeric_columns["interim_data_0.csv"])
+
+        # bgl is out of the schema's range but not checked
+        gen = PipelineGenerator(schema=COSINE_TRANSFORMED_SCHEMA, validate=False)
+        gen.load_data([self.filename])
+        gen.generate_pipeline([Imputer(method = "constant", value = 0)])
+        gen.fit_transform()
+        assert gen.validation_reports == {}
@@ -0,0 +1,69 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+from hmmlearn import hmm
+
+from meal_identification.modeling.train import (
+    build_model, fit_cohort, split_sequences, train_cohort_model, prepare_data, ScaledLogitTransformer
+)
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+class TestCohortTraining(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data_dir = INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3"
+        cls.data_paths = sorted(cls.data_dir.glob("*.csv"))[:2]
+
+    def test_split_sequences(self):
+        """Test that sequences cover the series in order, the last one being shorter."""
+        X = pd.DataFrame({"bgl": np.arange(10.0)})
+        sequences = split_sequences(X, sequence_length=4)
+        assert [len(sequence) for sequence in sequences] == [4, 4, 2]
+        pd.testing.assert_frame_equal(pd.concat(sequences), X)
+        assert len(split_sequences(X)) == 1
+
+    def test_fit_cohort_lengths(self):
+        """Test that the sequences are fitted with their lengths in a single fit call."""
+        rng = np.random.default_rng(0)
+        sequences = [pd.DataFrame({"bgl": rng.normal(size=n)}) for n in [50, 80, 30]]
+        model = build_model("GaussianHMM", n_iter=5, verbose=False, random_state=0)
+
+        with mock.patch.object(hmm.GaussianHMM, "fit", autospec=True, side_effect=hmm.GaussianHMM.fit) as fit:
+            fit_cohort(model, sequences)
+        fit.assert_called_once()
+        assert list(fit.call_args.kwargs["lengths"]) == [50, 80, 30]
+
+        predicted = model.predict(sequences[0])
+        assert len(predicted) == 50
+
+    def test_fit_cohort_unsupported_model(self):
+        """Only the hmmlearn models can be fitted on several sequences."""
+        model = build_model("GreedyGaussianSegmentation")
+        with self.assertRaises(ValueError):
+            fit_cohort(model, [pd.DataFrame({"bgl": [1.0, 2.0]})])
+
+    def test_train_cohort_model(self):
+        """Test training one model on several patients split into days."""
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model, metrics = train_cohort_model(
+                self.data_paths,
+                model_path=Path(tmp_dir) / "GaussianHMM_cohort",
+                model="GaussianHMM",
+                sequence_length=288,
+                n_iter=5,
+                verbose=False,
+            )
+        assert model is not None
+        assert list(metrics.index) == [str(path) for path in self.data_paths]
+        assert metrics["test_count_error"].notna().all()
+
+        _, X_val, _, _ = prepare_data(self.data_paths[0], transformer=ScaledLogitTransformer())
+        assert len(model.predict(X_val)) == len(X_val)
+
+        assert train_cohort_model(self.data_paths, model_path=Path("unused"), model="STRAY") == (None, None)
@@ -0,0 +1,70 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+
+from meal_identification.modeling.cross_validation import (
+    day_starts, rolling_origin_folds, cross_validate, summarize_folds, FOLD_COLUMNS
+)
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+class TestRollingOriginFolds(unittest.TestCase):
+    def setUp(self):
+        # 5 days of 4 rows
+        self.days = np.repeat(["d1", "d2", "d3", "d4", "d5"], 4)
+
+    def test_day_starts(self):
+        np.testing.assert_array_equal(day_starts(self.days), [0, 4, 8, 12, 16])
+        np.testing.assert_array_equal(day_starts(["d1", "d1", "d2"]), [0, 2])
+        assert len(day_starts([])) == 0
+
+    def test_expanding_folds(self):
+        """Folds train on every day before the origin and test on the next horizon."""
+        folds = rolling_origin_folds(day_starts(self.days), len(self.days), initial_days=2)
+        assert folds == [(0, 8, 12), (0, 12, 16), (0, 16, 20)]
+
+    def test_rolling_folds(self):
+        """A rolling window keeps the last max_train_days days, folds move by step_days."""
+        folds = rolling_origin_folds(day_starts(self.days), len(self.days), initial_days=2, max_train_days=2,
+                                     step_days=2)
+        assert folds == [(0, 8, 12), (8, 16, 20)]
+
+    def test_horizon_and_max_folds(self):
+        folds = rolling_origin_folds(day_starts(self.days), len(self.days), initial_days=1, horizon_days=2)
+        assert folds == [(0, 4, 12), (0, 8, 16), (0, 12, 20)]
+        assert rolling_origin_folds(day_starts(self.days), len(self.days), initial_days=1, max_folds=1) == [(0, 16, 20)]
+        assert rolling_origin_folds(day_starts(self.days), len(self.days), initial_days=5) == []
+
+
+class TestCrossValidate(unittest.TestCase):
+    def test_cross_validate(self):
+        """Test that each fold of each model gets metrics, and their summary."""
+        data_path = INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"
+        folds = cross_validate(
+            [data_path],
+            {"GaussianHMM": {"n_iter": [3], "n_components": [2, 3], "verbose": [False]}},
+            initial_days=7, step_days=7, max_train_days=7, max_folds=2, n_jobs=4,
+        )
+        assert list(folds.columns) == FOLD_COLUMNS
+        assert len(folds) == 4
+        assert (folds["status"] == "ok").all()
+        # Folds are day aligned and test on a single day
+        assert (folds["test_end"] - folds["train_end"] == 288).all()
+
+        summary = summarize_folds(folds)
+        assert len(summary) == 2
+        assert (summary["n_ok"] == 2).all()
+        assert summary["test_count_error_mean"].notna().all()
+
+    def test_summarize_undefined_folds(self):
+        """Folds where a metric is undefined are left out of its mean and counted."""
+        folds = pd.DataFrame([
+            {"dataset": "a", "model": "GaussianHMM", "params": "{}", "fold": fold, "status": "ok",
+             "fit_seconds": 1.0, "test_hausdorff_error": value}
+            for fold, value in enumerate([2.0, np.nan, 4.0])
+        ], columns=FOLD_COLUMNS)
+        summary = summarize_folds(folds)
+        assert summary.loc[0, "test_hausdorff_error_mean"] == 3.0
+        assert summary.loc[0, "test_hausdorff_error_n_undefined"] == 1
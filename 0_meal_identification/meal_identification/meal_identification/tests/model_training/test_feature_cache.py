@@ -0,0 +1,76 @@
+import shutil
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from meal_identification.modeling import train
+from meal_identification.modeling.feature_cache import FeatureCache
+from meal_identification.modeling.train import prepare_data, ScaledLogitTransformer
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+class TestFeatureCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.mkdtemp()
+        self.cache_dir = Path(self.tmp_dir) / "features"
+        self.data_path = Path(self.tmp_dir) / "500030.csv"
+        shutil.copy(INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv", self.data_path)
+
+    def tearDown(self):
+        shutil.rmtree(self.tmp_dir)
+
+    def test_save_load(self):
+        """Test that cached frames come back memory mapped and unchanged."""
+        cache = FeatureCache(self.cache_dir)
+        X = pd.DataFrame({"bgl": np.linspace(0, 1, 50)}, index=pd.date_range("2024-01-01", periods=50, freq="5min"))
+        Y = pd.DataFrame({"msg_type": np.arange(50) % 2}, index=X.index)
+        key = cache.key(self.data_path, ScaledLogitTransformer())
+        assert cache.load(key) is None
+
+        cache.save(key, X, Y)
+        X_cached, Y_cached = cache.load(key)
+        pd.testing.assert_frame_equal(X_cached, X, check_freq=False)
+        pd.testing.assert_frame_equal(Y_cached, Y, check_freq=False)
+        # Backed by the read-only memory map rather than a copy
+        assert not X_cached["bgl"].values.flags.writeable
+
+    def test_key(self):
+        """Test that keys change with the file content and the transformer parameters."""
+        cache = FeatureCache(self.cache_dir)
+        key = cache.key(self.data_path, ScaledLogitTransformer())
+        assert cache.key(self.data_path, ScaledLogitTransformer()) == key
+        assert cache.key(self.data_path, ScaledLogitTransformer(upper_bound=500)) != key
+
+        with open(self.data_path, "a") as f:
+            f.write("\n")
+        assert cache.key(self.data_path, ScaledLogitTransformer()) != key
+
+    def test_prepare_data_cached(self):
+        """Test that preparing the same data again skips loading and transforming it."""
+        expected = prepare_data(self.data_path, transformer=ScaledLogitTransformer())
+        first = prepare_data(self.data_path, transformer=ScaledLogitTransformer(), cache_dir=self.cache_dir)
+
+        with mock.patch.object(train, "load_data") as load_data, mock.patch.object(train, "transform_data") as transform:
+            second = prepare_data(self.data_path, transformer=ScaledLogitTransformer(), cache_dir=self.cache_dir)
+        load_data.assert_not_called()
+        transform.assert_not_called()
+
+        for expected_part, first_part, second_part in zip(expected, first, second):
+            pd.testing.assert_frame_equal(first_part, expected_part)
+            pd.testing.assert_frame_equal(second_part, expected_part)
+
+    def test_prepare_data_cached_labels(self):
+        """Labels given to prepare_data replace the cached labels."""
+        prepare_data(self.data_path, transformer=ScaledLogitTransformer(), cache_dir=self.cache_dir)
+        n_rows = len(pd.read_csv(self.data_path))
+        labels = ["ANNOUNCE_MEAL"] * n_rows
+        _, _, Y_train, Y_val = prepare_data(self.data_path, transformer=ScaledLogitTransformer(),
+                                            labels=labels, cache_dir=self.cache_dir)
+        assert (Y_train["msg_type"] == 1).all() and (Y_val["msg_type"] == 1).all()
+        assert prepare_data(self.data_path, transformer=ScaledLogitTransformer(),
+                            labels=labels[:-1], cache_dir=self.cache_dir) is None
@@ -0,0 +1,39 @@
+import unittest
+
+import numpy as np
+import pandas as pd
+import sktime
+from hmmlearn import hmm
+
+from meal_identification.modeling.train import build_model
+from meal_identification.modeling.hmm_estimator import get_hmm_estimator, set_hmm_estimator
+
+
+class TestHMMEstimator(unittest.TestCase):
+    """
+    Pin the private sktime attributes used by get_hmm_estimator and set_hmm_estimator. A failure
+    here after upgrading sktime (tested with 0.34) means those two functions need updating.
+    """
+
+    def setUp(self):
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame({"bgl": np.concatenate([rng.normal(0, 1, 300), rng.normal(5, 1, 300)])})
+
+    def test_get_fitted_estimator(self):
+        model = build_model("GaussianHMM", n_iter=5, verbose=False, random_state=0)
+        assert get_hmm_estimator(model) is None
+        model.fit(self.X)
+        estimator = get_hmm_estimator(model)
+        assert isinstance(estimator, hmm.GaussianHMM), f"sktime {sktime.__version__}"
+        assert estimator.means_.shape == (2, 1)
+
+    def test_set_fitted_estimator(self):
+        """A model given an estimator fitted outside sktime predicts like one fitted by sktime."""
+        fitted = build_model("GaussianHMM", n_iter=5, verbose=False, random_state=0).fit(self.X)
+        model = set_hmm_estimator(build_model("GaussianHMM", n_iter=5, verbose=False, random_state=0),
+                                  get_hmm_estimator(fitted))
+        assert model.is_fitted
+        np.testing.assert_array_equal(model.predict(self.X), fitted.predict(self.X))
+
+    def test_other_models(self):
+        assert get_hmm_estimator(build_model("GreedyGaussianSegmentation")) is None
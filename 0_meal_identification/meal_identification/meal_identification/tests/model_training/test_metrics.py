@@ -0,0 +1,74 @@
+import numpy as np
+import pandas as pd
+import pytest
+from sktime.performance_metrics.annotation.metrics import hausdorff_error as sktime_hausdorff_error
+
+from meal_identification.modeling.metrics import (
+    label_events, change_points, nearest_distances, count_error, hausdorff_error, prediction_ratio,
+    precision_recall, detection_delays, annotation_metrics, METRIC_NAMES
+)
+
+
+class TestEvents:
+    def test_label_events(self):
+        labels = pd.DataFrame({"msg_type": [0, 1, 0, 0, 1]})
+        np.testing.assert_array_equal(label_events(labels), [1, 4])
+
+    def test_change_points(self):
+        np.testing.assert_array_equal(change_points([0, 0, 1, 1, 1, 0, 2]), [2, 5, 6])
+        assert len(change_points([3, 3, 3])) == 0
+        assert len(change_points([])) == 0
+
+
+class TestMetrics:
+    def test_nearest_distances(self):
+        np.testing.assert_array_equal(nearest_distances([0, 5, 9, 20], [2, 8, 10]), [2, 3, 1, 10])
+        assert np.isinf(nearest_distances([1, 2], [])).all()
+
+    @pytest.mark.parametrize("seed", range(5))
+    def test_hausdorff_matches_sktime(self, seed):
+        rng = np.random.default_rng(seed)
+        true_events = np.sort(rng.choice(10000, 40, replace=False))
+        pred_events = np.sort(rng.choice(10000, 70, replace=False))
+        assert hausdorff_error(true_events, pred_events) == sktime_hausdorff_error(true_events, pred_events)
+
+    def test_empty_events(self):
+        assert hausdorff_error([], []) == 0
+        assert np.isnan(hausdorff_error([1], []))
+        assert np.isnan(prediction_ratio([], [1]))
+        assert count_error([], [1, 2]) == 2
+
+    def test_precision_recall(self):
+        # 10 and 50 are detected within 3 rows, 100 is missed, 30 is a false detection
+        precision, recall = precision_recall([10, 50, 100], [12, 30, 49], tolerance=3)
+        assert precision == pytest.approx(2 / 3)
+        assert recall == pytest.approx(2 / 3)
+
+    def test_detection_delays(self):
+        # A detection before the meal does not count, 100 is detected too late
+        delays = detection_delays([10, 50, 100], [8, 12, 49, 52, 120], tolerance=5)
+        np.testing.assert_array_equal(delays, [2, 2, np.nan])
+        assert np.isnan(detection_delays([1], [])).all()
+
+    def test_annotation_metrics(self):
+        labels = np.zeros(100, dtype=int)
+        labels[[20, 60]] = 1
+        states = np.zeros(100, dtype=int)
+        states[22:40] = 1
+        metrics = annotation_metrics(labels, states, tolerance=5)
+        assert list(metrics) == METRIC_NAMES
+        assert metrics["count_error"] == 0
+        assert metrics["hausdorff_error"] == 20
+        assert metrics["precision"] == 0.5
+        assert metrics["recall"] == 0.5
+        assert metrics["detection_delay"] == 2
+
+    def test_long_series(self):
+        """Millions of rows are handled with sorted event arrays only."""
+        rng = np.random.default_rng(0)
+        n_rows = 2_000_000
+        labels = (rng.random(n_rows) < 0.002).astype(int)
+        states = np.repeat(rng.integers(0, 3, n_rows // 50), 50)
+        metrics = annotation_metrics(labels, states)
+        assert metrics["count_error"] == abs(len(label_events(labels)) - len(change_points(states)))
+        assert 0 <= metrics["recall"] <= 1
@@ -1,6 +1,11 @@
+import tempfile
 import unittest
+from pathlib import Path
+
+import pandas as pd
 
 from meal_identification.modeling.train import ScaledLogitTransformer, train_model_instance, load_data, xy_split, process_labels, load_model, save_model
+from meal_identification.datasets.dataset_obfuscation_stream import ObfuscatedLabelStream
 
 from meal_identification.config import (
     MODELS_DIR, 
@@ -64,4 +69,30 @@ class TestTrainingScript(unittest.TestCase):
         )
 
         # Check that the model file exists after training
-        assert self.model_path.exists()
\ No newline at end of file
+        assert self.model_path.exists()
+
+
+    def test_training_with_obfuscated_labels(self):
+        """Test training on the labels of an obfuscation stream epoch."""
+        patient_df = self.sample_data.set_index(pd.DatetimeIndex(pd.to_datetime(self.sample_data['date'], utc=True)))
+        stream = ObfuscatedLabelStream(patient_df, n_epochs=1, global_seed=0)
+        labels_df, _ = next(iter(stream))
+
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            model = train_model_instance(
+                model="GMMHMM",
+                data_path=self.data_path,
+                model_path=Path(tmp_dir) / "GMMHMM_model",
+                transformer=ScaledLogitTransformer(),
+                labels=labels_df['msg_type_log_shifted']
+            )
+        assert model is not None
+
+        # Labels must line up with the data
+        assert train_model_instance(
+            model="GMMHMM",
+            data_path=self.data_path,
+            model_path=self.model_path,
+            transformer=ScaledLogitTransformer(),
+            labels=labels_df['msg_type_log_shifted'][:-1]
+        ) is None
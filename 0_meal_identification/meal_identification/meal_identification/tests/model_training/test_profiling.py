@@ -0,0 +1,100 @@
+import os
+import tempfile
+import time
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from meal_identification.modeling import train
+from meal_identification.modeling.train import build_model, save_model, training_profile
+from meal_identification.modeling.profiling import (
+    profile_resources, convergence_info, save_profile, load_profile, load_profiles, cost_accuracy, PROFILE_FILE
+)
+
+
+class TestProfiling(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.models_dir = Path(self.tmp_dir.name)
+        rng = np.random.default_rng(0)
+        self.X = pd.DataFrame({"bgl": np.concatenate([rng.normal(0, 1, 300), rng.normal(5, 1, 300)])})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_profile_resources(self):
+        with profile_resources("fit") as profile:
+            sum(range(100000))
+        assert set(profile) == {"fit_wall_seconds", "fit_cpu_seconds", "fit_peak_rss_increase_mb"}
+        assert profile["fit_wall_seconds"] > 0
+
+    @unittest.skipUnless(os.path.exists("/proc/self/statm"), "needs /proc")
+    def test_profile_resources_memory(self):
+        """Each block is measured on its own, not with the peak of the blocks before it."""
+        with profile_resources("fit") as fit_profile:
+            data = np.ones(2 ** 24)  # 128 MB
+            time.sleep(0.05)
+            del data
+        with profile_resources("predict") as predict_profile:
+            sum(range(100000))
+        assert fit_profile["fit_peak_rss_increase_mb"] >= 100
+        assert predict_profile["predict_peak_rss_increase_mb"] < 10
+
+    def test_convergence_info(self):
+        model = build_model("GaussianHMM", n_iter=50, verbose=False, random_state=0).fit(self.X)
+        info = convergence_info(model)
+        assert 1 <= info["n_iter_run"] <= 50
+        assert isinstance(info["converged"], bool)
+        assert convergence_info(build_model("GreedyGaussianSegmentation")) == {"n_iter_run": None, "converged": None}
+
+    def test_save_model_with_profile(self):
+        """The profile is written next to the files of a saved model."""
+        model = build_model("GaussianHMM", n_iter=5, verbose=False, random_state=0).fit(self.X)
+        with profile_resources("fit") as fit_profile:
+            pass
+        profile = training_profile(model, self.X, self.X.iloc[:10], fit_profile, {}, {"test_recall": 0.5})
+        model_path = self.models_dir / "GaussianHMM_model"
+
+        with mock.patch.object(train.mlflow_sktime, "save_model", side_effect=lambda path, **kwargs: os.makedirs(path)):
+            save_model(model, model_path=model_path, profile=profile)
+
+        saved = load_profile(model_path)
+        assert saved["model"] == "GaussianHMM"
+        assert saved["n_train_rows"] == 600 and saved["n_val_rows"] == 10
+        assert saved["params"]["n_iter"] == 5
+        assert saved["n_iter_run"] == convergence_info(model)["n_iter_run"]
+        assert load_profile(self.models_dir / "missing") is None
+
+    def test_cost_accuracy(self):
+        """Models that are both slower and less accurate than another are off the Pareto front."""
+        for name, cpu, recall in [("a", 1.0, 0.5), ("b", 2.0, 0.4), ("c", 3.0, 0.9), ("d", 0.5, 0.1)]:
+            os.makedirs(self.models_dir / name)
+            save_profile({"model": name, "fit_cpu_seconds": cpu, "test_recall": recall,
+                          "test_hausdorff_error": recall * 10}, self.models_dir / name)
+        os.makedirs(self.models_dir / "no_profile")
+
+        profiles = load_profiles(self.models_dir)
+        assert sorted(profiles.index) == ["a", "b", "c", "d"]
+
+        table = cost_accuracy(profiles, metric="test_recall")
+        assert table["model"].tolist() == ["d", "a", "b", "c"]
+        assert table["pareto"].tolist() == [True, True, False, True]
+
+        # Errors are better when lower
+        table = cost_accuracy(profiles, metric="test_hausdorff_error")
+        assert table["pareto"].tolist() == [True, False, False, False]
+        assert (self.models_dir / "a" / PROFILE_FILE).exists()
+
+    def test_cost_accuracy_prediction_ratio(self):
+        """A prediction ratio is best at 1, not when the model predicts the fewest events."""
+        for name, cpu, ratio in [("few", 1.0, 0.2), ("exact", 1.0, 1.0), ("many", 3.0, 1.5)]:
+            os.makedirs(self.models_dir / name)
+            save_profile({"model": name, "fit_cpu_seconds": cpu, "test_prediction_ratio": ratio},
+                         self.models_dir / name)
+
+        table = cost_accuracy(load_profiles(self.models_dir), metric="test_prediction_ratio")
+        assert table["model"].tolist() == ["exact", "few", "many"]
+        assert table["pareto"].tolist() == [True, False, False]
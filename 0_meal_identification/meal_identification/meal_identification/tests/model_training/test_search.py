@@ -0,0 +1,52 @@
+import unittest
+
+import numpy as np
+
+from meal_identification.modeling.search import successive_halving, hyperband, metric_loss, HISTORY_COLUMNS
+from meal_identification.modeling.sweep import prepare_datasets
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+class TestHyperparameterSearch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.datasets = prepare_datasets([INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"])
+
+    def test_metric_loss(self):
+        """Errors are minimised, prediction ratios are best at 1, failed fits lose, undefined metrics are skipped."""
+        assert metric_loss(3, "test_count_error") == 3
+        assert metric_loss(0.5, "test_prediction_ratio") == 0.5
+        assert metric_loss(1.5, "train_prediction_ratio") == 0.5
+        assert metric_loss(None, "test_hausdorff_error") == np.inf
+        assert np.isnan(metric_loss(np.nan, "test_hausdorff_error"))
+
+    def test_successive_halving_n_iter(self):
+        """Test that only the best third of the candidates is fitted with the full number of iterations."""
+        candidates = [{"n_components": n, "verbose": False} for n in [2, 3, 4]]
+        best, history = successive_halving(self.datasets, "GaussianHMM", candidates, resource="n_iter",
+                                           max_resource=9, n_jobs=3)
+        assert list(history.columns) == HISTORY_COLUMNS
+        assert history.groupby("rung")["resource"].first().tolist() == [3, 9]
+        assert history.groupby("rung").size().tolist() == [3, 1]
+        assert best in candidates
+        assert history.loc[history["rung"] == 1, "candidate"].iloc[0] == candidates.index(best)
+
+    def test_successive_halving_n_samples(self):
+        """Test that the first round fits on a prefix of the training data."""
+        candidates = [{"n_components": 2, "n_iter": 5, "verbose": False}, {"unknown": 1}]
+        best, history = successive_halving(self.datasets, "GaussianHMM", candidates, eta=2, n_jobs=2)
+        assert history["resource"].tolist() == [0.5, 0.5, 1.0]
+        # The failing candidate is dropped
+        assert best == candidates[0]
+        assert history.loc[1, "status"] == "error"
+        assert history.loc[1, "loss"] == np.inf
+
+    def test_hyperband(self):
+        """Test that each bracket starts with fewer candidates on more resource."""
+        best, history = hyperband(self.datasets, "GaussianHMM", {"n_components": [2, 3, 4], "verbose": [False]},
+                                  resource="n_iter", min_resource=3, max_resource=9, n_jobs=3, random_state=0)
+        first_rungs = history[history["rung"] == 0].groupby("bracket")
+        assert first_rungs["resource"].first().tolist() == [3, 9]
+        assert first_rungs.size().tolist() == [3, 2]
+        assert best["n_components"] in [2, 3, 4]
@@ -0,0 +1,61 @@
+import unittest
+from unittest import mock
+
+import pandas as pd
+
+from meal_identification.modeling.sweep import expand_grid, prepare_datasets, run_jobs, run_sweep, RESULT_COLUMNS
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+class TestTrainingSweep(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.data_path = INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"
+
+    def test_expand_grid(self):
+        """Every model gets one combination per point of its hyperparameter grid."""
+        combinations = expand_grid({
+            "GaussianHMM": {"n_iter": [5, 10], "n_components": [2, 3]},
+            "PoissonHMM": {},
+        })
+        assert len(combinations) == 5
+        assert ("GaussianHMM", {"n_iter": 10, "n_components": 3}) in combinations
+        assert ("PoissonHMM", {}) in combinations
+
+    def test_run_sweep(self):
+        """Test that each fit of the grid gets a row of metrics, and failed fits are reported."""
+        results = run_sweep(
+            [self.data_path],
+            {"GaussianHMM": {"n_iter": [2, 5], "verbose": [False]}, "UnknownModel": {}},
+            n_jobs=2,
+        )
+        assert list(results.columns) == RESULT_COLUMNS
+        assert len(results) == 3
+
+        fitted = results[results["model"] == "GaussianHMM"]
+        assert (fitted["status"] == "ok").all()
+        assert fitted["test_count_error"].notna().all()
+        assert fitted["fit_seconds"].gt(0).all()
+
+        unknown = results[results["model"] == "UnknownModel"].iloc[0]
+        assert unknown["status"] == "error"
+        assert "UnknownModel" in unknown["error"]
+
+    def test_run_sweep_timeout(self):
+        """Test that a fit running longer than the timeout is terminated."""
+        results = run_sweep(
+            [self.data_path],
+            {"GreedyGaussianSegmentation": {"max_shuffles": [1000], "verbose": [False]}},
+            timeout=0.5,
+        )
+        assert results.loc[0, "status"] == "timeout"
+        assert pd.isna(results.loc[0, "test_count_error"])
+
+    def test_run_jobs_spawn(self):
+        """Test that fits run in spawned processes where the platform can't fork."""
+        data = prepare_datasets([self.data_path])[str(self.data_path)]
+        with mock.patch("multiprocessing.get_all_start_methods", return_value=["spawn"]):
+            results = run_jobs([("GaussianHMM", {"n_iter": 2, "verbose": False}, data)])
+        assert results[0]["status"] == "ok", results[0].get("error")
+        assert results[0]["test_count_error"] >= 0
@@ -0,0 +1,89 @@
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+import numpy as np
+import pandas as pd
+
+from meal_identification.modeling import train
+from meal_identification.modeling.train import (
+    build_model, fit_hmm, save_checkpoint, load_checkpoint, load_warm_start, train_model_instance,
+    ScaledLogitTransformer
+)
+from meal_identification.modeling.profiling import convergence_info
+from meal_identification.modeling.hmm_estimator import get_hmm_estimator
+
+from meal_identification.config import INTERIM_DATA_DIR
+
+
+def _gaussian_hmm(**kwargs):
+    params = dict(n_components=3, covariance_type="diag", init_params="stmc", n_iter=200, verbose=False,
+                  random_state=0)
+    params.update(kwargs)
+    return build_model("GaussianHMM", **params)
+
+
+class TestWarmStart(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.checkpoint_path = Path(self.tmp_dir.name) / "checkpoint.joblib"
+        rng = np.random.default_rng(0)
+        states = np.repeat(rng.integers(0, 3, 200), 20)
+        self.X = pd.DataFrame({"bgl": rng.normal(states * 3.0, 1.0)})
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_warm_start_converges_faster(self):
+        """Retraining on a bit more data from the previous model takes fewer iterations."""
+        previous = fit_hmm(_gaussian_hmm(), [self.X.iloc[:3600]])
+        previous_means = get_hmm_estimator(previous).means_.copy()
+
+        cold = fit_hmm(_gaussian_hmm(), [self.X])
+        warm = fit_hmm(_gaussian_hmm(), [self.X], warm_start=previous)
+
+        assert convergence_info(warm)["converged"]
+        assert convergence_info(warm)["n_iter_run"] < convergence_info(cold)["n_iter_run"]
+        # The model warm started from is left unchanged
+        np.testing.assert_array_equal(get_hmm_estimator(previous).means_, previous_means)
+        assert len(warm.predict(self.X)) == len(self.X)
+
+    def test_warm_start_mismatch(self):
+        previous = fit_hmm(_gaussian_hmm(n_iter=5), [self.X])
+        with self.assertRaises(ValueError):
+            fit_hmm(_gaussian_hmm(n_components=2), [self.X], warm_start=previous)
+        with self.assertRaises(ValueError):
+            fit_hmm(_gaussian_hmm(), [self.X], warm_start=_gaussian_hmm())
+
+    def test_checkpoints(self):
+        """The model is checkpointed after every chunk of iterations and at the end."""
+        model = _gaussian_hmm(n_iter=6, tol=-np.inf)
+        with mock.patch.object(train, "save_checkpoint", wraps=save_checkpoint) as checkpoint:
+            fit_hmm(model, [self.X], checkpoint_path=self.checkpoint_path, checkpoint_every=2)
+        assert checkpoint.call_count == 4
+        assert convergence_info(model)["n_iter_run"] == 6
+        assert get_hmm_estimator(model).n_iter == 6
+
+        restored = load_checkpoint(self.checkpoint_path)
+        np.testing.assert_array_equal(get_hmm_estimator(restored).means_, get_hmm_estimator(model).means_)
+        np.testing.assert_array_equal(restored.predict(self.X), model.predict(self.X))
+        assert isinstance(load_warm_start(self.checkpoint_path), type(model))
+
+    def test_train_model_instance_warm_start(self):
+        """train_model_instance resumes from a checkpoint and checkpoints the new fit."""
+        data_path = INTERIM_DATA_DIR / "2024-11-29/i5mins_d4hrs_c5g_l2hrs_n3/500030.csv"
+        model_path = Path(self.tmp_dir.name) / "GaussianHMM_model"
+        first = train_model_instance(model="GaussianHMM", data_path=data_path, model_path=model_path,
+                                     transformer=ScaledLogitTransformer(), n_iter=10, verbose=False,
+                                     checkpoint_path=self.checkpoint_path, checkpoint_every=5)
+        assert first is not None and self.checkpoint_path.exists()
+
+        second = train_model_instance(model="GaussianHMM", data_path=data_path, model_path=model_path,
+                                      transformer=ScaledLogitTransformer(), n_iter=10, verbose=False,
+                                      warm_start_path=self.checkpoint_path)
+        assert second is not None
+
+        assert train_model_instance(model="GreedyGaussianSegmentation", data_path=data_path, model_path=model_path,
+                                    transformer=ScaledLogitTransformer(),
+                                    warm_start_path=self.checkpoint_path) is None
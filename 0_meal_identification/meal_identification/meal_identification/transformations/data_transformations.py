@@ -4,27 +4,62 @@ from sktime.transformations.compose import TransformerPipeline
 from sklearn.preprocessing import StandardScaler
 import pandas as pd
 
-def run_pipeline(pipeline, data):
+from meal_identification.transformations.pipeline_cache import CachedTransformerPipeline
+
+def run_pipeline(pipeline, data, cache_dir=None, panel=False):
     '''
     run a transformer pipeline given certain data
+    cache_dir: optional directory where each step's fitted state and output are cached,
+               so rerunning with only the last transformers changed reuses the upstream results
+    panel: if True, stack the data into one sktime Panel (see stack_panel) and fit_transform it once,
+           so transformers that handle Panels natively run once over the whole cohort instead of
+           once per DataFrame. Series transformers are still fitted per instance by sktime.
     questions:  does the training script provide the pipeline, or should we build this in transformation
                 do we want to work with only Series->Series or also Panel->Panel
-    todo:   add flag to cache transformed data
-            add flag to run as list of Series or as Panel
-            log transformations applied
+    todo:   log transformations applied
             testing
     '''
+    if cache_dir is not None:
+        pipeline = CachedTransformerPipeline(steps=pipeline.steps, cache_dir=cache_dir)
+
+    if panel:
+        transformed = pipeline.fit_transform(stack_panel(data))
+        return unstack_panel(transformed, data)
+
     transformed_data = []
     for df in data:
         transformed = pipeline.fit_transform(df)
         transformed_data.append(transformed)
     return transformed_data
 
-def create_pipeline(transformers):
+def stack_panel(data):
+    '''
+    stacks a list of DataFrames (or Series) into a pd-multiindex Panel, the first index level being
+    the position of each one in the list
+    '''
+    frames = [df.to_frame() if isinstance(df, pd.Series) else df for df in data]
+    return pd.concat(frames, keys=range(len(frames)), names=['instance', frames[0].index.name])
+
+def unstack_panel(panel, data):
+    '''
+    splits a Panel made by stack_panel back into a list, with Series given back as Series
+    '''
+    unstacked = []
+    for i, df in enumerate(data):
+        instance = panel.xs(i, level=0)
+        if isinstance(df, pd.Series):
+            instance = instance.iloc[:, 0].rename(df.name)
+        unstacked.append(instance)
+    return unstacked
+
+def create_pipeline(transformers, cache_dir=None):
     '''
     creates a pipeline from a list of transformers (apply all in series)?
+    cache_dir: optional directory memoizing the steps, see CachedTransformerPipeline
     questions:  how should FeatureUnions be handled?
     '''
+    if cache_dir is not None:
+        return CachedTransformerPipeline(steps=transformers, cache_dir=cache_dir)
     pipeline = TransformerPipeline(steps=transformers)
     return pipeline
 
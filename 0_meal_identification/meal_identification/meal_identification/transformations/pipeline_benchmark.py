@@ -0,0 +1,103 @@
+import time
+
+import numpy as np
+import pandas as pd
+import typer
+from loguru import logger
+from sktime.transformations.compose import TransformerPipeline
+from sktime.transformations.series.cos import CosineTransformer
+from sktime.transformations.series.impute import Imputer
+
+from meal_identification.transformations.data_transformations import run_pipeline
+
+app = typer.Typer()
+
+
+def synthetic_cohort(n_patients=50, n_days=14, missing_rate=0.05, seed=0):
+    '''
+    Random 5 minute bgl/food_g series shaped like the interim data, for benchmarking
+
+    Parameters
+    ----------
+    n_patients : int
+        Number of DataFrames
+    n_days : int
+        Days of data per patient
+    missing_rate : float
+        Fraction of bgl values set to NaN
+    seed : int
+        Seed of the generator
+
+    Returns
+    -------
+    list of pd.DataFrame
+    '''
+    rng = np.random.default_rng(seed)
+    n_rows = n_days * 288
+    dates = pd.date_range(start='2024-07-01', periods=n_rows, freq='5min', name='date')
+    cohort = []
+    for _ in range(n_patients):
+        bgl = rng.normal(140, 30, n_rows)
+        bgl[rng.random(n_rows) < missing_rate] = np.nan
+        cohort.append(pd.DataFrame({'bgl': bgl, 'food_g': rng.exponential(5, n_rows)}, index=dates))
+    return cohort
+
+
+def benchmark_run_pipeline(pipeline, data, n_repeats=3):
+    '''
+    Time run_pipeline on a list of DataFrames against the same data stacked as a Panel
+
+    Parameters
+    ----------
+    pipeline : sktime TransformerPipeline
+        Pipeline to run, cloned for every repeat
+    data : list of pd.DataFrame
+        Cohort to transform
+    n_repeats : int
+        Best of n_repeats runs is kept for each mode
+
+    Returns
+    -------
+    dict
+        Seconds of the list and Panel modes, throughput in rows/sec and Panel speedup
+    '''
+    seconds = {}
+    for mode, panel in [('list', False), ('panel', True)]:
+        times = []
+        for _ in range(n_repeats):
+            tic = time.perf_counter()
+            run_pipeline(pipeline.clone(), data, panel=panel)
+            times.append(time.perf_counter() - tic)
+        seconds[mode] = min(times)
+
+    n_rows = sum(len(df) for df in data)
+    return {
+        'steps': [type(step).__name__ for step in pipeline.steps],
+        'n_series': len(data),
+        'n_rows': n_rows,
+        'list_s': seconds['list'],
+        'panel_s': seconds['panel'],
+        'list_rows_per_sec': n_rows / seconds['list'],
+        'panel_rows_per_sec': n_rows / seconds['panel'],
+        'panel_speedup': seconds['list'] / seconds['panel'],
+    }
+
+
+@app.command()
+def main(
+    n_patients: int = 50,
+    n_days: int = 14,
+    n_repeats: int = 3,
+):
+    logger.info(f"Benchmarking run_pipeline on {n_patients} patients x {n_days} days...")
+    data = synthetic_cohort(n_patients=n_patients, n_days=n_days)
+    pipeline = TransformerPipeline(steps=[CosineTransformer(), Imputer(method="mean")])
+
+    record = benchmark_run_pipeline(pipeline, data, n_repeats=n_repeats)
+    logger.info(f"list:  {record['list_s']:.2f}s ({record['list_rows_per_sec']:.0f} rows/sec)")
+    logger.info(f"panel: {record['panel_s']:.2f}s ({record['panel_rows_per_sec']:.0f} rows/sec)")
+    logger.success(f"Panel mode speedup: {record['panel_speedup']:.2f}x")
+
+
+if __name__ == '__main__':
+    app()
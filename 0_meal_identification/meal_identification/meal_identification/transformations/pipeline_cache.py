@@ -0,0 +1,158 @@
+from sktime.transformations.base import BaseTransformer
+from sktime.transformations.compose import TransformerPipeline
+
+import hashlib
+import os
+import pickle
+import tempfile
+
+import joblib
+import numpy as np
+import pandas as pd
+
+
+def hash_data(X, y=None):
+    '''
+    Hash of the data going into a transformer, used to recognise inputs that were seen before
+
+    Parameters
+    ----------
+    X : pd.DataFrame, pd.Series or np.ndarray
+        Data to transform
+    y : optional, same types as X
+        Additional data passed to the transformer
+
+    Returns
+    -------
+    str
+        sha256 hex digest of the values, index, columns and dtypes
+    '''
+    sha = hashlib.sha256()
+    for data in (X, y):
+        if data is None:
+            sha.update(b'None')
+        elif isinstance(data, (pd.DataFrame, pd.Series)):
+            sha.update(pd.util.hash_pandas_object(data, index=True).to_numpy().tobytes())
+            columns = data.columns if isinstance(data, pd.DataFrame) else [data.name]
+            dtypes = data.dtypes if isinstance(data, pd.DataFrame) else [data.dtype]
+            sha.update(repr((list(columns), [str(dtype) for dtype in dtypes], data.index.names)).encode())
+        elif isinstance(data, np.ndarray):
+            sha.update(repr((data.shape, str(data.dtype))).encode())
+            sha.update(np.ascontiguousarray(data).tobytes())
+        else:
+            sha.update(pickle.dumps(data))
+    return sha.hexdigest()
+
+
+def step_cache_key(input_key, transformer):
+    '''
+    Cache key of a pipeline step: the key of its input combined with its class and parameters.
+    Keys are chained, so a step's key also depends on every step before it.
+
+    Parameters are hashed by value with joblib.hash rather than by repr, which shortens large
+    arrays with "..." and includes the memory address of objects without a repr of their own.
+
+    Parameters
+    ----------
+    input_key : str
+        hash_data of the pipeline's input for the first step, key of the previous step otherwise
+    transformer : sktime transformer
+        The (unfitted or fitted) step
+
+    Returns
+    -------
+    str
+    '''
+    params = joblib.hash(transformer.get_params(deep=False))
+    identity = f"{type(transformer).__module__}.{type(transformer).__qualname__}:{params}"
+    return hashlib.sha256(f"{input_key}:{identity}".encode()).hexdigest()
+
+
+class CachedTransformerPipeline(TransformerPipeline):
+    '''
+    TransformerPipeline that memoizes every step on disk.
+
+    Each step's fitted state and output are saved in cache_dir under a key made of the step's
+    parameters and the hash of the data it was fitted on (see step_cache_key). Fitting the same
+    data again loads the steps from the cache instead of refitting them, and changing a step only
+    recomputes that step and the ones after it.
+
+    Transforming the data the pipeline was fitted on returns the cached output of the last step.
+    Any other data is transformed by the fitted steps as usual.
+
+    Parameters
+    ----------
+    steps : list of sktime transformers, or list of (str, transformer) tuples
+        Steps of the pipeline, as for TransformerPipeline
+    cache_dir : optional, str
+        Directory of the cache, created if missing. None disables caching.
+    '''
+
+    def __init__(self, steps, cache_dir=None):
+        self.cache_dir = cache_dir
+        super().__init__(steps=steps)
+
+    def _fit(self, X, y=None):
+        if self.cache_dir is None:
+            return super()._fit(X, y)
+
+        self.steps_ = self._check_estimators(self.steps, cls_type=BaseTransformer)
+        self.fit_data_key_ = hash_data(X, y)
+        self.cache_hits_ = []
+
+        key = self.fit_data_key_
+        Xt = X
+        fitted_steps = []
+        for name, transformer in self.steps_:
+            key = step_cache_key(key, transformer)
+            entry = self._load_step(key)
+            if entry is None:
+                Xt = transformer.fit_transform(X=Xt, y=y)
+                self._save_step(key, transformer, Xt)
+            else:
+                transformer, Xt = entry['transformer'], entry['output']
+                self.cache_hits_.append(name)
+            fitted_steps.append((name, transformer))
+        self.steps_ = fitted_steps
+
+        return self
+
+    def _transform(self, X, y=None):
+        if self.cache_dir is None or hash_data(X, y) != self.fit_data_key_:
+            return super()._transform(X, y)
+
+        key = self.fit_data_key_
+        for _, transformer in self.steps_:
+            key = step_cache_key(key, transformer)
+        entry = self._load_step(key)
+        if entry is None:
+            # cache cleared since fitting
+            return super()._transform(X, y)
+        return entry['output']
+
+    def _step_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.joblib")
+
+    def _load_step(self, key):
+        '''
+        Fitted step and output saved under key, None if not cached
+        '''
+        path = self._step_path(key)
+        if not os.path.exists(path):
+            return None
+        return joblib.load(path)
+
+    def _save_step(self, key, transformer, output):
+        '''
+        Save a fitted step and its output, written to a temporary file first so concurrent
+        pipelines never read a partial entry
+        '''
+        os.makedirs(self.cache_dir, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        os.close(fd)
+        try:
+            joblib.dump({'transformer': transformer, 'output': output}, tmp_path)
+            os.replace(tmp_path, self._step_path(key))
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
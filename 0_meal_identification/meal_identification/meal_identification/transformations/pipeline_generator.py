@@ -1,9 +1,23 @@
 from sktime.transformations.compose import TransformerPipeline
+from sktime.exceptions import NotFittedError
 
+from joblib import Parallel, delayed
 from loguru import logger
 
-import random
-import re
+from meal_identification.datasets.dataset_label_sidecar import file_sha256
+from meal_identification.transformations.pipeline_cache import CachedTransformerPipeline
+from meal_identification.transformations.pydantic_test_models import TRANSFORMED_SCHEMA
+from meal_identification.transformations.run_registry import REGISTRY_FILE, RunRegistry
+from meal_identification.transformations.streaming import iter_chunks, stream_transform_to_csv
+from meal_identification.transformations.run_artifacts import (
+    MANIFEST_FILE,
+    RunArtifacts,
+    data_file_name,
+    write_data,
+)
+
+from datetime import datetime
+import numpy as np
 import os
 import json
 import pandas as pd
@@ -13,7 +27,9 @@ class PipelineGenerator():
     """
     Class to generate sktime transformer pipeline:
         Data is saved in 0_meal_identification/meal_identification/data/processed in the format:
+            runs.sqlite - registry numbering and indexing the runs (see RunRegistry)
             run_# - number of run
+            run_#/manifest.json - description of the run (see RunArtifacts)
             run_#/data - the output data from that run
             run_#/pipelines - pipelines saved from the run
 
@@ -30,12 +46,70 @@ class PipelineGenerator():
 
     def __init__(self, 
                  output_dir = "0_meal_identification/meal_identification/data/processed",
-                 input_dir = "0_meal_identification/meal_identification/data/interim"):
+                 input_dir = "0_meal_identification/meal_identification/data/interim",
+                 n_jobs = None,
+                 backend = "threading",
+                 low_memory = False,
+                 cache_dir = None,
+                 shared_fit = False,
+                 fit_sample = None,
+                 random_state = None,
+                 schema = None,
+                 validate = True):
+        '''
+        Parameters
+        ----------
+        output_dir : optional, str
+            Directory, relative to the project root, where runs are saved
+        input_dir : optional, str
+            Directory, relative to the project root, from which data is loaded
+        n_jobs : optional, int
+            Number of datasets fitted/transformed in parallel, -1 uses all CPUs.
+            None or 1 runs them one by one.
+        backend : optional, str
+            joblib backend used when n_jobs is not 1: "threading" shares the data with the workers,
+            "loky" (process pool) copies each dataset and pipeline to its worker and back
+        low_memory : optional, bool
+            Release each dataset's input as soon as it has been transformed, and only dispatch a few
+            datasets ahead of the workers, instead of holding every input and output at once.
+            If a transformation fails, the datasets that were in flight are lost.
+        cache_dir : optional, str
+            Directory where each pipeline step's fitted state and output are cached, so refitting
+            the same data only recomputes the steps that changed (see CachedTransformerPipeline).
+            None disables caching.
+        shared_fit : optional, bool
+            Fit a single pipeline on the pooled (concatenated) data of all datasets and apply it to each
+            dataset, instead of fitting one clone per dataset. All datasets then share the same fitted
+            state (e.g. the same scaling) and runs save a single pipeline.
+        fit_sample : optional, int
+            With shared_fit, only pool this many randomly chosen datasets to fit the pipeline
+        random_state : optional, int
+            Seed used to choose the fit_sample datasets
+        schema : optional, DataFrameSchema
+            Schema (dtypes, value ranges, NaN counts) every dataset's numerical data is checked against
+            after it is transformed. A ValueError is raised on the first dataset that does not match.
+            Defaults to TRANSFORMED_SCHEMA (the numeric columns are still numeric)
+        validate : optional, bool
+            Set to False to skip the schema check after transforming
+        '''
         
         self.data_cat = {} 
         self.data_num = {} 
         self.pipe = {} 
         self.column_order = None #order of columns for data for consistency
+        self.input_hashes = {} #sha256 of the loaded files, recorded with saved runs
+        self.numeric_columns = {} #columns of each dataset going through the pipeline
+
+        self.n_jobs = n_jobs
+        self.backend = backend
+        self.low_memory = low_memory
+        self.cache_dir = cache_dir
+        self.shared_fit = shared_fit
+        self.fit_sample = fit_sample
+        self.random_state = random_state
+        self.schema = TRANSFORMED_SCHEMA if schema is None else schema
+        self.validate = validate
+        self.validation_reports = {} #column reports of the schema checks, by dataset
 
         #set up paths for data directories
         self.processed_dir_path = os.path.join(self.__get_root_dir(), output_dir)
@@ -61,11 +135,13 @@ class PipelineGenerator():
         for file in raw_files:
             file_path = os.path.join(self.interim_dir_path, file)
             data[file] = pd.read_csv(file_path, parse_dates=['date'])
+            self.input_hashes[file] = file_sha256(file_path)
         
         #separate data into numerical/categorical for sktime transformers 
         for key in data:
             self.column_order = list(data[key].columns)
             self.data_num[key] = data[key]._get_numeric_data()
+            self.numeric_columns[key] = list(self.data_num[key].columns)
             self.data_cat[key] = data[key][list(set(data[key].columns) - set(self.data_num[key].columns))]
 
     def generate_pipeline(self, transformers = None, run = None):
@@ -87,16 +163,43 @@ class PipelineGenerator():
 
         # load pipeline from past runs
         if run:
-            pipeline_path = os.path.join(self.processed_dir_path, f"run_{run}", "pipelines")
-            # does load_from_path actually work?
-            for file in os.scandir(pipeline_path): # this is junky, refractor
-                pipe = TransformerPipeline.load_from_path(os.path.join(pipeline_path, file))
-                break
+            # only read the registry, processed directories saved before it have none
+            run_dir = os.path.join(self.processed_dir_path, f"run_{run}")
+            artifacts = None
+            if os.path.exists(os.path.join(self.processed_dir_path, REGISTRY_FILE)):
+                record = RunRegistry(self.processed_dir_path, readonly=True).get(run)
+                run_dir, artifacts = record["run_dir"], record["artifacts"]
+
+            if artifacts:
+                first_pipeline = next(iter(artifacts.values()))["pipeline"]
+                pipe = TransformerPipeline.load_from_path(os.path.join(run_dir, first_pipeline))
+            elif os.path.exists(os.path.join(run_dir, MANIFEST_FILE)):
+                pipe = RunArtifacts(run_dir).pipeline()
+            else:
+                # runs saved before manifests were written
+                pipeline_path = os.path.join(run_dir, "pipelines")
+                zips = []
+                if os.path.isdir(pipeline_path):
+                    zips = sorted(file for file in os.listdir(pipeline_path) if file.endswith(".zip"))
+                if not zips:
+                    raise ValueError(f"run {run} has no saved pipeline")
+                pipe = TransformerPipeline.load_from_path(os.path.join(pipeline_path, zips[0]))
 
         # load pipeline from parameters
         else: 
             pipe = TransformerPipeline(steps = transformers)
 
+        # memoize the steps of the pipeline
+        if self.cache_dir is not None:
+            pipe = CachedTransformerPipeline(steps = pipe.steps, cache_dir = self.cache_dir)
+
+        # one pipeline shared by all datasets
+        if self.shared_fit:
+            shared_pipe = pipe.clone()
+            for key in self.data_num:
+                self.pipe[key] = shared_pipe
+            return
+
         # clone pipeline to fit to different datasets
         for key in self.data_num:
             self.pipe[key] = pipe.clone() 
@@ -111,13 +214,16 @@ class PipelineGenerator():
         Returns
         -------
         '''
-        for key in self.pipe:
-            
-            #fit if pipeline was not fitted before
-            try: 
-                self.pipe[key].check_is_fitted()
-            except:
-                self.pipe[key].fit(self.data_num[key])
+        if self.shared_fit:
+            _fit_pipeline(next(iter(self.pipe.values())), self.pooled_data())
+            return
+
+        keys = list(self.pipe)
+        fitted = self.__parallel()(
+            delayed(_fit_pipeline)(self.pipe[key], self.data_num[key]) for key in keys
+        )
+        for key, pipe in zip(keys, fitted):
+            self.pipe[key] = pipe
 
     def transform(self):
         '''
@@ -129,35 +235,144 @@ class PipelineGenerator():
         Returns
         -------
         '''
-
-        for key in self.pipe:
-            self.data_num[key] = self.pipe[key].transform(self.data_num[key])
+        keys = list(self.pipe)
+        transformed = self.__parallel()(
+            delayed(_transform_data)(self.pipe[key], self.__input(key)) for key in keys
+        )
+        for key, data in zip(keys, transformed):
+            self.data_num[key] = data
+            self.__validate(key)
 
     def fit_transform(self):
         '''
-        Applies fit and transform in sequence
+        Applies fit and transform in sequence, each dataset going through its pipeline in a single task
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+        '''
+        if self.shared_fit:
+            self.fit()
+            self.transform()
+            return
+
+        keys = list(self.pipe)
+        results = self.__parallel()(
+            delayed(_fit_transform_data)(self.pipe[key], self.__input(key)) for key in keys
+        )
+        for key, (pipe, data) in zip(keys, results):
+            self.pipe[key] = pipe
+            self.data_num[key] = data
+            self.__validate(key)
+
+    def pooled_data(self):
+        '''
+        Numerical data of all datasets (or of fit_sample random ones) concatenated into one
+        DataFrame, the data a shared pipeline is fitted on
+
+        Parameters
+        ----------
+
+        Returns
+        -------
+        pd.DataFrame
+        '''
+        keys = list(self.data_num)
+        if self.fit_sample is not None and self.fit_sample < len(keys):
+            rng = np.random.default_rng(self.random_state)
+            keys = [keys[i] for i in sorted(rng.choice(len(keys), self.fit_sample, replace=False))]
+        return pd.concat([self.data_num[key] for key in keys], ignore_index=True)
+
+    def stream_transform(self, key, output_path, input_path=None, chunksize=10000, history=288):
+        '''
+        Transforms a long series with the fitted pipeline of a dataset chunk by chunk, writing each
+        transformed chunk to a csv file as it goes, so memory stays bounded whatever the series length
+
+        The last `history` rows of each chunk are carried over to the next one, so transformers
+        needing past values (imputers, window features) see the same history as with transform,
+        as long as they look back at most `history` rows.
 
         Parameters
         ----------
+        key : str
+            Dataset whose fitted pipeline is used
+        output_path : str
+            csv file the transformed series is written to
+        input_path : optional, str
+            csv file of the series, defaults to the dataset's file in the input directory
+        chunksize : optional, int
+            Rows read and transformed at a time
+        history : optional, int
+            Rows carried over between chunks, default to 288 (one day of 5 minute data)
 
         Returns
         -------
+        int
+            Number of rows written
         '''
+        if input_path is None:
+            input_path = os.path.join(self.interim_dir_path, key)
+
+        self.pipe[key].check_is_fitted()
+        return stream_transform_to_csv(
+            self.pipe[key],
+            iter_chunks(input_path, chunksize, parse_dates=['date']),
+            output_path,
+            history = history,
+            columns = self.numeric_columns[key],
+            column_order = self.column_order,
+        )
+
+    def __validate(self, key):
+        '''
+        Checks the transformed numerical data of a dataset against the schema, unless validate is False
+        '''
+        if self.validate:
+            self.validation_reports[key] = self.schema.validate_df(self.data_num[key], name = key)
 
-        self.fit()
-        self.transform()
+    def __parallel(self):
+        '''
+        joblib executor for the fit/transform tasks of the datasets.
+        Results come back in the order tasks were submitted.
+        In low memory mode they are yielded as soon as they are ready rather than collected in a list.
+        '''
+        if self.low_memory:
+            return Parallel(n_jobs=self.n_jobs, backend=self.backend,
+                            return_as="generator", pre_dispatch="n_jobs")
+        return Parallel(n_jobs=self.n_jobs, backend=self.backend)
+
+    def __input(self, key):
+        '''
+        Numerical data of a dataset to hand to a task. In low memory mode the generator drops its own
+        reference so the input can be freed once its task is done.
+        '''
+        if self.low_memory:
+            data = self.data_num[key]
+            self.data_num[key] = None
+            return data
+        return self.data_num[key]
 
     def save_output(
             self,
-            output_dir=None
+            output_dir=None,
+            data_format="parquet"
     ):
         '''
-        Applies fit and transform in sequence
+        Saves the transformed data and fitted pipelines as a new run, numbered and indexed by the
+        RunRegistry of output_dir, and described by a manifest:
+            run_#/manifest.json - run number, data format, column order, pipeline configuration
+                                  and the data/pipeline files of every dataset
+            run_#/data - the output data, one file per dataset
+            run_#/pipelines - one fitted pipeline per dataset
 
         Parameters
         ----------
         output_dir: str
             The directory in which pipelines and transformed data should be stored
+        data_format: str
+            "parquet" (default), "feather" (Arrow IPC) or "csv"
         Returns
         -------
         processed_data: dictionary of pandas DataFrames
@@ -166,20 +381,9 @@ class PipelineGenerator():
         if(output_dir is None):
             output_dir = self.processed_dir_path 
 
-        # figure out which run is the last one
-        runs = []
-        for i in os.listdir(output_dir):
-            run_num = re.search("[0-9]+", i)
-            if run_num:
-                runs.append(int(run_num.group()))
-
-        if not runs:
-            runs = [0]
-        new_run = max(runs)+1
-        
-        # make the run directory
-        output_dir = os.path.join(output_dir, f"run_{new_run}")
-        os.mkdir(output_dir)
+        # reserve the next run number and make the run directory
+        registry = RunRegistry(output_dir)
+        new_run, output_dir = registry.allocate_run()
 
         # make the data directory 
         dir_path_data = os.path.join(output_dir, "data")
@@ -191,27 +395,77 @@ class PipelineGenerator():
 
 
         processed_data = {}
+        datasets = {}
+        output_hashes = {}
         # save processed datasets into the data directory and pipelines into pipeline directory
         for key in self.data_num:
             whole_data = pd.concat([self.data_num[key], self.data_cat[key]], axis=1)
             whole_data = whole_data[self.column_order]
-            whole_data.to_csv(os.path.join(dir_path_data, key), index=True)
+            data_file = data_file_name(key, data_format)
+            write_data(whole_data, os.path.join(dir_path_data, data_file), data_format)
+            output_hashes[key] = file_sha256(os.path.join(dir_path_data, data_file))
 
             processed_data[key] = whole_data
 
-            pipeline_path = os.path.join(dir_path_pipelines, "Pipeline_" + key)
-            pipeline_path = pipeline_path.rpartition('.')[0]
-            self.pipe[key].save(path = pipeline_path)
+            # a shared pipeline is saved once
+            pipeline_name = "Pipeline_shared" if self.shared_fit else "Pipeline_" + key.rpartition('.')[0]
+            if not os.path.exists(os.path.join(dir_path_pipelines, pipeline_name + ".zip")):
+                self.pipe[key].save(path = os.path.join(dir_path_pipelines, pipeline_name))
+
+            datasets[key] = {
+                "data": os.path.join("data", data_file),
+                "pipeline": os.path.join("pipelines", pipeline_name + ".zip"),
+                "n_rows": len(whole_data),
+            }
         
         logger.info(self.pipe[key].get_params())
         
-        # save pipeline configuration into json
-        with open(os.path.join(dir_path_pipelines, "Pipeline_config.json"), "w") as json_file:
-            transformer_config = random.choice(list(self.pipe.values())).get_params()
-            json.dump({key: str(value) for key, value in transformer_config.items()}, json_file, indent=4) 
+        # save the run description, with the pipeline configuration, into the manifest
+        transformer_config = next(iter(self.pipe.values())).get_params()
+        manifest = {
+            "run": new_run,
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "data_format": data_format,
+            "shared_fit": self.shared_fit,
+            "column_order": self.column_order,
+            "pipeline_config": {key: str(value) for key, value in transformer_config.items()},
+            "datasets": datasets,
+        }
+        with open(os.path.join(output_dir, MANIFEST_FILE), "w") as json_file:
+            json.dump(manifest, json_file, indent=4)
+
+        # index the run
+        registry.complete_run(
+            new_run,
+            input_files = list(datasets),
+            pipeline_config = manifest["pipeline_config"],
+            artifacts = datasets,
+            data_hashes = {
+                "inputs": {key: self.input_hashes.get(key) for key in datasets},
+                "outputs": output_hashes,
+            }
+        )
 
         return processed_data
 
+    def load_run(self, run, output_dir=None):
+        '''
+        Opens a saved run, its data and pipelines are only read when asked for
+
+        Parameters
+        ----------
+        run: int
+            Number of the run
+        output_dir: str
+            The directory the run was saved in, defaults to the processed data directory
+        Returns
+        -------
+        RunArtifacts
+        '''
+        if(output_dir is None):
+            output_dir = self.processed_dir_path
+        return RunArtifacts(os.path.join(output_dir, f"run_{run}"))
+
 
     def __get_root_dir(self, current_dir=None):
         """
@@ -238,4 +492,31 @@ class PipelineGenerator():
                 return current_dir
             current_dir = os.path.dirname(current_dir)
 
-        raise FileNotFoundError(f"Project root directory not found. '{unique_dir}' directory missing in path.")
\ No newline at end of file
+        raise FileNotFoundError(f"Project root directory not found. '{unique_dir}' directory missing in path.")
+
+
+def _fit_pipeline(pipe, data):
+    '''
+    Fits pipe to data if it was not fitted before, returns the fitted pipeline
+    (a copy when run in another process)
+    '''
+    try:
+        pipe.check_is_fitted()
+    except NotFittedError:
+        pipe.fit(data)
+    return pipe
+
+
+def _transform_data(pipe, data):
+    '''
+    Transforms data with a fitted pipeline
+    '''
+    return pipe.transform(data)
+
+
+def _fit_transform_data(pipe, data):
+    '''
+    Fits pipe to data if needed and transforms it, returns the pipeline and the transformed data
+    '''
+    pipe = _fit_pipeline(pipe, data)
+    return pipe, pipe.transform(data)
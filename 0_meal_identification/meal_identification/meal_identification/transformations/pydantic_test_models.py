@@ -3,6 +3,8 @@ from typing import List, Optional
 from datetime import datetime
 import pandas as pd
 
+from meal_identification.transformations.schema_validation import ColumnSchema, DataFrameSchema
+
 class NumericColumns(BaseModel):
     """
     Pydantic model for all numeric columns in the interim data
@@ -52,4 +54,36 @@ class CosineTransformed(BaseModel):
         if(v < -1 or v > 1):
             raise ValueError('Column value should be between -1 and 1')
         return v
-    
\ No newline at end of file
+
+
+# Vectorized counterpart of CosineTransformed for the numerical data, see DataFrameSchema
+COSINE_TRANSFORMED_SCHEMA = DataFrameSchema(columns={
+    col: ColumnSchema(dtype='float', ge=-1, le=1)
+    for col in ['bgl', 'dose_units', 'food_g', 'food_glycemic_index', 'food_g_keep']
+})
+
+
+# Vectorized counterpart of NumericColumns, see DataFrameSchema
+NUMERIC_COLUMNS_SCHEMA = DataFrameSchema(columns={
+    'bgl': ColumnSchema(dtype='float'),
+    'dose_units': ColumnSchema(dtype='float'),
+    'food_g': ColumnSchema(dtype='float', ge=0),
+    'food_glycemic_index': ColumnSchema(dtype='float'),
+    'food_g_keep': ColumnSchema(dtype='float'),
+})
+
+# Vectorized counterpart of CategoricalColumns, see DataFrameSchema
+CATEGORICAL_COLUMNS_SCHEMA = DataFrameSchema(columns={
+    'date': ColumnSchema(dtype='datetime'),
+    'affects_fob': ColumnSchema(dtype='object'),
+    'day_start_shift': ColumnSchema(dtype='object'),
+    'msg_type': ColumnSchema(dtype='object'),
+    'affects_iob': ColumnSchema(dtype='object'),
+})
+
+# Schema PipelineGenerator checks transformed data against when it is given none: the numeric
+# columns of NumericColumns that a dataset has are still numeric. Value ranges depend on the
+# transformers, e.g. COSINE_TRANSFORMED_SCHEMA after a CosineTransformer.
+TRANSFORMED_SCHEMA = DataFrameSchema(columns={
+    col: ColumnSchema(dtype='numeric', required=False) for col in NUMERIC_COLUMNS_SCHEMA.columns
+})
@@ -0,0 +1,149 @@
+from sktime.transformations.compose import TransformerPipeline
+
+import json
+import os
+
+import pandas as pd
+
+# Manifest at the root of every run directory, see PipelineGenerator.save_output
+MANIFEST_FILE = "manifest.json"
+
+# File extension of each supported data format
+DATA_FORMATS = {
+    "parquet": ".parquet",
+    "feather": ".arrow",
+    "csv": ".csv",
+}
+
+
+def data_file_name(key, data_format):
+    '''
+    Name of the file a dataset is saved to in a run's data directory
+
+    Parameters
+    ----------
+    key : str
+        Name of the dataset, i.e. the file it was loaded from ("filename.csv")
+    data_format : str
+        One of DATA_FORMATS
+
+    Returns
+    -------
+    str
+    '''
+    if data_format not in DATA_FORMATS:
+        raise ValueError(f"Unknown data format {data_format}, expected one of {list(DATA_FORMATS)}")
+    if data_format == "csv":
+        return key
+    return os.path.splitext(key)[0] + DATA_FORMATS[data_format]
+
+
+def write_data(df, path, data_format):
+    '''
+    Save a dataset in a columnar (parquet, Arrow IPC/feather) or csv file, keeping its index
+    '''
+    if data_format == "parquet":
+        df.to_parquet(path, index=True)
+    elif data_format == "feather":
+        # feather files can't hold an index, it is stored as a column and restored by read_data
+        df.reset_index(names="__index__").to_feather(path)
+    else:
+        df.to_csv(path, index=True)
+
+
+def read_data(path, data_format):
+    '''
+    Read a dataset saved by write_data
+    '''
+    if data_format == "parquet":
+        return pd.read_parquet(path)
+    if data_format == "feather":
+        return pd.read_feather(path).set_index("__index__").rename_axis(None)
+    return pd.read_csv(path, index_col=0)
+
+
+class RunArtifacts:
+    '''
+    Data and pipelines of a saved run, loaded lazily.
+
+    Only the run's manifest is read on creation. Each dataset and pipeline is read the first time
+    it is asked for, and kept for later calls.
+
+    Usage:
+        run = RunArtifacts(".../data/processed/run_3")
+        run.datasets             # names of the transformed datasets
+        run.data("500030.csv")   # transformed DataFrame
+        run.pipeline("500030.csv")
+    '''
+
+    def __init__(self, run_dir):
+        '''
+        Parameters
+        ----------
+        run_dir : str
+            Run directory written by PipelineGenerator.save_output
+        '''
+        self.run_dir = run_dir
+        with open(os.path.join(run_dir, MANIFEST_FILE)) as f:
+            self.manifest = json.load(f)
+        self._data = {}
+        self._pipelines = {}
+
+    @property
+    def run(self):
+        return self.manifest["run"]
+
+    @property
+    def data_format(self):
+        return self.manifest["data_format"]
+
+    @property
+    def datasets(self):
+        return list(self.manifest["datasets"])
+
+    @property
+    def column_order(self):
+        return self.manifest["column_order"]
+
+    @property
+    def pipeline_config(self):
+        return self.manifest["pipeline_config"]
+
+    def data(self, key):
+        '''
+        Transformed dataset saved under key
+
+        Returns
+        -------
+        pd.DataFrame
+        '''
+        if key not in self._data:
+            path = os.path.join(self.run_dir, self.manifest["datasets"][key]["data"])
+            self._data[key] = read_data(path, self.data_format)
+        return self._data[key]
+
+    def pipeline(self, key=None):
+        '''
+        Fitted pipeline of the dataset saved under key, the first dataset's pipeline if key is None
+
+        Returns
+        -------
+        sktime TransformerPipeline
+        '''
+        if key is None:
+            key = self.datasets[0]
+        # datasets of a shared fit run all point to the same pipeline, which is only read once
+        path = os.path.join(self.run_dir, self.manifest["datasets"][key]["pipeline"])
+        if path not in self._pipelines:
+            self._pipelines[path] = TransformerPipeline.load_from_path(path)
+        return self._pipelines[path]
+
+    def load_all(self):
+        '''
+        Every transformed dataset of the run
+
+        Returns
+        -------
+        dict of pd.DataFrame
+        '''
+        return {key: self.data(key) for key in self.datasets}
@@ -0,0 +1,194 @@
+import json
+import os
+import re
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+from urllib.request import pathname2url
+
+# Registry database kept at the root of the processed data directory
+REGISTRY_FILE = "runs.sqlite"
+
+_SCHEMA = '''
+CREATE TABLE IF NOT EXISTS runs (
+    run INTEGER PRIMARY KEY,
+    status TEXT NOT NULL,
+    created TEXT NOT NULL,
+    run_dir TEXT NOT NULL,
+    input_files TEXT,
+    pipeline_config TEXT,
+    artifacts TEXT,
+    data_hashes TEXT
+)
+'''
+
+# Columns stored as JSON
+_JSON_COLUMNS = ['input_files', 'pipeline_config', 'artifacts', 'data_hashes']
+
+
+class RunRegistry:
+    '''
+    Index of the runs saved in a processed data directory, stored in a SQLite database.
+
+    Runs are numbered by the registry rather than by listing the directory: allocate_run reserves
+    the next number in a transaction, so jobs saving runs at the same time (threads or processes)
+    never get the same number. Each run records its input files, pipeline configuration, fitted
+    artifacts and data hashes, looked up by run number.
+
+    Run directories that existed before the registry are added (with status "legacy") when the
+    database is created.
+    '''
+
+    def __init__(self, processed_dir, readonly=False):
+        '''
+        Parameters
+        ----------
+        processed_dir : str
+            Directory holding the run_# directories
+        readonly : bool, optional
+            Only look runs up: the database must exist, it is opened read-only and never locked for
+            writing, so allocate_run and complete_run fail
+        '''
+        self.processed_dir = processed_dir
+        self.path = os.path.join(processed_dir, REGISTRY_FILE)
+        self.readonly = readonly
+        if readonly:
+            if not os.path.exists(self.path):
+                raise FileNotFoundError(f"No run registry at {self.path}")
+            return
+        with self._transaction() as conn:
+            is_new = conn.execute(
+                "SELECT name FROM sqlite_master WHERE type='table' AND name='runs'"
+            ).fetchone() is None
+            conn.execute(_SCHEMA)
+            if is_new:
+                self._add_legacy_runs(conn)
+
+    def _connect(self):
+        # autocommit mode, transactions are opened explicitly
+        if self.readonly:
+            return sqlite3.connect(f"file:{pathname2url(self.path)}?mode=ro", uri=True, timeout=60,
+                                   isolation_level=None)
+        return sqlite3.connect(self.path, timeout=60, isolation_level=None)
+
+    @contextmanager
+    def _transaction(self):
+        '''
+        Connection holding the database write lock until the block ends, committed unless it raises
+        '''
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+        finally:
+            conn.close()
+
+    def _add_legacy_runs(self, conn):
+        '''
+        Registers the run_# directories saved before the registry existed
+        '''
+        for name in os.listdir(self.processed_dir):
+            match = re.fullmatch(r"run_([0-9]+)", name)
+            if match and os.path.isdir(os.path.join(self.processed_dir, name)):
+                conn.execute(
+                    "INSERT OR IGNORE INTO runs (run, status, created, run_dir) VALUES (?, 'legacy', ?, ?)",
+                    (int(match.group(1)), _now(), name),
+                )
+
+    def allocate_run(self):
+        '''
+        Reserves the next run number and creates its directory
+
+        Returns
+        -------
+        tuple(int, str)
+            Run number and path of the (empty) run directory
+        '''
+        with self._transaction() as conn:
+            last_run = conn.execute("SELECT MAX(run) FROM runs").fetchone()[0] or 0
+            run = last_run + 1
+            run_dir = f"run_{run}"
+            conn.execute(
+                "INSERT INTO runs (run, status, created, run_dir) VALUES (?, 'allocated', ?, ?)",
+                (run, _now(), run_dir),
+            )
+            os.mkdir(os.path.join(self.processed_dir, run_dir))
+        return run, os.path.join(self.processed_dir, run_dir)
+
+    def complete_run(self, run, input_files=None, pipeline_config=None, artifacts=None, data_hashes=None):
+        '''
+        Records what an allocated run contains once it is saved
+
+        Parameters
+        ----------
+        run : int
+            Number returned by allocate_run
+        input_files : list of str
+            Files the run's data was loaded from
+        pipeline_config : dict
+            Parameters of the pipeline
+        artifacts : dict
+            Paths (relative to the run directory) of the data and pipeline of each dataset
+        data_hashes : dict
+            sha256 of the input and output files
+        '''
+        with self._transaction() as conn:
+            updated = conn.execute(
+                "UPDATE runs SET status='complete', input_files=?, pipeline_config=?, artifacts=?, "
+                "data_hashes=? WHERE run=?",
+                (json.dumps(input_files), json.dumps(pipeline_config), json.dumps(artifacts),
+                 json.dumps(data_hashes), run),
+            ).rowcount
+        if not updated:
+            raise KeyError(f"Run {run} was not allocated in {self.path}")
+
+    def get(self, run):
+        '''
+        Record of a run
+
+        Returns
+        -------
+        dict
+            run, status, created, run_dir (absolute), input_files, pipeline_config, artifacts, data_hashes
+        '''
+        conn = self._connect()
+        try:
+            conn.row_factory = sqlite3.Row
+            row = conn.execute("SELECT * FROM runs WHERE run=?", (run,)).fetchone()
+        finally:
+            conn.close()
+        if row is None:
+            raise KeyError(f"Run {run} not found in {self.path}")
+
+        record = dict(row)
+        for col in _JSON_COLUMNS:
+            record[col] = json.loads(record[col]) if record[col] is not None else None
+        record['run_dir'] = os.path.join(self.processed_dir, record['run_dir'])
+        return record
+
+    def runs(self, status=None):
+        '''
+        Numbers of the registered runs, optionally only those with the given status
+
+        Returns
+        -------
+        list of int
+        '''
+        conn = self._connect()
+        try:
+            if status is None:
+                rows = conn.execute("SELECT run FROM runs ORDER BY run").fetchall()
+            else:
+                rows = conn.execute("SELECT run FROM runs WHERE status=? ORDER BY run", (status,)).fetchall()
+        finally:
+            conn.close()
+        return [row[0] for row in rows]
+
+
+def _now():
+    return datetime.now().isoformat(timespec="seconds")
@@ -0,0 +1,92 @@
+from pydantic import BaseModel
+from typing import Dict, Literal, Optional
+
+import numpy as np
+import pandas as pd
+
+# Checks of each dtype kind a column can be required to have
+DTYPE_CHECKS = {
+    'float': pd.api.types.is_float_dtype,
+    'numeric': pd.api.types.is_numeric_dtype,
+    'datetime': pd.api.types.is_datetime64_any_dtype,
+    'bool': pd.api.types.is_bool_dtype,
+    'object': pd.api.types.is_object_dtype,
+}
+
+
+class ColumnSchema(BaseModel):
+    """
+    Expected dtype, value range and number of missing values of a column
+    """
+    dtype: Optional[Literal['float', 'numeric', 'datetime', 'bool', 'object']] = None
+    ge: Optional[float] = None
+    le: Optional[float] = None
+    max_nan: Optional[int] = None
+    required: bool = True
+
+
+class DataFrameSchema(BaseModel):
+    """
+    Schema of a whole DataFrame, checked one column at a time with vectorized operations rather
+    than row by row like DataFrameValidator, so it is cheap enough to run on every transformed dataset
+    """
+    columns: Dict[str, ColumnSchema]
+
+    def validate_df(self, df: pd.DataFrame, name: str = 'DataFrame') -> dict:
+        """
+        Check df against the schema
+
+        Parameters
+        ----------
+        df : pd.DataFrame
+            Data to check
+        name : str, optional
+            Name of the data used in error messages, e.g. the dataset's file name
+
+        Returns
+        -------
+        dict
+            Report of every checked column: dtype, nan_count, min and max
+
+        Raises
+        ------
+        ValueError
+            Listing every violation found
+        """
+        errors = []
+        report = {}
+        for col, schema in self.columns.items():
+            if col not in df.columns:
+                if schema.required:
+                    errors.append(f"missing column {col}")
+                continue
+
+            values = df[col]
+            nan_count = int(values.isna().sum())
+            column_report = {'dtype': str(values.dtype), 'nan_count': nan_count, 'min': None, 'max': None}
+
+            if schema.dtype is not None and not DTYPE_CHECKS[schema.dtype](values.dtype):
+                errors.append(f"{col} has dtype {values.dtype}, expected {schema.dtype}")
+
+            if schema.max_nan is not None and nan_count > schema.max_nan:
+                errors.append(f"{col} has {nan_count} NaN values, at most {schema.max_nan} allowed")
+
+            if pd.api.types.is_numeric_dtype(values.dtype) and not pd.api.types.is_bool_dtype(values.dtype):
+                array = values.to_numpy(dtype='float64', na_value=np.nan)
+                if nan_count < len(array):
+                    column_report['min'] = float(np.nanmin(array))
+                    column_report['max'] = float(np.nanmax(array))
+                    if schema.ge is not None and column_report['min'] < schema.ge:
+                        n_below = int((array < schema.ge).sum())
+                        errors.append(f"{col} has {n_below} values below {schema.ge} (min {column_report['min']})")
+                    if schema.le is not None and column_report['max'] > schema.le:
+                        n_above = int((array > schema.le).sum())
+                        errors.append(f"{col} has {n_above} values above {schema.le} (max {column_report['max']})")
+            elif schema.ge is not None or schema.le is not None:
+                errors.append(f"{col} has dtype {values.dtype}, can't check its range")
+
+            report[col] = column_report
+
+        if errors:
+            raise ValueError(f"{name} does not match the schema: " + "; ".join(errors))
+        return report
@@ -0,0 +1,100 @@
+import pandas as pd
+
+
+def iter_chunks(source, chunksize, **read_kwargs):
+    '''
+    Splits a series into consecutive chunks without loading more than one chunk of a file at a time
+
+    Parameters
+    ----------
+    source : str, pd.DataFrame or iterable of pd.DataFrame
+        Path of a csv file (read with pd.read_csv and read_kwargs), a DataFrame to slice,
+        or chunks that are passed through as they are
+    chunksize : int
+        Rows per chunk
+
+    Yields
+    ------
+    pd.DataFrame
+    '''
+    if isinstance(source, str) or hasattr(source, '__fspath__'):
+        with pd.read_csv(source, chunksize=chunksize, **read_kwargs) as reader:
+            yield from reader
+    elif isinstance(source, pd.DataFrame):
+        for start in range(0, len(source), chunksize):
+            yield source.iloc[start:start + chunksize]
+    else:
+        yield from source
+
+
+def stream_transform(pipeline, chunks, history=288, columns=None):
+    '''
+    Transforms a long series chunk by chunk with a fitted pipeline
+
+    Each chunk is transformed together with the last `history` input rows before it, and only the
+    chunk's own rows are kept. Transformers that look back in time (forward fill imputers, lags,
+    window features) therefore see the same past as when transforming the whole series, as long as
+    they look back at most `history` rows. Memory stays bounded by the chunk size plus history.
+
+    Parameters
+    ----------
+    pipeline : fitted sktime transformer
+        Pipeline to apply, e.g. one of PipelineGenerator.pipe
+    chunks : iterable of pd.DataFrame
+        Consecutive chunks of the series with unique index values, see iter_chunks
+    history : int
+        Input rows carried over from one chunk to the next. Default to 288 (one day of 5 minute data)
+    columns : list of str, optional
+        Columns to transform, the other columns are passed through unchanged. Default to all columns
+
+    Yields
+    ------
+    pd.DataFrame
+        Transformed rows of each chunk
+    '''
+    context = None
+    for chunk in chunks:
+        data = chunk if columns is None else chunk[columns]
+        window = data if context is None else pd.concat([context, data])
+        transformed = pipeline.transform(window).loc[chunk.index]
+        if columns is not None:
+            transformed = pd.concat([transformed, chunk.drop(columns=columns)], axis=1)
+        yield transformed
+        context = window.iloc[-history:] if history > 0 else None
+
+
+def stream_transform_to_csv(pipeline, chunks, output_path, history=288, columns=None, column_order=None,
+                            index=True):
+    '''
+    Transforms a long series chunk by chunk (see stream_transform) and appends each transformed
+    chunk to a csv file as soon as it is ready
+
+    Parameters
+    ----------
+    pipeline : fitted sktime transformer
+        Pipeline to apply
+    chunks : iterable of pd.DataFrame
+        Consecutive chunks of the series, see iter_chunks
+    output_path : str
+        csv file to write, overwritten if it exists
+    history : int
+        Input rows carried over from one chunk to the next, see stream_transform
+    columns : list of str, optional
+        Columns to transform, see stream_transform
+    column_order : list of str, optional
+        Order of the columns in the file
+    index : bool
+        Write the index
+
+    Returns
+    -------
+    int
+        Number of rows written
+    '''
+    n_rows = 0
+    for i, transformed in enumerate(stream_transform(pipeline, chunks, history=history, columns=columns)):
+        if column_order is not None:
+            transformed = transformed[column_order]
+        transformed.to_csv(output_path, mode='w' if i == 0 else 'a', header=i == 0, index=index)
+        n_rows += len(transformed)
+    return n_rows